@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Content-addressed cache of the libraries of the distribution.
+#
+# Every lib under src/libs and src/third is built as a static archive (or a
+# shared library, see configure.getLinkMode()), linked by the projects
+# depending on it. Switching branches or build directories rebuilds libraries
+# whose inputs are identical. When the CONFIGURE_ARTIFACT_CACHE environment
+# variable is set to a directory, e.g.:
+#
+#     CONFIGURE_ARTIFACT_CACHE=~/.cache/artifacts qmake ...
+#
+# the files built for each lib (lib<name>.a or .so, object files, and files
+# generated by moc, uic and rcc) are stored in this directory once built,
+# keyed by a hash of (see configure.getArtifactKey()):
+#
+#     - the content of its sources, headers, forms and resources, of the
+#       headers of the distribution they transitively include, and of its
+#       .config.pri, with the root directories replaced by placeholders
+#     - the CONFIG passed to configure.py and the toolchain environment
+#       variables (CXX, AR, CXXFLAGS, QMAKE, QMAKESPEC)
+#     - the keys of the libraries it depends on
+#
+# Each time configure.py runs, libraries whose output directory doesn't
+# contain files built from their current inputs are restored from the cache,
+# if it has their key. Restored files are newer than the sources, so make
+# considers them up to date, and rebuilds them as usual when a source is
+# modified later. Ninja rebuilds outputs missing from its log, so libraries
+# already built from their current inputs have no build statement in
+# build.ninja instead, which runs configure.py again when an input of a
+# library is modified (see ninjagen.py).
+#
+# Files are stored once the library is built (QMAKE_POST_LINK, or the archive
+# rule of build.ninja), by:
+#
+#     python artifactcache.py store <lib-out-dir>
+#
+# which reads the key and the inputs recorded by configure.py in
+# <lib-out-dir>/.artifact.json. Nothing is stored if an input was modified
+# since then, since the built files would not match the key.
+#
+# After each store, entries not used for more than CONFIGURE_ARTIFACT_CACHE_AGE
+# days (default: 30) are evicted, then the least recently used ones until the
+# cache is not larger than CONFIGURE_ARTIFACT_CACHE_SIZE megabytes (default:
+# 2048). Hits, misses, stores and evictions are appended to stats.log in the
+# cache directory, and summarized by:
+#
+#     python artifactcache.py stats <cache-dir>
+#
+# Headers outside the distribution (Qt, standard library) are not part of the
+# key: remove the cache directory after upgrading them in place. Debug
+# information of restored object files refers to the directories they were
+# built in.
+
+import sys
+import os
+import re
+import shutil
+import time
+
+import buildutils
+
+# Increment when the computation of keys or the layout of entries changes
+cacheVersion = 1
+
+# Files written by configure.py to the output directory of each lib: the key
+# and inputs of the library, and the key of the files currently built
+inputsFileName = '.artifact.json'
+builtKeyFileName = '.artifactkey'
+
+# Entries being stored by another process are not evicted before this age, in
+# seconds, since they are not complete
+tmpEntryMaxAge = 3600
+
+# Static and shared libraries, e.g., libCore.a or libCore.so.1.0.0
+libraryRegExp = re.compile(r"\.(a|so(\.\d+)*)$")
+
+
+# Returns whether the given file of an output directory, relative to it, is
+# built from the sources, and therefore cached. Files generated by
+# configure.py or qmake, and hidden files, are not.
+def isCachedFile(relPath):
+    name = os.path.basename(relPath)
+    return not (name.startswith('.') or
+                name.startswith('Makefile') or
+                name == 'pch.h' or
+                (name.startswith('unity_') and name.endswith('.cpp')))
+
+# Returns the rank of the given file in the order in which files are restored.
+# make compares modification times, so files must be restored after the files
+# they are built from.
+def getRestoreRank(relPath):
+    if libraryRegExp.search(relPath):
+        return 3
+    elif relPath.endswith('.o'):
+        return 2
+    elif '.gch' in relPath:
+        return 1
+    else:
+        return 0
+
+# Returns the cached files of the given directory, relative to it, in restore
+# order. Subdirectories which are the output directories of other projects
+# are skipped.
+def listFiles(dirPath):
+    res = []
+    for parentPath, dirNames, fileNames in os.walk(dirPath):
+        dirNames[:] = [name for name in dirNames
+                       if not os.path.isfile(os.path.join(parentPath, name, '.config.pri'))]
+        for fileName in fileNames:
+            relPath = os.path.relpath(os.path.join(parentPath, fileName), dirPath).replace(os.sep, '/')
+            if isCachedFile(relPath):
+                res.append(relPath)
+    return sorted(res, key=lambda relPath: (getRestoreRank(relPath), relPath))
+
+# Returns the total size of the given files of the given directory, in bytes
+def getTotalSize(dirPath, relPaths):
+    return sum(os.path.getsize(dirPath + '/' + relPath) for relPath in relPaths)
+
+# Copies the given files from a directory to another one
+def copyFiles(srcDirPath, dstDirPath, relPaths):
+    for relPath in relPaths:
+        dstFilePath = dstDirPath + '/' + relPath
+        buildutils.mkdir(os.path.dirname(dstFilePath))
+        shutil.copyfile(srcDirPath + '/' + relPath, dstFilePath)
+
+
+class ArtifactCache:
+
+    def __init__(self, cacheDir):
+        self.cacheDir = cacheDir  # Set by CONFIGURE_ARTIFACT_CACHE, e.g., /home/user/.cache/artifacts
+
+    # Returns the directory of the entry with the given key
+    def getEntryDir(self, key):
+        return self.cacheDir + '/' + key[:2] + '/' + key
+
+    # Appends an event to stats.log: 'hit', 'miss', 'store' or 'evict', with
+    # the size of the entry in bytes. Lines are short enough for appends of
+    # concurrent builds not to be interleaved.
+    def logEvent(self, event, size=0):
+        buildutils.mkdir(self.cacheDir)
+        f = open(self.cacheDir + '/stats.log', 'a')
+        f.write("%s %d\n" % (event, size))
+        f.close()
+
+    # Copies the files of the entry with the given key to the given output
+    # directory. Returns whether the cache had this entry.
+    def restore(self, key, outDir):
+        entryDir = self.getEntryDir(key)
+        if not os.path.isdir(entryDir):
+            self.logEvent('miss')
+            return False
+        try:
+            relPaths = listFiles(entryDir)
+            copyFiles(entryDir, outDir, relPaths)
+            size = getTotalSize(entryDir, relPaths)
+            os.utime(entryDir, None) # Most recently used
+        except (IOError, OSError):
+            # Evicted concurrently
+            self.logEvent('miss')
+            return False
+        self.logEvent('hit', size)
+        return True
+
+    # Copies the cached files of the given output directory to the entry with
+    # the given key, unless it already exists. Files are first copied to a
+    # temporary directory, which is then renamed, so that other processes
+    # never restore a partially stored entry.
+    def store(self, key, outDir):
+        entryDir = self.getEntryDir(key)
+        if os.path.isdir(entryDir):
+            os.utime(entryDir, None)
+            return
+        tmpEntryDir = entryDir + '.tmp' + str(os.getpid())
+        relPaths = listFiles(outDir)
+        buildutils.mkdir(tmpEntryDir)
+        copyFiles(outDir, tmpEntryDir, relPaths)
+        try:
+            os.rename(tmpEntryDir, entryDir)
+        except OSError:
+            # Stored concurrently by another build
+            shutil.rmtree(tmpEntryDir, True)
+            return
+        self.logEvent('store', getTotalSize(entryDir, relPaths))
+
+    # Returns the entries of the cache, as a list of tuples (lastUsed, size,
+    # entryDir), where lastUsed is the modification time of entryDir.
+    # Entries being stored are listed once they are too old to be complete.
+    def getEntries(self):
+        res = []
+        if not os.path.isdir(self.cacheDir):
+            return res
+        now = time.time()
+        for prefix in sorted(os.listdir(self.cacheDir)):
+            prefixDir = self.cacheDir + '/' + prefix
+            if len(prefix) != 2 or not os.path.isdir(prefixDir):
+                continue
+            for name in sorted(os.listdir(prefixDir)):
+                entryDir = prefixDir + '/' + name
+                try:
+                    lastUsed = os.path.getmtime(entryDir)
+                    if '.tmp' in name and lastUsed > now - tmpEntryMaxAge:
+                        continue
+                    res.append((lastUsed, getTotalSize(entryDir, listFiles(entryDir)), entryDir))
+                except OSError:
+                    pass # Evicted concurrently
+        return res
+
+    # Removes the entries not used for more than maxAge seconds, then the
+    # least recently used ones until the cache is not larger than maxSize
+    # bytes
+    def evict(self, maxSize, maxAge):
+        entries = sorted(self.getEntries())
+        totalSize = sum(size for lastUsed, size, entryDir in entries)
+        minLastUsed = time.time() - maxAge
+        for lastUsed, size, entryDir in entries:
+            if lastUsed >= minLastUsed and totalSize <= maxSize:
+                break
+            shutil.rmtree(entryDir, True)
+            totalSize -= size
+            self.logEvent('evict', size)
+
+    # Returns the statistics of the cache, as a list of lines
+    def getReport(self):
+        counts = {}
+        sizes = {}
+        for line in buildutils.readFromFileIfExists(self.cacheDir + '/stats.log').splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[1].isdigit():
+                counts[fields[0]] = counts.get(fields[0], 0) + 1
+                sizes[fields[0]] = sizes.get(fields[0], 0) + int(fields[1])
+        entries = self.getEntries()
+        megabyte = 1024.0 * 1024.0
+        numLookups = counts.get('hit', 0) + counts.get('miss', 0)
+        lines = ["Cache directory: " + self.cacheDir,
+                 "Entries:   %d (%.1f MB)" % (len(entries), sum(entry[1] for entry in entries) / megabyte),
+                 "Hits:      %d (%.1f MB restored)" % (counts.get('hit', 0), sizes.get('hit', 0) / megabyte),
+                 "Misses:    %d" % counts.get('miss', 0)]
+        if numLookups > 0:
+            lines.append("Hit rate:  %.1f%%" % (100.0 * counts.get('hit', 0) / numLookups))
+        lines += ["Stores:    %d (%.1f MB)" % (counts.get('store', 0), sizes.get('store', 0) / megabyte),
+                  "Evictions: %d (%.1f MB)" % (counts.get('evict', 0), sizes.get('evict', 0) / megabyte)]
+        return lines
+
+
+# Stores the files built in the given output directory of a library, unless
+# one of the inputs recorded by configure.py was modified since then, or may
+# have been modified without changing its modification time (see
+# buildutils.isRacy()). Then evicts old entries.
+def storeOutDir(outDir):
+    inputsFilePath = outDir + '/' + inputsFileName
+    data = buildutils.readJsonFile(inputsFilePath)
+    if not data or data.get('version') != cacheVersion:
+        return
+    recordedAt = os.path.getmtime(inputsFilePath)
+    for filePath, mtime, size in data['inputs']:
+        try:
+            stat = os.stat(filePath)
+        except OSError:
+            return
+        if stat.st_mtime != mtime or stat.st_size != size or buildutils.isRacy(mtime, recordedAt):
+            print("[artifactcache.py] Not stored: " + filePath + " was modified since configure.py ran.")
+            return
+    cache = ArtifactCache(data['cacheDir'])
+    try:
+        cache.store(data['key'], outDir)
+        buildutils.writeToFileAtomically(outDir + '/' + builtKeyFileName, data['key'])
+        cache.evict(data['maxSize'], data['maxAge'])
+    except (IOError, OSError) as e:
+        # The build must not fail because of the cache
+        print("[artifactcache.py] Not stored: " + str(e))
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == 'store':
+        storeOutDir(os.path.abspath(sys.argv[2]))
+    elif len(sys.argv) == 3 and sys.argv[1] == 'stats':
+        for line in ArtifactCache(os.path.abspath(sys.argv[2])).getReport():
+            print(line)
+    else:
+        print("Usage: python artifactcache.py store <lib-out-dir>")
+        print("       python artifactcache.py stats <cache-dir>")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
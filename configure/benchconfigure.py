@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Benchmark of configure.py on synthetic distributions.
+#
+# Usage:
+#
+#     python benchconfigure.py [options]
+#
+# For each requested size, a synthetic src/ tree is generated with one app, the
+# given number of internal libraries (nested in groups of subdirs projects) and
+# one third-party library per ten internal libraries. Then configure.py is run
+# on this tree, once from an empty build directory ("cold" run, no caches), and
+# several times again on the same build directory ("warm" runs, keeping the
+# fastest). Each run is a separate Python process, like when called by qmake.
+#
+# The time spent in each phase of configure.py (see configure.phases) is
+# measured separately, and all results are written as JSON to the output file,
+# so that runs can be compared over time with --compare.
+#
+# Options:
+#
+#     -n, --sizes N1,N2,...   Numbers of internal libraries (default: 100,1000)
+#     -d, --depth D           Nesting depth of groups in libs/ (default: 2)
+#     -g, --groups G          Number of subgroups per group (default: 4)
+#     -f, --fan-out F         Average number of LIB_DEPENDS per lib (default: 3)
+#     -x, --diamonds X        Fraction of LIB_DEPENDS closing a diamond, i.e.,
+#                             depending on a lib that shares a dependency with
+#                             another dependency (default: 0.3)
+#     -s, --seed S            Seed of the random generator (default: 0)
+#     -r, --repeat R          Number of warm runs (default: 3)
+#     -o, --output FILE       JSON results file (default: benchconfigure.json)
+#     -w, --work-dir DIR      Where trees are generated (default: a temporary
+#                             directory, deleted afterwards)
+#     -l, --label LABEL       Label stored in results, e.g., a commit hash
+#     -c, --compare FILE      Previous results to compare with
+#
+# Example:
+#
+#     python benchconfigure.py -n 100,1000,10000,50000 -l "$(git rev-parse HEAD)"
+
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import tempfile
+import subprocess
+import optparse
+
+scriptDir = os.path.dirname(os.path.abspath(__file__))
+
+
+#------------------------ Synthetic tree generation ---------------------------
+
+# Writes content to file, creating directories as necessary
+def writeFile(filePath, content):
+    dirpath = os.path.dirname(filePath)
+    if not os.path.isdir(dirpath):
+        os.makedirs(dirpath)
+    f = open(filePath, 'w')
+    f.write(content)
+    f.close()
+
+# Returns the content of a 'subdirs' project file
+def makeSubdirsProContent(subdirs):
+    return ("TEMPLATE = subdirs\n" +
+            "SUBDIRS = \\\n    " + " \\\n    ".join(subdirs) + "\n\n" +
+            "include($$OUT_PWD/.config.pri)\n")
+
+# Returns the content of a 'lib' or 'app' project file
+def makeProContent(template, name, qt, thirdDepends, libDepends):
+    content = "TEMPLATE = " + template + "\n"
+    if qt:
+        content += "QT += " + " ".join(qt) + "\n"
+    else:
+        content += "CONFIG -= qt\n"
+    content += "\n"
+    if thirdDepends:
+        content += "THIRD_DEPENDS = \\\n    " + " \\\n    ".join(thirdDepends) + "\n\n"
+    if libDepends:
+        content += "LIB_DEPENDS = \\\n    " + " \\\n    ".join(libDepends) + "\n\n"
+    content += "HEADERS += \\\n    " + name + ".h\n\n"
+    content += "SOURCES += \\\n    " + name + ".cpp\n\n"
+    content += "include($$OUT_PWD/.config.pri)\n"
+    return content
+
+# Returns the direct dependencies of lib i, as indices of previous libs, so
+# that the dependency graph has no cycle.
+def pickDepends(i, fanOut, diamondDensity, depends, dependents, rng):
+    numDepends = min(i, rng.randint(0, 2 * fanOut))
+    res = []
+    attempts = 0
+    while len(res) < numDepends and attempts < 10 * numDepends:
+        attempts += 1
+        candidate = None
+        if res and rng.random() < diamondDensity:
+            # Close a diamond: i -> d -> c <- s <- i
+            d = rng.choice(res)
+            if depends[d]:
+                c = rng.choice(depends[d])
+                candidate = rng.choice(dependents[c])
+        elif rng.random() < 0.7:
+            # Libraries tend to depend on "nearby" libraries
+            candidate = rng.randint(max(0, i - 50), i - 1)
+        else:
+            candidate = rng.randint(0, i - 1)
+        if candidate is not None and candidate != i and candidate not in res:
+            res.append(candidate)
+    return sorted(res)
+
+# Generates a synthetic distribution in rootDir. Returns the number of
+# project files.
+def generateTree(rootDir, numLibs, depth=2, numGroups=4, fanOut=3, diamondDensity=0.3, seed=0):
+    rng = random.Random(seed)
+    srcDir = rootDir + '/src'
+    numProjects = 0
+
+    writeFile(srcDir + '/src.pro', makeSubdirsProContent(['app', 'libs', 'third']))
+    numProjects += 1
+
+    # Third-party libraries
+    thirdNames = ['Third%d' % i for i in range(max(1, numLibs // 10))]
+    writeFile(srcDir + '/third/third.pro', makeSubdirsProContent(thirdNames))
+    numProjects += 1
+    for i, name in enumerate(thirdNames):
+        thirdDepends = sorted(rng.sample(thirdNames[:i], min(i, rng.randint(0, 2))))
+        writeFile(srcDir + '/third/' + name + '/' + name + '.pro',
+                  makeProContent('lib', name, [], thirdDepends, []))
+        writeFile(srcDir + '/third/' + name + '/' + name + '.h', "int " + name + "();\n")
+        writeFile(srcDir + '/third/' + name + '/' + name + '.cpp', "int " + name + "() { return 0; }\n")
+        numProjects += 1
+
+    # Groups of internal libraries, e.g., "Group1/Group3". Each group, as well
+    # as libs/ itself, is a 'subdirs' project.
+    def writeGroupProFile(group, subdirs):
+        if group:
+            writeFile(srcDir + '/libs/' + group + '/' + group.rsplit('/', 1)[-1] + '.pro',
+                      makeSubdirsProContent(subdirs))
+        else:
+            writeFile(srcDir + '/libs/libs.pro', makeSubdirsProContent(subdirs))
+
+    leafGroups = ['']
+    for level in range(depth):
+        nextLeafGroups = []
+        for group in leafGroups:
+            subgroupNames = ['Group%d' % j for j in range(numGroups)]
+            writeGroupProFile(group, subgroupNames)
+            numProjects += 1
+            nextLeafGroups.extend((group + '/' if group else '') + name for name in subgroupNames)
+        leafGroups = nextLeafGroups
+
+    # Internal libraries, distributed among leaf groups
+    libNames = []
+    libsByGroup = {}
+    for i in range(numLibs):
+        group = leafGroups[i % len(leafGroups)]
+        name = 'Lib%d' % i
+        libNames.append((group + '/' if group else '') + name)
+        libsByGroup.setdefault(group, []).append(name)
+    for group in leafGroups:
+        writeGroupProFile(group, libsByGroup.get(group, []))
+        numProjects += 1
+
+    depends = []
+    dependents = []
+    for i, libName in enumerate(libNames):
+        libDepends = pickDepends(i, fanOut, diamondDensity, depends, dependents, rng)
+        depends.append(libDepends)
+        dependents.append([])
+        for j in libDepends:
+            dependents[j].append(i)
+        thirdDepends = []
+        if rng.random() < 0.3:
+            thirdDepends.append(rng.choice(thirdNames))
+        qt = [['core'], ['widgets'], ['widgets', 'network']][i % 3]
+        name = libName.rsplit('/', 1)[-1]
+        libDir = srcDir + '/libs/' + libName
+        writeFile(libDir + '/' + name + '.pro',
+                  makeProContent('lib', name, qt, thirdDepends, [libNames[j] for j in libDepends]))
+        writeFile(libDir + '/' + name + '.h', "".join('#include <%s/%s.h>\n' % (libNames[j], libNames[j].rsplit('/', 1)[-1]) for j in libDepends))
+        writeFile(libDir + '/' + name + '.cpp', '#include "' + name + '.h"\n')
+        numProjects += 1
+
+    # App, depending on the last libraries
+    writeFile(srcDir + '/app/app.pro',
+              makeProContent('app', 'main', ['widgets'], [], libNames[-5:]))
+    writeFile(srcDir + '/app/main.h', "\n")
+    writeFile(srcDir + '/app/main.cpp', "int main() { return 0; }\n")
+    numProjects += 1
+
+    return numProjects
+
+
+#---------------------------- Running configure.py ----------------------------
+
+# Runs all phases of configure.py in this process, and writes the time spent
+# in each of them as JSON to resultFilePath. configureArgs are the arguments
+# passed to configure.py.
+def runPhases(resultFilePath, configureArgs):
+    sys.path.insert(0, scriptDir)
+    start = time.time()
+    import configure
+    configure.setArguments(configureArgs)
+    phaseTimes = [('import', time.time() - start)]
+    for name, function in configure.phases:
+        start = time.time()
+        function()
+        phaseTimes.append((name, time.time() - start))
+    f = open(resultFilePath, 'w')
+    json.dump({'phases': phaseTimes, 'numProjects': len(configure.projects)}, f)
+    f.close()
+
+# Runs configure.py in a new process, and returns a tuple (phaseTimes,
+# numProjects), where phaseTimes is a list of (phaseName, seconds) which
+# includes the total time of the process, under the name 'total'.
+def runConfigure(rootDir, rootOutDir, config):
+    resultFilePath = rootOutDir + '.result.json'
+    devnull = open(os.devnull, 'w')
+    start = time.time()
+    returnCode = subprocess.call(
+        [sys.executable, os.path.abspath(__file__), '--run-phases', resultFilePath, rootDir, rootOutDir] + config,
+        stdout=devnull)
+    total = time.time() - start
+    devnull.close()
+    if returnCode != 0:
+        raise RuntimeError("configure.py failed on " + rootDir)
+    f = open(resultFilePath)
+    result = json.load(f)
+    f.close()
+    os.remove(resultFilePath)
+    phaseTimes = [(str(name), t) for name, t in result['phases']] + [('total', total)]
+    return (phaseTimes, result['numProjects'])
+
+# Returns, for each phase, the minimum time among the given runs
+def minPhaseTimes(runs):
+    res = []
+    for i, (name, t) in enumerate(runs[0]):
+        res.append((name, min(run[i][1] for run in runs)))
+    return res
+
+
+#-------------------------------- Reporting -----------------------------------
+
+# Prints the phase times of all results as a table
+def printResults(results):
+    phaseNames = [name for name, t in results[0]['cold']]
+    print("%-8s %-6s %s" % ("libs", "run", " ".join("%9s" % name for name in phaseNames)))
+    for result in results:
+        for run in ['cold', 'warm']:
+            print("%-8d %-6s %s" % (result['numLibs'], run, " ".join("%8.3fs" % t for name, t in result[run])))
+
+# Prints the ratio between the total times of the given results and of
+# previous results with the same number of libs
+def printComparison(results, previous):
+    previousByNumLibs = dict((r['numLibs'], r) for r in previous['results'])
+    print("Compared with %s (%s):" % (previous.get('label') or "previous results", previous['date']))
+    for result in results:
+        old = previousByNumLibs.get(result['numLibs'])
+        if not old:
+            continue
+        for run in ['cold', 'warm']:
+            oldTimes = dict(old[run])
+            ratios = []
+            for name, t in result[run]:
+                if name in oldTimes and oldTimes[name] > 0:
+                    ratios.append("%s %.2fx" % (name, t / oldTimes[name]))
+            print("%-8d %-6s %s" % (result['numLibs'], run, ", ".join(ratios)))
+
+
+#---------------------------------- Main --------------------------------------
+
+def main():
+    parser = optparse.OptionParser(usage="python benchconfigure.py [options]")
+    parser.add_option('-n', '--sizes',    default="100,1000")
+    parser.add_option('-d', '--depth',    type='int',   default=2)
+    parser.add_option('-g', '--groups',   type='int',   default=4)
+    parser.add_option('-f', '--fan-out',  type='int',   default=3, dest='fanOut')
+    parser.add_option('-x', '--diamonds', type='float', default=0.3)
+    parser.add_option('-s', '--seed',     type='int',   default=0)
+    parser.add_option('-r', '--repeat',   type='int',   default=3)
+    parser.add_option('-o', '--output',   default="benchconfigure.json")
+    parser.add_option('-w', '--work-dir', default=None, dest='workDir')
+    parser.add_option('-l', '--label',    default="")
+    parser.add_option('-c', '--compare',  default=None)
+    options, args = parser.parse_args()
+
+    if os.name == 'nt':
+        config = ['win32', 'release', 'qt']
+    else:
+        config = ['unix', 'release', 'qt']
+
+    workDir = options.workDir
+    isTemporaryWorkDir = workDir is None
+    if isTemporaryWorkDir:
+        workDir = tempfile.mkdtemp(prefix='benchconfigure-')
+
+    parameters = {
+        'depth':    options.depth,
+        'groups':   options.groups,
+        'fanOut':   options.fanOut,
+        'diamonds': options.diamonds,
+        'seed':     options.seed,
+        'repeat':   options.repeat,
+        'config':   config,
+        'jobs':     os.environ.get('CONFIGURE_JOBS', "") }
+
+    results = []
+    try:
+        for numLibs in [int(s) for s in options.sizes.split(',')]:
+            rootDir = os.path.abspath(os.path.join(workDir, 'tree-%d' % numLibs))
+            rootOutDir = rootDir + '-build'
+            for dirpath in [rootDir, rootOutDir]:
+                if os.path.exists(dirpath):
+                    shutil.rmtree(dirpath)
+
+            print("Generating tree with %d libs in %s" % (numLibs, rootDir))
+            start = time.time()
+            numProjectFiles = generateTree(rootDir, numLibs, options.depth, options.groups,
+                                           options.fanOut, options.diamonds, options.seed)
+            generationTime = time.time() - start
+
+            print("Running configure.py on %d project files" % numProjectFiles)
+            cold, numProjects = runConfigure(rootDir, rootOutDir, config)
+            warmRuns = [runConfigure(rootDir, rootOutDir, config)[0] for i in range(max(1, options.repeat))]
+            results.append({
+                'numLibs':        numLibs,
+                'numProjects':    numProjects,
+                'generationTime': generationTime,
+                'cold':           cold,
+                'warm':           minPhaseTimes(warmRuns) })
+    finally:
+        if isTemporaryWorkDir:
+            shutil.rmtree(workDir)
+
+    data = {
+        'version':    1,
+        'label':      options.label,
+        'date':       time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python':     sys.version.split()[0],
+        'platform':   sys.platform,
+        'parameters': parameters,
+        'results':    results }
+    f = open(options.output, 'w')
+    json.dump(data, f, indent=4, sort_keys=True)
+    f.close()
+
+    printResults(results)
+    print("Results written to " + options.output)
+
+    if options.compare:
+        f = open(options.compare)
+        previous = json.load(f)
+        f.close()
+        printComparison(results, previous)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == '--run-phases':
+        runPhases(sys.argv[2], sys.argv[3:])
+    else:
+        main()
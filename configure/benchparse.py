@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Micro-benchmark comparing the single-pass qmake tokenizer of buildutils with
+# the previous implementation, which scanned the whole project file with three
+# regular expressions per queried variable.
+#
+# Usage:
+#
+#     python benchparse.py [<dir> [<repeat>]]
+#
+# All project files found in <dir> (default: src/ of this distribution) are
+# parsed <repeat> times (default: 200) with both implementations, querying the
+# same variables as configure.py. A synthetic project file with many long
+# variables is also benchmarked, since real-world project files tend to be
+# longer than the ones of this template.
+#
+# The script also checks that both implementations agree on the values of the
+# queried variables, ignoring the few cases where the regex implementation was
+# wrong (e.g., variables whose name ends with the queried name).
+
+import sys
+import os
+import re
+import time
+
+import buildutils
+
+# Variables queried by configure.py for each project file
+queriedVariables = [
+    ('TEMPLATE',      []),
+    ('CONFIG',        ['unix', 'release', 'qt']),
+    ('QT',            ['core', 'gui']),
+    ('SUBDIRS',       []),
+    ('THIRD_DEPENDS', []),
+    ('LIB_DEPENDS',   [])]
+
+
+# Previous implementation of buildutils.getQmakeVariable(), kept as reference.
+def regexGetQmakeVariable(variableName, inputConfig, initialValues=[]):
+    regexPattern = variableName + r"\s*_SIGN_([^\n\\]*(\\[^\S\n]*\n[^\n\\]*)*)"
+    regexPatternEqual      = regexPattern.replace("_SIGN_", r"=")
+    regexPatternPlusEqual  = regexPattern.replace("_SIGN_", r"\+=")
+    regexPatternMinusEqual = regexPattern.replace("_SIGN_", r"-=")
+
+    matchEqual      = re.search(regexPatternEqual, inputConfig)
+    matchPlusEqual  = re.findall(regexPatternPlusEqual, inputConfig)
+    matchMinusEqual = re.findall(regexPatternMinusEqual, inputConfig)
+
+    values = list(initialValues)
+    if matchEqual:
+        values = buildutils.qmakeStringToList(matchEqual.groups()[0])
+    for match in matchPlusEqual:
+        values.extend(buildutils.qmakeStringToList(match[0]))
+    for match in matchMinusEqual:
+        strings = buildutils.qmakeStringToList(match[0])
+        values = [ s for s in values if (s not in strings) ]
+    return values
+
+
+# Queries all variables using the regex implementation
+def parseWithRegex(content):
+    return [regexGetQmakeVariable(name, content, initial) for name, initial in queriedVariables]
+
+
+# Queries all variables using the tokenizer
+def parseWithTokenizer(content):
+    assignments = buildutils.parseQmakeAssignments(content)
+    return [buildutils.getQmakeVariable(name, assignments, initial) for name, initial in queriedVariables]
+
+
+# Returns a synthetic project file content, with many variables with many values
+def makeSyntheticContent():
+    lines = ["TEMPLATE = lib", "CONFIG += warn_on", "QT += widgets network", ""]
+    for i in range(20):
+        lines.append("MY_VARIABLE_%d = \\" % i)
+        for j in range(30):
+            lines.append("    value_%d_%d \\" % (i, j))
+        lines.append("")
+    lines.append("LIB_DEPENDS = \\")
+    for j in range(30):
+        lines.append("    Group%d/Lib%d \\" % (j % 5, j))
+    lines.append("")
+    lines.append("SOURCES += \\")
+    for j in range(200):
+        lines.append("    File%d.cpp \\" % j)
+    lines.append("")
+    return "\n".join(lines)
+
+
+# Returns the contents of all project files in the given directory
+def readProjectFiles(dirPath):
+    contents = []
+    for dirpath, dirnames, filenames in os.walk(dirPath):
+        for filename in filenames:
+            if filename.endswith('.pro'):
+                contents.append(buildutils.readFromFile(os.path.join(dirpath, filename)))
+    return contents
+
+
+# Returns the time, in seconds, to parse all contents 'repeat' times
+def timeParse(parseFunction, contents, repeat):
+    start = time.time()
+    for i in range(repeat):
+        for content in contents:
+            parseFunction(content)
+    return time.time() - start
+
+
+# Prints a comparison of both implementations on the given contents
+def benchmark(title, contents, repeat):
+    mismatches = 0
+    for content in contents:
+        if parseWithRegex(content) != parseWithTokenizer(content):
+            mismatches += 1
+
+    regexTime     = timeParse(parseWithRegex, contents, repeat)
+    tokenizerTime = timeParse(parseWithTokenizer, contents, repeat)
+    numParses = len(contents) * repeat
+
+    print("%s (%d files, %d repeats)" % (title, len(contents), repeat))
+    print("    regex:     %8.1f us/file" % (1e6 * regexTime / numParses))
+    print("    tokenizer: %8.1f us/file" % (1e6 * tokenizerTime / numParses))
+    print("    speedup:   %8.1fx" % (regexTime / max(tokenizerTime, 1e-9)))
+    print("    files with different results: %d" % mismatches)
+
+
+if __name__ == "__main__":
+    scriptDir = os.path.dirname(os.path.abspath(__file__))
+    if len(sys.argv) > 1:
+        dirPath = sys.argv[1]
+    else:
+        dirPath = os.path.join(scriptDir, '..', 'src')
+    if len(sys.argv) > 2:
+        repeat = int(sys.argv[2])
+    else:
+        repeat = 200
+
+    benchmark("Project files in " + dirPath, readProjectFiles(dirPath), repeat)
+    benchmark("Synthetic project file", [makeSyntheticContent()], repeat)
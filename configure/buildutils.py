@@ -6,6 +6,12 @@ import os
 import shutil
 import errno
 import re
+import json
+import hashlib
+import multiprocessing
+import multiprocessing.pool
+
+import instrument
 
 runtests_pro = (
 """
@@ -73,6 +79,8 @@ def readFromFile(filePath):
     f = open(filePath, 'r')
     content = f.read()
     f.close()
+    instrument.count('filesRead')
+    instrument.count('bytesRead', len(content))
     return content
 
 # Reads content from file. Returns "" if file doesn't exist.
@@ -99,22 +107,257 @@ def writeToFileIfDifferent(filePath, fileContent):
     else:
         writeToFile(filePath, fileContent)
 
+# Same as writeToFile, but the content is first written to a temporary file
+# which is then renamed, so that readers (e.g., qmake, or another configure
+# run) never see a partially written file.
+def writeToFileAtomically(filePath, fileContent):
+    tmpFilePath = filePath + '.tmp'
+    writeToFile(tmpFilePath, fileContent)
+    try:
+        os.rename(tmpFilePath, filePath)
+    except OSError:
+        # On Windows, rename fails if the destination exists
+        os.remove(filePath)
+        os.rename(tmpFilePath, filePath)
+
+# Calls function(arg), and returns its result along with the instrumentation
+# counters incremented by the call. Called by worker processes of parallelMap().
+def _callAndCount(functionAndArg):
+    function, arg = functionAndArg
+    previousCounters = dict(instrument.counters)
+    return (function(arg), instrument.getCountersSince(previousCounters))
+
+# Returns [ function(arg) for arg in args ], computed by a pool of numJobs
+# worker processes, or threads if useThreads is True. Results are returned in
+# the same order as args, therefore callers get the same result as in serial.
+# With processes, function and args must be picklable (e.g., function must be
+# defined at module level). Falls back to threads if processes can't be
+# created on this system. Instrumentation counters incremented by worker
+# processes are added to the counters of this process.
+def parallelMap(function, args, numJobs, useThreads=False):
+    if numJobs <= 1 or len(args) <= 1:
+        return [function(arg) for arg in args]
+
+    numJobs = min(numJobs, len(args))
+    pool = None
+    if not useThreads:
+        try:
+            pool = multiprocessing.Pool(numJobs)
+        except (OSError, ImportError):
+            pool = None
+    if pool is None:
+        pool = multiprocessing.pool.ThreadPool(numJobs)
+
+    try:
+        chunksize = max(1, len(args) // (4 * numJobs))
+        if useThreads:
+            return pool.map(function, args, chunksize)
+        results = pool.map(_callAndCount, [(function, arg) for arg in args], chunksize)
+        for result, counters in results:
+            instrument.addCounters(counters)
+        return [result for result, counters in results]
+    finally:
+        pool.close()
+        pool.join()
+
+# Returns whether a file modified at 'mtime' is "racy" at 'checkedAt', the
+# time at which it was read, or at which a cache recording its modification
+# time was saved. Modification times may only have a precision of one second,
+# so a file modified within the same second may be modified again without
+# changing its modification time: the content of racy files must be read
+# again instead of being trusted from their modification time.
+def isRacy(mtime, checkedAt):
+    return mtime >= checkedAt - 1
+
+# Returns the hexadecimal md5 digest of the given string.
+def getContentHash(content):
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    return hashlib.md5(content).hexdigest()
+
+# Converts unicode strings returned by the json module back to plain strings,
+# recursively. This is a no-op with Python 3.
+def _jsonToStr(value):
+    if isinstance(value, dict):
+        return dict((_jsonToStr(k), _jsonToStr(v)) for k, v in value.items())
+    elif isinstance(value, list):
+        return [_jsonToStr(v) for v in value]
+    elif not isinstance(value, str) and isinstance(value, type(u"")):
+        return value.encode('utf-8')
+    else:
+        return value
+
+# Reads a JSON file. Returns None if the file doesn't exist or is corrupted,
+# which callers should treat as an empty cache.
+def readJsonFile(filePath):
+    if not os.path.isfile(filePath):
+        return None
+    try:
+        return _jsonToStr(json.loads(readFromFile(filePath)))
+    except ValueError:
+        return None
+
+# Writes the given object to a JSON file. Creates directories as necessary.
+def writeJsonFile(filePath, value):
+    writeToFileAtomically(filePath, json.dumps(value, sort_keys=True))
+
+
+#----------------------- Parsing qmake project files --------------------------
+
+# Regular expressions used to parse qmake project files. They are compiled once
+# and each of them scans the content once, instead of scanning it with three
+# regular expressions per queried variable.
+#
+# An assignment is a variable name, an operator, and a list of values,
+# optionally preceded by a scope condition ending with ':' or '{', e.g.:
+#
+#     unix:QMAKE_CXXFLAGS += -Wall
+#     unix { QT += x11extras }
+#
+commentLineRegExp  = re.compile(r"\n[ \t]*#[^\n]*")
+commentRegExp      = re.compile(r"#[^\n]*")
+continuationRegExp = re.compile(r"\\[ \t\r]*\n")
+assignmentRegExp   = re.compile(r"\n(?:[^=\n]*?[:{])?[ \t]*([A-Za-z_][\w.]*)[ \t]*([-+*~]?=)([^\n]*)")
+statementRegExp    = re.compile(r"^(?:[^=]*?[:{])?\s*([A-Za-z_][\w.]*)\s*([-+*~]?=)(.*)$")
+valueRegExp        = re.compile(r'(?:"[^"]*"|[^\s"])+')
+
+# Splits a line into statements, using the braces of scopes, e.g.:
+#
+#     x11extras } else { QT += y  ->  [ "x11extras ", " else ", " QT += y" ]
+#
+# Braces of variable expansions such as $${TARGET} are not considered.
+def _splitScopeBraces(line):
+    statements = []
+    start = 0
+    depth = 0
+    for i, c in enumerate(line):
+        if c == '{':
+            if line[i-2:i] == '$$':
+                depth += 1
+            elif depth == 0:
+                statements.append(line[start:i])
+                start = i + 1
+        elif c == '}':
+            if depth > 0:
+                depth -= 1
+            else:
+                statements.append(line[start:i])
+                start = i + 1
+    statements.append(line[start:])
+    return statements
+
+# Appends to the given dictionary an assignment whose values are given as an
+# unparsed string. If the string closes a scope, e.g. " x11extras }", then
+# the statements following the closing brace are parsed as well.
+def _addAssignment(assignments, variableName, operator, string):
+    otherStatements = []
+    if '}' in string:
+        statements = _splitScopeBraces(string)
+        string = statements[0]
+        otherStatements = statements[1:]
+
+    if '"' in string:
+        values = valueRegExp.findall(string)
+        instrument.count('regexEvaluations')
+    else:
+        values = string.split()
+    assignments.setdefault(variableName, []).append((operator, values))
+
+    for statement in otherStatements:
+        match = statementRegExp.match(statement)
+        instrument.count('regexEvaluations')
+        if match:
+            _addAssignment(assignments, *match.groups())
+
+# Reads the given qmake project file content in a single pass, and returns a
+# dictionary mapping each assigned variable to the list of its assignments, in
+# order of appearance. Each assignment is a pair (operator, values), where
+# operator is one of '=', '+=', '-=', '*=', '~='.
+#
+# Example input:
+#
+# """
+# TEMPLATE = lib
+# QT += widgets   # Comments are ignored
+#
+# LIB_DEPENDS = \\
+#     Core \\
+#     Gui/Widgets
+# """
+#
+# Example output:
+#
+# { 'TEMPLATE':    [ ('=',  ['lib']) ],
+#   'QT':          [ ('+=', ['widgets']) ],
+#   'LIB_DEPENDS': [ ('=',  ['Core', 'Gui/Widgets']) ] }
+#
+# Lines ending with a backslash are joined with the next line. Lines which
+# only contain a comment do not interrupt such continued lines.
+#
+def parseQmakeAssignments(content):
+    # Prepend a newline, so that all lines, including the first one, start
+    # after a newline. Patterns starting with a literal are much faster to scan.
+    content = "\n" + content
+
+    # Remove comments. Lines only made of a comment are removed with their
+    # newline, so that they do not interrupt continued lines.
+    if '#' in content:
+        content = commentLineRegExp.sub("", content)
+        content = commentRegExp.sub("", content)
+        instrument.count('regexEvaluations', 2)
+
+    # Join continued lines
+    if '\\' in content:
+        content = content.replace('\\\n', ' ')
+        if '\\' in content:
+            content = continuationRegExp.sub(" ", content)
+            instrument.count('regexEvaluations')
+
+    # Find all assignments
+    assignments = {}
+    instrument.count('regexEvaluations')
+    for match in assignmentRegExp.finditer(content):
+        _addAssignment(assignments, *match.groups())
+    return assignments
+
+# Last content parsed by getAssignments(), with the result. Stored as a single
+# tuple so that it can safely be read and replaced from several threads.
+_lastParsed = (None, {})
+
+# Returns the assignments defined in inputConfig, which is either the content
+# of a project file, or its assignments as returned by parseQmakeAssignments().
+# The content is only parsed once when several variables are queried in a row.
+def getAssignments(inputConfig):
+    global _lastParsed
+    if isinstance(inputConfig, dict):
+        return inputConfig
+    lastParsed = _lastParsed
+    if lastParsed[0] is inputConfig:
+        return lastParsed[1]
+    assignments = parseQmakeAssignments(inputConfig)
+    _lastParsed = (inputConfig, assignments)
+    return assignments
+
+# Returns the values of the first '=' assignment to the given qmake variable
+# 'variableName' in inputConfig. Returns None if the variable is not found.
+def _getFirstEqualValues(variableName, inputConfig):
+    for operator, values in getAssignments(inputConfig).get(variableName, []):
+        if operator == '=':
+            return values
 
 # Returns as a string the value of the given qmake variable 'variableName',
 # defined in the given inputConfig. Returns None if the variable
 # is not found.
 def getVariableValueAsString(variableName, inputConfig):
-    regexPattern = variableName + r"\s*=([^\n\\]*(\\[^\S\n]*\n[^\n\\]*)*)"
-    match = re.search(regexPattern, inputConfig)
-    if match:
-        # Matched string (something like " \\\n    value1 \\\n    value2")
-        return match.groups()[0]
+    values = _getFirstEqualValues(variableName, inputConfig)
+    if values is not None:
+        return " ".join(values)
 
 # Returns the TEMPLATE value parsed from the given string.
 def getTemplate(string):
-    match = re.search(r"TEMPLATE\s*=\s*\b(\w+)\b", string)
-    if match:
-        return match.groups()[0]
+    values = _getFirstEqualValues('TEMPLATE', string)
+    if values:
+        return values[0]
 
 # Returns as a list the values of the given qmake variable 'variableName',
 # defined in the given inputConfig. Returns an empty list if the variable
@@ -155,14 +398,9 @@ def getTemplate(string):
 # However, it does not support the '+=' syntax.
 #
 def getVariableValuesAsList(variableName, inputConfig):
-    regexPattern = variableName + r"\s*=([^\n\\]*(\\[^\S\n]*\n[^\n\\]*)*)"
-    match = re.search(regexPattern, inputConfig)
-    if match:
-        # Matched string (something like " \\\n    value1 \\\n    value2")
-        depends = match.groups()[0]
-
-        # Convert to beautiful list (something like ["value1", "value2"])
-        return re.findall(r"[/\w']+", depends)
+    values = _getFirstEqualValues(variableName, inputConfig)
+    if values is not None:
+        return list(values)
     else:
         # Return an empty list if not found
         return []
@@ -179,41 +417,26 @@ def qmakeStringToList(s):
     return re.findall(r"[/\w']+", s)
 
 # Returns as a list the values of the given qmake variable 'variableName',
-# defined in the given inputConfig. Returns an empty list if the variable
-# is not found. Take into account =, +=, and -=. Though, does not take
-# into account order. Only the first '=' is taken into account. All +=
-# are processed before all -=.
+# defined in inputConfig (either the content of a project file, or its parsed
+# assignments). Returns an empty list if the variable is not found. Takes into
+# account =, +=, *= and -=, in order of appearance. Scopes, include() and
+# variable expansions are not supported: configure.py evaluates project files
+# with qmakeeval.py instead.
 def getQmakeVariable(variableName, inputConfig, initialValues=[]):
-    # Regex pattern
-    regexPattern = variableName + r"\s*_SIGN_([^\n\\]*(\\[^\S\n]*\n[^\n\\]*)*)"
-    regexPatternEqual      = regexPattern.replace("_SIGN_", r"=")
-    regexPatternPlusEqual  = regexPattern.replace("_SIGN_", r"\+=")
-    regexPatternMinusEqual = regexPattern.replace("_SIGN_", r"-=")
-
-    # Search for regex
-    matchEqual      = re.search(regexPatternEqual, inputConfig)
-    matchPlusEqual  = re.findall(regexPatternPlusEqual, inputConfig)
-    matchMinusEqual = re.findall(regexPatternMinusEqual, inputConfig)
-
-    # Initial value
-    values = initialValues
-
-    # Override if '=' found
-    if matchEqual:
-        string = matchEqual.groups()[0]
-        values = qmakeStringToList(string)
-
-    # Add all '+=' found
-    for match in matchPlusEqual:
-        string = match[0]
-        values.extend(qmakeStringToList(string))
-
-    # Remove all '-=' found
-    for match in matchMinusEqual:
-        string = match[0]
-        strings = qmakeStringToList(string)
-        values = [ s for s in values if (s not in strings) ]
+    # Initial value (copied, so that the caller's list is never modified)
+    values = list(initialValues)
+
+    # Apply all assignments to this variable, in order
+    for operator, operatorValues in getAssignments(inputConfig).get(variableName, []):
+        if operator == '=':
+            values = list(operatorValues)
+        elif operator == '+=':
+            values.extend(operatorValues)
+        elif operator == '*=':
+            for s in operatorValues:
+                if s not in values:
+                    values.append(s)
+        elif operator == '-=':
+            values = [ s for s in values if (s not in operatorValues) ]
 
     return values
-
-
@@ -1,7 +1,24 @@
 # Add python scripts to project
 DISTFILES += \
+    $$PWD/artifactcache.py \
+    $$PWD/benchconfigure.py \
+    $$PWD/benchparse.py \
     $$PWD/buildutils.py \
-    $$PWD/configure.py
+    $$PWD/configure.py \
+    $$PWD/depgraph.py \
+    $$PWD/depindex.py \
+    $$PWD/discovery.py \
+    $$PWD/includescan.py \
+    $$PWD/instrument.py \
+    $$PWD/manifest.py \
+    $$PWD/multiconfigure.py \
+    $$PWD/ninjagen.py \
+    $$PWD/parsecache.py \
+    $$PWD/qmakeeval.py \
+    $$PWD/schedule.py \
+    $$PWD/stamp.py \
+    $$PWD/testconfigure.py \
+    $$PWD/watch.py
 
 # Execute configure.py python script
 unix:  system(python     configure.py $$_PRO_FILE_PWD_ $$OUT_PWD $$CONFIG)
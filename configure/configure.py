@@ -45,6 +45,11 @@
 # 'LIBS_DEPENDS' and 'THIRD_DEPENDS' are custom variables ignored by qmake, but
 # parsed by this configure.py script.
 #
+# Project files are evaluated like qmake does: assignments in order, scopes
+# (e.g., unix:, CONFIG(debug, debug|release) { ... } else { ... }), include()
+# of .pri files, and $$VAR expansions (see qmakeeval.py). A .pri file included
+# by many projects is only tokenized once.
+#
 # After being parsed, the script will compute the "transitive closure" of the
 # dependencies, which is just a fancy name to say that:
 #
@@ -58,6 +63,63 @@
 # ensure that at link time, libraries are specified from most dependent to
 # least dependent.
 #
+# Parsing all project files is slow on large distributions, therefore the
+# parsed values are cached in <root-out-dir>/.configure/parsecache.json, and
+# project files are only parsed again when they change (see parsecache.py).
+# Similarly, the direct dependencies between projects are stored in
+# depindex.json, and only the projects downstream of a changed dependency are
+# computed and generated again (see depindex.py). If no project file changed
+# at all since the last run, this script exits immediately (see stamp.py).
+#
+# Only directories containing project files, or listed in SUBDIRS, are searched
+# for project files. Other directories can also be excluded by listing them in
+# <root-dir>/.configureignore (see discovery.py).
+#
+# While editing project files, watch.py can be run with the same arguments as
+# this script. It keeps all projects in memory and, whenever a project file is
+# saved, only regenerates the .config.pri files affected by the change.
+#
+# To configure several variants of the build at once (e.g., debug and release
+# build directories), multiconfigure.py finds and parses project files and
+# computes their dependencies once, then generates the .config.pri files of
+# all variants concurrently.
+#
+# Libraries with 'unity' in CONFIG (e.g., qmake CONFIG+=unity) are built in
+# unity mode: their sources are compiled in batches of UNITY_BATCH_SIZE, each
+# batch being a generated unity_<k>.cpp file including the sources, except
+# those listed in UNITY_EXCLUDE (see getUnityBatches()). Similarly, libraries
+# with 'auto_pch' in CONFIG precompile the Qt and library headers their
+# sources include most often (see getPrecompiledHeaders()).
+#
+# On Unix, libraries with 'shared_libs' in CONFIG (e.g., qmake
+# CONFIG+=shared_libs) are built as shared libraries instead of static ones,
+# so that modifying a library only relinks this library, not every app
+# depending on it. Libraries without sources are header-only: nothing is
+# built for them, and they are not linked (see getLinkMode()).
+#
+# On Unix, with 'stage_libs' in the CONFIG passed to this script (e.g., qmake
+# CONFIG+=stage_libs), all libraries are staged in <root-out-dir>/lib, and
+# projects link them with a single -L instead of one per library (see
+# stageLibs()).
+#
+# When the CONFIGURE_NINJA environment variable is set to 1, this script also
+# writes <root-out-dir>/build.ninja, building all libraries and apps in a
+# single Ninja build graph instead of recursive Makefiles (see ninjagen.py).
+#
+# Projects on the critical path of the build, i.e., the heaviest chain of
+# dependencies, are listed first in SUBDIRS and build.ninja, so that parallel
+# builds start them first. The analysis is written to .configure/schedule.txt
+# (see schedule.py).
+#
+# When the CONFIGURE_SCAN_INCLUDES environment variable is set to 1, the
+# #include directives of all sources are scanned to report unused and missing
+# LIB_DEPENDS and THIRD_DEPENDS in .configure/includes.txt (see includescan.py).
+#
+# When the CONFIGURE_ARTIFACT_CACHE environment variable is set to a directory,
+# the static libraries built are stored there, keyed by a hash of their
+# inputs, and restored instead of being rebuilt when their inputs are the same
+# again, e.g., after switching branches (see artifactcache.py).
+#
 #
 # 2. Generating unit test folders and files
 # -----------------------------------------
@@ -77,65 +139,139 @@
 # Built-in modules
 import sys
 import os
+
+# Environment variables the generated files depend on, as name=value strings
+def getStampEnvironment():
+    return [name + '=' + os.environ.get(name, '')
+            for name in ['CONFIGURE_NINJA', 'CONFIGURE_SCAN_INCLUDES', 'CONFIGURE_ARTIFACT_CACHE',
+                         'CONFIGURE_ARTIFACT_CACHE_SIZE', 'CONFIGURE_ARTIFACT_CACHE_AGE',
+                         'CXX', 'AR', 'CXXFLAGS', 'LDFLAGS', 'QMAKE', 'QMAKESPEC']]
+
+# Exit immediately if nothing changed since the last run (see stamp.py),
+# before importing other modules. Set the CONFIGURE_STAMP environment variable
+# to 0 to always run all steps. This is not done when this script is imported,
+# e.g., by watch.py.
+if __name__ == "__main__" and os.environ.get('CONFIGURE_STAMP', '1') != '0':
+    import stamp
+    if stamp.isUpToDate(sys.argv[2] + '/.configure/stamp.txt', sys.argv[1:] + getStampEnvironment()):
+        sys.exit(0)
+
 import shutil
 import errno
+import time
 import re
+import multiprocessing
 
-# Custom module
+# Custom modules
 import buildutils
+import parsecache
+import depgraph
+import discovery
+import manifest
+import instrument
+import depindex
+import stamp
+import ninjagen
+import schedule
+import includescan
+import artifactcache
 
 
 #--------------- Arguments passed to this script by qmake ---------------------
 
+# The arguments of this script, and all the variables derived from them or
+# from environment variables, are set by setArguments(), called when this
+# script is run, or by the scripts importing it (e.g., watch.py). Importing
+# this module does nothing else than defining them, so that processes
+# importing it again (e.g., worker processes started with the 'spawn' method
+# of multiprocessing, on Windows) do not run any step.
+
 # <root-dir> directory
-rootDir = sys.argv[1]
+rootDir = ''
 
-# <root-out-dir> directory (= build directory)
-rootOutDir = sys.argv[2]
+# <root-out-dir> directory (= build directory), and qmake CONFIG variable
+# value. They define the variant of the build: they are set, as well as all
+# the variables derived from them, by setVariant().
+rootOutDir = ''
+config = []
 
-# qmake CONFIG variable value
-config = sys.argv[3:]
+# Arguments of this script, and environment variables the generated files
+# depend on (see stamp.py)
+stampArgs = []
+
+# Number of errors reported during this run, of which the number reported by
+# setVariant() for the current variant. The stamp file is not written if
+# errors were reported, so that the next run reports them again.
+numErrors = 0
+numVariantErrors = 0
+
+# Prints the given error message, and counts it
+def printError(message):
+    global numErrors
+    numErrors += 1
+    print "Error: " + message
 
 
 #--------------- Useful configuration variables -------------------------------
 
 # Test if building on a Unix system
 # This is determined by the presence of "unix" in CONFIG
-if 'unix' in config:
-    unix = True
-else:
-    unix = False
+unix = False
 
 # Test if building on a Windows system
 # This is determined by the presence of "win32" in CONFIG
-if 'win32' in config:
-    win32 = True
-else:
-    win32 = False
+win32 = False
 
 # Test if building in release or debug mode
 # This is determined by which of 'release' and 'debug' appears last in CONFIG
 release = True
 debug = False
-for s in config:
-    if s == 'release':
-        release = True
-        debug = False
-    elif s == 'debug':
-        release = False
-        debug = True
 
 # Convenient variable holding a string equals to either 'release' or 'debug'
-if release:
-    releaseOrDebug = 'release'
-else:
-    releaseOrDebug = 'debug'
+releaseOrDebug = 'release'
+
+# Number of parallel jobs used to find and parse project files, set by the
+# CONFIGURE_JOBS environment variable. The default (1) runs everything
+# serially, 0 uses one job per CPU core. The generated files are identical
+# whatever the number of jobs.
+numJobs = 1
+
+# Whether directory listings of src/ are cached between runs (see
+# discovery.py). Set the CONFIGURE_DIR_INDEX environment variable to 0 to
+# always list all directories.
+useDirIndex = True
+
+# Whether the cost of each step of the script is recorded (see instrument.py),
+# set by the CONFIGURE_PROFILE environment variable. Set it to 1 to write
+# reports to <root-out-dir>/.configure/, or to 'cprofile' to also run each step
+# under cProfile and dump the statistics of the slowest one.
+profileMode = ''
+
+# Whether <root-out-dir>/build.ninja is generated (see ninjagen.py), set by the
+# CONFIGURE_NINJA environment variable. Only supported on Unix.
+useNinja = False
+
+# Whether the #include directives of sources are scanned to report unused and
+# missing dependencies (see includescan.py), set by the CONFIGURE_SCAN_INCLUDES
+# environment variable
+useIncludeScan = False
+
+# Directory of the artifact cache of static libraries (see artifactcache.py),
+# set by the CONFIGURE_ARTIFACT_CACHE environment variable, or empty if the
+# cache is disabled. Only supported on Unix. The maximum size of the cache, in
+# megabytes, and the maximum age of its entries, in days, are set by the
+# CONFIGURE_ARTIFACT_CACHE_SIZE and CONFIGURE_ARTIFACT_CACHE_AGE environment
+# variables.
+artifactCacheDir = ''
+artifactCacheMaxSize = 2048
+artifactCacheMaxAge = 30
+
+# Whether libraries are staged in a single directory, set by 'stage_libs' in
+# the CONFIG passed to this script (see stageLibs()). Only supported on Unix.
+useStagedLibs = False
 
 # Python command depending on OS
-if win32:
-    pythonCmd = 'python.exe'
-else:
-    pythonCmd = 'python'
+pythonCmd = 'python'
 
 
 #------------------------- Useful directories ---------------------------------
@@ -143,19 +279,45 @@ else:
 # Note: we use forward slashes even on Windows, since this is what qmake
 # expects. For this reason, we do not use os.path.join.
 
-buildtoolsDir = rootDir + '/buildtools'
+# Directories of <root-dir>, e.g., <root-dir>/src (see setArguments)
+buildtoolsDir = ''
+
+srcDir   = ''
+appDir   = ''
+libsDir  = ''
+thirdDir = ''
+testsDir = ''
+
+# Output directories, e.g., <root-out-dir>/src (see setVariant)
+srcOutDir   = ''
+appOutDir   = ''
+libsOutDir  = ''
+thirdOutDir = ''
+testsOutDir = ''
+
+# Directory where configure.py stores data persisting between runs, such
+# as caches. It is never read by qmake.
+configureOutDir = ''
 
-srcDir   = rootDir + '/src'
-appDir   = rootDir + '/src/app'
-libsDir  = rootDir + '/src/libs'
-thirdDir = rootDir + '/src/third'
-testsDir = rootDir + '/tests'
+# Directory where libraries are staged (see stageLibs)
+stagedLibsDir = ''  # <root-out-dir>/lib
 
-srcOutDir   = rootOutDir + '/src'
-appOutDir   = rootOutDir + '/src/app'
-libsOutDir  = rootOutDir + '/src/libs'
-thirdOutDir = rootOutDir + '/src/third'
-testsOutDir = rootOutDir + '/tests'
+# Directory containing this script
+scriptDir = os.path.dirname(os.path.abspath(__file__))
+
+# File listing directories of src/ that are never searched for project files
+ignoreFilePath = ''  # <root-dir>/.configureignore
+
+# Files of <root-out-dir>, set by setVariant(): stamp file of the last run
+# (see stamp.py), Ninja build file of the distribution (see ninjagen.py),
+# dependencies found by scanning #include directives (see includescan.py),
+# critical-path analysis of the last run (see schedule.py), and Ninja log of
+# the last build providing the build time of each project
+stampFilePath    = ''  # <root-out-dir>/.configure/stamp.txt
+ninjaFilePath    = ''  # <root-out-dir>/build.ninja
+includesFilePath = ''  # <root-out-dir>/.configure/includes.txt
+scheduleFilePath = ''  # <root-out-dir>/.configure/schedule.txt
+ninjaLogFilePath = ''  # <root-out-dir>/.configure/.ninja_log
 
 
 #---------------------------- Text content ------------------------------------
@@ -173,10 +335,6 @@ makelibtestsText = (
 # Generate unit tests for new header files
 system(%pythonCmd %buildtoolsDir/makelibtests.py %rootDir %rootOutDir $$_PRO_FILE_PWD_ $$OUT_PWD $$CONFIG)
 """
-.replace('%pythonCmd',     pythonCmd)
-.replace('%buildtoolsDir', buildtoolsDir)
-.replace('%rootDir',       rootDir)
-.replace('%rootOutDir',    rootOutDir)
 )
 
 makesubdirstestsText = (
@@ -184,10 +342,6 @@ makesubdirstestsText = (
 # Generate unit tests for new libraries
 system(%pythonCmd %buildtoolsDir/makesubdirstests.py %rootDir %rootOutDir $$_PRO_FILE_PWD_ $$OUT_PWD $$CONFIG)
 """
-.replace('%pythonCmd',     pythonCmd)
-.replace('%buildtoolsDir', buildtoolsDir)
-.replace('%rootDir',       rootDir)
-.replace('%rootOutDir',    rootOutDir)
 )
 
 enableCpp11Text = (
@@ -204,13 +358,45 @@ CONFIG += staticlib
 """
 )
 
+sharedLibText = (
+"""
+# Compile as a shared library
+CONFIG += shared
+"""
+)
+
+headerOnlyLibText = (
+"""
+# Header-only library: nothing to compile or link
+TEMPLATE = aux
+"""
+)
+
+precompiledHeaderText = (
+"""
+# Precompile the headers included most often by sources
+CONFIG += precompile_header
+PRECOMPILED_HEADER = %pchFilePath
+"""
+)
+
+storeArtifactText = (
+"""
+# Store the library in the artifact cache once built (see artifactcache.py)
+isEmpty(QMAKE_POST_LINK) {
+    QMAKE_POST_LINK = %pythonCmd %scriptDir/artifactcache.py store $$OUT_PWD
+} else {
+    QMAKE_POST_LINK += && %pythonCmd %scriptDir/artifactcache.py store $$OUT_PWD
+}
+"""
+)
+
 includeText = (
 """
 # Add third-party libraries and internal libraries to INCLUDEPATH.
 INCLUDEPATH += %srcDir/third/
 INCLUDEPATH += %srcDir/libs/
 """
-.replace('%srcDir', srcDir)
 )
 
 includeTextUnixOnly = (
@@ -218,12 +404,8 @@ includeTextUnixOnly = (
 # Consider third-party libraries like system libraries (e.g., silence warnings)
 QMAKE_CXXFLAGS += $$QMAKE_CFLAGS_ISYSTEM %srcDir/third/
 """
-.replace('%srcDir', srcDir)
 )
 
-if unix:
-    includeText += includeTextUnixOnly
-
 
 #------------- text to add a lib this project depends on ----------------------
 
@@ -241,13 +423,27 @@ addLibTextWin32 = (
 LIBS += -L%libOutDir/%releaseOrDebug/ -l%libname
 PRE_TARGETDEPS += %libOutDir/%releaseOrDebug/%libname.lib
 """
-.replace('%releaseOrDebug', releaseOrDebug)
 )
 
-if unix:
-    addLibText = addLibTextUnix
-else:
-    addLibText = addLibTextWin32
+# Returns the given text content, with the commands and directories of the
+# current variant substituted (e.g., %pythonCmd, %rootOutDir). They are
+# substituted when generating files, not once for all, since they depend on
+# the variant (see setVariant).
+def expandText(text):
+    return (text.replace('%pythonCmd',     pythonCmd)
+                .replace('%buildtoolsDir', buildtoolsDir)
+                .replace('%scriptDir',     scriptDir)
+                .replace('%rootDir',       rootDir)
+                .replace('%rootOutDir',    rootOutDir)
+                .replace('%srcDir',        srcDir))
+
+addSharedLibText = (
+"""
+# Add dependency to %libRelDir (shared library, found at run time through rpath)
+LIBS += -L%libOutDir/ -l%libname
+QMAKE_RPATHDIR += %libOutDir
+"""
+)
 
 
 #---------- Project class to store info parsed from the .pro files ------------
@@ -293,11 +489,22 @@ class Project:
         self.third_depends  = []  # Parsed value of THIRD_DEPENDS, e.g.: [ "Geometry" ]
         self.lib_depends    = []  # Parsed value of LIB_DEPENDS,   e.g.: [ "Gui/Widgets" ]
 
+        self.sources     = []     # Parsed value of SOURCES,     e.g.: [ "MainWindow.cpp" ]
+        self.headers     = []     # Parsed value of HEADERS,     e.g.: [ "MainWindow.h" ]
+        self.forms       = []     # Parsed value of FORMS,       e.g.: [ "MainWindow.ui" ]
+        self.resources   = []     # Parsed value of RESOURCES,   e.g.: [ "resources.qrc" ]
+        self.defines     = []     # Parsed value of DEFINES,     e.g.: [ "USE_FOO" ]
+        self.includepath = []     # Parsed value of INCLUDEPATH, e.g.: [ "$$PWD/include" ]
+                                  #   These are only used by the Ninja backend (see ninjagen.py)
 
-        # Transitive closure of the depends relationships
+        self.unity_batch_size = []  # Parsed value of UNITY_BATCH_SIZE, e.g.: [ "8" ]
+        self.unity_exclude    = []  # Parsed value of UNITY_EXCLUDE,    e.g.: [ "Foo.cpp" ]
+
+        # Files included by the project file, e.g.: [ "<root-dir>/src/common.pri" ]
+        self.includedFilePaths = []
 
-        self.tdependsIsComputed      = False  # Prevent computing more than once
-        self.tdependsIsBeingComputed = False  # Detect cyclic dependencies
+
+        # Transitive closure of the depends relationships
 
         self.qt_tdepends    = set() # e.g., { "core", "gui", "widgets" }
         self.third_tdepends = set() # e.g., { "Geometry" }
@@ -307,15 +514,16 @@ class Project:
         # Transitive closure ordered via topological sort.
         # This specifies the order in which libs should be linked against.
 
-        self.qt_sdepends    = set() # e.g., [ "core", "gui", "widgets" ]
-        self.third_sdepends = set() # e.g., [ "Geometry" ]
-        self.lib_sdepends   = set() # e.g., [ "Core", "Gui/Widgets" ]
+        self.qt_sdepends    = [] # e.g., [ "core", "gui", "widgets" ]
+        self.third_sdepends = [] # e.g., [ "Geometry" ]
+        self.lib_sdepends   = [] # e.g., [ "Core", "Gui/Widgets" ]
 
 
         # Parent/child relationship between projects
 
         self.parentProject = None
         self.subProjects = []
+        self.ancestors = []  # Computed by getAncestors()
 
 
         # Subdir dependencies (computed from lib dependencies)
@@ -340,6 +548,34 @@ class Project:
                                         #     { "Widgets" }        for src/libs/Gui/Windows/Windows.pro
 
 
+        # Unity build (see getUnityBatches())
+
+        self.unityBatches = []  # SOURCES compiled together, e.g.: [ [ "Foo.cpp", "Bar.cpp" ], [ "Baz.cpp" ] ]
+
+
+        # Precompiled header (see getPrecompiledHeaders())
+
+        self.pchHeaders = []  # Headers included by the precompiled header, e.g.: [ "QWidget", "Core/Foo.h" ]
+
+
+        # Artifact cache (see artifactcache.py)
+
+        self.artifactKey = ""            # Key of the files built for this lib
+        self.artifactInputPaths = []     # Files the key is computed from
+        self.isArtifactUpToDate = False  # Whether the files in outDir were built, or restored, from these inputs
+
+
+        # Link mode (see getLinkMode())
+
+        self.linkMode = ""  # For libs: "static", "shared", or "headers" if header-only
+
+
+        # Scheduling (see schedule.py)
+
+        self.priority = 0  # Weight of the heaviest chain of projects which can only be built after
+                           # this one, including it. For subdirs, the maximum over their libs and apps.
+
+
 # Dictionary storing all projects in <root-dir>/src, accessed by their relDir
 projects = {}
 
@@ -353,7 +589,7 @@ def getLibProject(libname):
     if ("libs/" + libname) in projects:
         return projects[("libs/" + libname)]
     else:
-        print "Error: library libs/" + libname + " not found."
+        printError("library libs/" + libname + " not found.")
 
 # Returns the third-party library project corresponding to the given libname.
 # libname is the path of the third-party library relative to third/
@@ -363,212 +599,408 @@ def getThirdProject(libname):
     if ("third/" + libname) in projects:
         return projects[("third/" + libname)]
     else:
-        print "Error: library third/" + libname + " not found."
+        printError("library third/" + libname + " not found.")
 
 
 #----------------------------- Actual script ----------------------------------
 
-# Find all project files in src/
-print "[configure.py] Finding project files"
-for x in os.walk(srcDir):
-    dirpath = x[0].replace('\\', '/') # manually replace backslashes with slashes for Windows
-    filenames = x[2]
-    for filename in filenames:
-        if filename.endswith('.pro'):
-
-            # Create project object
-            project = Project()
-
-            # Set project-related directories and file names
-            project.proFilePath = dirpath + '/' + filename  # <root-dir>/src/Path/To/Project/Project.pro
-
-            project.proFileName = filename       # Project.pro
-            project.name        = filename[:-4]  # Project
+# Cache of the fields parsed from project files (see parsecache.py), in
+# <root-out-dir>/.configure/parsecache.json. Set by setVariant().
+parseCache = None
 
-            project.dir    = dirpath                  # <root-dir>/src/Path/To/Project
-            project.relDir = dirpath[len(srcDir)+1:]  # Path/To/Project
+# Directories of src/ listed while finding project files
+searchedDirs = []
 
-            project.outDir = srcOutDir + dirpath[len(srcDir):]  # <root-out-dir>/src/Path/To/Project
+# Returns the SUBDIRS of the given project file. Used while finding project
+# files, to know which directories without project files must be searched.
+def getProjectFileSubdirs(proFilePath):
+    return parseCache.getFields(proFilePath)['subdirs']
 
-            project.priFileName = ".config.pri"                               # .config.pri
-            project.priFilePath = project.outDir + '/' + project.priFileName  # <root-out-dir>/src/Path/To/Project/.config.pri
+# Find all project files in src/ (see discovery.py). Directories of the same
+# level are listed in parallel if numJobs > 1. Projects are created in sorted
+# order, so that the result does not depend on the order in which directories
+# are listed.
+def findProjects():
+    print "[configure.py] Finding project files"
+    parseCache.load()
+    dirIndex = None
+    if useDirIndex:
+        dirIndex = discovery.DirIndex(configureOutDir + '/dirindex.json')
+        dirIndex.load()
 
-            # Insert in dictionary storing all projects, using relDir as the key
-            projects[project.relDir] = project
+    ignorePatterns = discovery.readIgnorePatterns(ignoreFilePath)
+    proFilePaths = discovery.findProjectFiles(srcDir, getProjectFileSubdirs, ignorePatterns, dirIndex, numJobs, searchedDirs)
 
+    if dirIndex:
+        dirIndex.save()
 
-# Parse projects
-print "[configure.py] Parsing project files"
-for relDir in projects:
-    # Get project
-    project = projects[relDir]
+    for proFilePath in sorted(proFilePaths):
+        dirpath, filename = proFilePath.rsplit('/', 1)
 
-    # Read project file, return as a string
-    data = buildutils.readFromFile(project.proFilePath)
+        # Create project object
+        project = Project()
 
-    # Parse relevant qmake variables
-    project.template = buildutils.getQmakeVariable('TEMPLATE', data)[0]
-    project.config   = buildutils.getQmakeVariable('CONFIG', data, config)
+        # Set project-related directories and file names
+        project.proFilePath = dirpath + '/' + filename  # <root-dir>/src/Path/To/Project/Project.pro
 
-    if 'qt' in project.config:
-        project.qt = buildutils.getQmakeVariable('QT', data, ["core", "gui"])
-    else:
-        project.qt = []
+        project.proFileName = filename       # Project.pro
+        project.name        = filename[:-4]  # Project
 
-    project.subdirs        = buildutils.getQmakeVariable('SUBDIRS', data)
-    project.third_depends  = buildutils.getQmakeVariable('THIRD_DEPENDS', data)
-    project.lib_depends    = buildutils.getQmakeVariable('LIB_DEPENDS', data)
+        project.dir    = dirpath                  # <root-dir>/src/Path/To/Project
+        project.relDir = dirpath[len(srcDir)+1:]  # Path/To/Project
 
+        project.outDir = srcOutDir + dirpath[len(srcDir):]  # <root-out-dir>/src/Path/To/Project
 
-# Recursive function that computes the transitive closure of the depends
-# relationships of the given project.
-#
-# This function terminates thanks to "leaf-projects" which do not depend on
-# any other libraries, i.e. projects for which:
-#     len(project.third_depends) == 0 and
-#     len(project.lib_depends) == 0
-#
-# Cyclic dependencies are detected and reported as an error.
-#
-def computeTDepends(project):
-    # Do nothing if already computed
-    if project.tdependsIsComputed:
-        pass
+        project.priFileName = ".config.pri"                               # .config.pri
+        project.priFilePath = project.outDir + '/' + project.priFileName  # <root-out-dir>/src/Path/To/Project/.config.pri
 
-    # Detect cyclic dependencies
-    if project.tdependsIsBeingComputed:
-        print "Error:", project.name, "has a cyclic dependency."
-        pass
+        # Insert in dictionary storing all projects, using relDir as the key
+        projects[project.relDir] = project
 
-    # Mark as being computed
-    project.tdependsIsBeingComputed = True
 
-    # Initialize
-    project.qt_tdepends    = set(project.qt)
-    project.third_tdepends = set(project.third_depends)
-    project.lib_tdepends   = set(project.lib_depends)
+# Parse projects. Projects whose project file didn't change since the last
+# run are loaded from the parse cache instead (parseCache is loaded by
+# findProjects()). Other project files are read and parsed in parallel if
+# numJobs > 1.
+def parseProjects():
+    print "[configure.py] Parsing project files"
 
-    # Recurse for third-party libraries
+    # Get fields of unchanged project files from cache, or of project files
+    # already parsed while finding project files
+    fieldsByRelDir = {}
+    relDirsToRead = []
+    for relDir in sorted(projects):
+        fields = parseCache.getUnchangedFields(projects[relDir].proFilePath)
+        if fields is None:
+            relDirsToRead.append(relDir)
+        else:
+            fieldsByRelDir[relDir] = fields
+
+    # Read and parse the other project files
+    args = []
+    for relDir in relDirsToRead:
+        args.append(parseCache.getReadArgs(projects[relDir].proFilePath))
+    results = buildutils.parallelMap(parsecache.readProjectFile, args, numJobs)
+    for relDir, result in zip(relDirsToRead, results):
+        fieldsByRelDir[relDir] = parseCache.setReadResult(projects[relDir].proFilePath, result)
+    parseCache.save()
+
+    # Set parsed values of relevant qmake variables
+    for relDir in projects:
+        setProjectFields(projects[relDir], fieldsByRelDir[relDir])
+
+
+# Returns the files included by project files, sorted, e.g., .pri files shared
+# by several projects. They are inputs of this script, like project files.
+def getIncludedFilePaths():
+    res = set()
+    for relDir in projects:
+        res.update(projects[relDir].includedFilePaths)
+    return sorted(res)
+
+# Returns the project files including the given file, sorted
+def getProFilePathsIncluding(filePath):
+    return sorted(projects[relDir].proFilePath for relDir in projects
+                  if filePath in projects[relDir].includedFilePaths)
+
+# Set parsed values of relevant qmake variables of the given project, from the
+# fields returned by parsecache.parseProjectFile()
+def setProjectFields(project, fields):
+    project.template       = fields['template']
+    project.config         = list(fields['config'])
+    project.qt             = list(fields['qt'])
+    project.subdirs        = list(fields['subdirs'])
+    project.third_depends  = list(fields['third_depends'])
+    project.lib_depends    = list(fields['lib_depends'])
+    project.sources        = list(fields['sources'])
+    project.headers        = list(fields['headers'])
+    project.forms          = list(fields['forms'])
+    project.resources      = list(fields['resources'])
+    project.defines        = list(fields['defines'])
+    project.includepath    = list(fields['includepath'])
+    project.unity_batch_size = list(fields['unity_batch_size'])
+    project.unity_exclude    = list(fields['unity_exclude'])
+    project.includedFilePaths = list(fields['includes'])
+
+
+# Returns the relDirs of the projects the given project directly depends on.
+# Missing projects are reported as errors, and ignored.
+def getDirectDependees(project):
+    dependees = []
     for libname in project.third_depends:
-        thirdProject = getThirdProject(libname)
-        computeTDepends(thirdProject)
-        project.qt_tdepends    = project.qt_tdepends.union   (thirdProject.qt_tdepends)
-        project.third_tdepends = project.third_tdepends.union(thirdProject.third_tdepends)
-
-    # Recurse for internal libraries
+        if getThirdProject(libname):
+            dependees.append("third/" + libname)
     for libname in project.lib_depends:
-        libProject = getLibProject(libname)
-        computeTDepends(libProject)
-        project.qt_tdepends    = project.qt_tdepends.union   (libProject.qt_tdepends)
-        project.third_tdepends = project.third_tdepends.union(libProject.third_tdepends)
-        project.lib_tdepends   = project.lib_tdepends.union  (libProject.lib_tdepends)
-
-    # Mark as computed
-    project.tdependsIsBeingComputed = False
-    project.tdependsIsComputed = True
-
-
-# Compute the transitive closure of all projects dependencies
-for relDir in projects:
-    # Get project
-    project = projects[relDir]
-
-    # Compute tDepends
-    computeTDepends(project)
-
-
-# Compare method to sort third-party libraries from least dependent to most dependent
-def thirdLessThan(libname1, libname2):
-    thirdProject1 = getThirdProject(libname1)
-    thirdProject2 = getThirdProject(libname2)
-    if libname1 in thirdProject2.third_tdepends:
-        return -1
-    elif libname2 in thirdProject1.third_tdepends:
-        return +1
-    else:
-        return 0
-
-
-# Compare method to sort internal libraries from least dependent to most dependent
-def libLessThan(libname1, libname2):
-    libProject1 = getLibProject(libname1)
-    libProject2 = getLibProject(libname2)
-    if libname1 in libProject2.lib_tdepends:
-        return -1
-    elif libname2 in libProject1.lib_tdepends:
-        return +1
-    else:
-        return 0
-
-
-# Sort dependencies from least dependent to most dependent
-# (i.e., if lib1 depends on lib2, then lib1 appears after lib1 in the list)
-for relDir in projects:
-    # Get project
-    project = projects[relDir]
-
-    # Qt dependencies do not require sorting
-    project.qt_sdepends = list(project.qt_tdepends)
-
-    # Sort third-party library dependencies
-    third_tdepends = list(project.third_tdepends)
-    project.third_sdepends = sorted(third_tdepends, cmp=thirdLessThan)
-
-    # Sort third-party library dependencies
-    lib_tdepends = list(project.lib_tdepends)
-    project.lib_sdepends = sorted(lib_tdepends, cmp=libLessThan)
+        if getLibProject(libname):
+            dependees.append("libs/" + libname)
+    return dependees
+
+
+# State of the dependency computation, kept between calls of computeDepends()
+# so that the closures of only a few projects can be updated. The direct
+# dependencies are also persisted between runs (see saveDependsIndex()), but
+# not the closures, which are computed again for the projects needing them.
+dependsGraph    = {}     # relDir -> relDirs of the projects it directly depends on
+dependentsGraph = {}     # relDir -> set of relDirs of the projects directly depending on it
+hasCycles       = False  # Whether the dependency graph has cycles
+
+# Sorted dependencies computed during this run, by relDir (see
+# getSortedDepends()). Projects restored from the dependency index are only
+# added when they are needed. The sorted dependencies the last run computed
+# for restored projects are also computed when their closure is computed
+# again, to find which of them changed.
+sdependsByRelDir      = {}
+indexSDependsByRelDir = {}
+
+# Sets the relDirs of the projects the given project directly depends on, in
+# both dependsGraph and dependentsGraph
+def setDirectDependees(relDir, dependees):
+    for dependeeRelDir in dependsGraph.get(relDir, []):
+        dependentsGraph[dependeeRelDir].discard(relDir)
+    dependsGraph[relDir] = dependees
+    for dependeeRelDir in dependees:
+        dependentsGraph.setdefault(dependeeRelDir, set()).add(relDir)
+
+
+# Compute the transitive closure of all projects dependencies.
+#
+# The dependency graph is first decomposed into strongly connected components,
+# which detects and reports cyclic dependencies. Then, the sorted dependencies
+# of all projects are computed (see getSortedDepends()).
+#
+# Projects within a cycle all depend on each other (but not on themselves),
+# so that the generated files are still usable once the error is reported.
+#
+# If changedRelDirs is given, only the dependencies of these projects changed
+# since the last call, and were already set with setDirectDependees(). Then,
+# only the closures of these projects and of the projects depending on them
+# (found with dependentsGraph) are computed again, and only the projects they
+# depend on are visited. It is not valid if there are cycles (the link order
+# then depends on the whole graph), and all closures are then computed again.
+#
+# Returns the set of relDirs whose sorted dependencies changed.
+#
+def computeDepends(changedRelDirs=None):
+    global hasCycles
+    isComputingAll = changedRelDirs is None
+    if isComputingAll:
+        dependsGraph.clear()
+        dependentsGraph.clear()
+        for relDir in sorted(projects):
+            setDirectDependees(relDir, getDirectDependees(projects[relDir]))
+
+    # Projects whose closure may have changed, and all projects they depend on
+    if not isComputingAll:
+        updatedRelDirs = depgraph.findReachable(changedRelDirs, dependentsGraph)
+        visitedRelDirs = sorted(depgraph.findReachable(updatedRelDirs, dependsGraph))
+        components = depgraph.findStronglyConnectedComponents(visitedRelDirs, dependsGraph)
+        for component in components:
+            if depgraph.findCycle(component, dependsGraph):
+                isComputingAll = True
+    if isComputingAll:
+        updatedRelDirs = set(projects)
+        components = depgraph.findStronglyConnectedComponents(sorted(projects), dependsGraph)
+
+    hasCycles = False
+    for component in components:
+        cycle = depgraph.findCycle(component, dependsGraph)
+        if cycle:
+            hasCycles = True
+            printError("cyclic dependency: " + " -> ".join(cycle))
+
+    # Sorted dependencies the last run computed for restored projects, from
+    # the dependencies it stored in the index
+    restoredRelDirs = [relDir for relDir in updatedRelDirs
+                       if relDir not in sdependsByRelDir and relDir not in indexSDependsByRelDir]
+    if restoredRelDirs and loadedDependsIndex:
+        indexSDependsByRelDir.update(getSortedDepends(
+            restoredRelDirs, loadedDependsIndex.dependsGraph, loadedDependsIndex.qt))
+
+    return setSortedDepends(getSortedDepends(updatedRelDirs, dependsGraph, getDirectQts()))
+
+
+# Returns the Qt modules each project directly uses, by relDir
+def getDirectQts():
+    return dict((relDir, projects[relDir].qt) for relDir in projects)
+
+# Returns the sorted dependencies of the given projects in the given graph, as
+# a dictionary mapping each relDir to a tuple (qtModules, dependeeRelDirs):
+# the Qt modules it transitively uses, given the Qt modules each project
+# directly uses in 'qts', and the projects it transitively depends on.
+#
+# Dependees are sorted in the global link order: from least dependent to most
+# dependent (i.e., if lib1 depends on lib2, then lib1 appears after lib2). It
+# is deterministic, and only computed for the given projects and the projects
+# they depend on, which are the only ones visited: the link order restricted
+# to the dependencies of a project only depends on these dependencies (see
+# depgraph.findTopologicalOrder()), unless the graph has cycles.
+#
+# Closures are computed as bitsets. Each visited project is represented by one
+# bit, each Qt module as well. Projects are numbered in link order, so that
+# the projects in a bitset are listed in link order by depgraph.bitsToList().
+# Each dependency costs one union of bitsets of V bits, where V is the number
+# of visited projects, so the cost is O(V + E * V / 64) machine-word
+# operations for E dependencies: linear in the number of dependencies for a
+# fixed number of projects, but quadratic in the size of dense graphs.
+#
+def getSortedDepends(relDirs, graph, qts):
+    visitedRelDirs = sorted(depgraph.findReachable(relDirs, graph))
+    components = depgraph.findStronglyConnectedComponents(visitedRelDirs, graph)
+    orderedRelDirs = depgraph.findTopologicalOrder(visitedRelDirs, graph)
+
+    projectBits = {}
+    for i, relDir in enumerate(orderedRelDirs):
+        projectBits[relDir] = 1 << i
+
+    qtModules = sorted(set(qtModule for relDir in visitedRelDirs for qtModule in qts[relDir]))
+    qtModuleBits = {}
+    for i, qtModule in enumerate(qtModules):
+        qtModuleBits[qtModule] = 1 << i
+
+    qtBits = {}
+    for relDir in visitedRelDirs:
+        qtBits[relDir] = 0
+        for qtModule in qts[relDir]:
+            qtBits[relDir] |= qtModuleBits[qtModule]
+
+    # Compute closures
+    tdependsBits = depgraph.computeClosureBits(components, graph, projectBits)
+    qtTDependsBits = depgraph.computeClosureBits(components, graph, qtBits)
+
+    # Convert closures back to names. Qt dependencies do not require a link
+    # order, but are sorted so that generated files do not depend on the
+    # iteration order of sets.
+    res = {}
+    for relDir in relDirs:
+        qtSDepends = set(qts[relDir])
+        qtSDepends.update(depgraph.bitsToList(qtTDependsBits[relDir], qtModules))
+        bits = tdependsBits[relDir] & ~projectBits[relDir]
+        res[relDir] = (sorted(qtSDepends), depgraph.bitsToList(bits, orderedRelDirs))
+    return res
+
+
+# Set the transitive and sorted dependencies of projects from the given sorted
+# dependencies (see getSortedDepends()).
+#
+# Returns the set of relDirs whose sorted dependencies changed, compared with
+# those computed before during this run or, for projects restored from the
+# dependency index, by the last run.
+#
+def setSortedDepends(sdepends):
+    changedSDependsRelDirs = set()
+    for relDir in sdepends:
+        # Get project
+        project = projects[relDir]
+        if sdepends[relDir] != sdependsByRelDir.get(relDir, indexSDependsByRelDir.get(relDir)):
+            changedSDependsRelDirs.add(relDir)
+        sdependsByRelDir[relDir] = sdepends[relDir]
+        qtSDepends, dependeeRelDirs = sdepends[relDir]
+
+        # Qt modules
+        project.qt_sdepends = qtSDepends
+        project.qt_tdepends = set(qtSDepends)
+
+        # Third-party and internal libraries, from least dependent to most dependent
+        project.third_sdepends = []
+        project.lib_sdepends   = []
+        for dependeeRelDir in dependeeRelDirs:
+            if dependeeRelDir.startswith("third/"):
+                project.third_sdepends.append(dependeeRelDir[len("third/"):])
+            elif dependeeRelDir.startswith("libs/"):
+                project.lib_sdepends.append(dependeeRelDir[len("libs/"):])
+        project.third_tdepends = set(project.third_sdepends)
+        project.lib_tdepends   = set(project.lib_sdepends)
+
+    return changedSDependsRelDirs
+
+# Set the sorted dependencies of the given projects (default: all projects)
+# which were restored from the dependency index, i.e., which were not computed
+# during this run
+def setMissingSortedDepends(relDirs=None):
+    if relDirs is None:
+        relDirs = projects
+    missingRelDirs = [relDir for relDir in relDirs if relDir not in sdependsByRelDir]
+    if missingRelDirs:
+        setSortedDepends(getSortedDepends(missingRelDirs, dependsGraph, getDirectQts()))
 
 
 # Set parent/child relationships
-for relDir in projects:
-    # Get project
-    project = projects[relDir]
-
-    # For all subdir in subdirs
-    for subdir in project.subdirs:
-        # Get relDir of subproject
-        if project.relDir == "":
-            subProjectRelDir = subdir                         # e.g., "app"
-        else:
-            subProjectRelDir = project.relDir + '/' + subdir  # e.g., "libs" + '/' + "Core"
-
-        # Check if subProject exists
-        if subProjectRelDir in projects:
-            # Get subproject
-            subProject = projects[subProjectRelDir]
-
-            # Set parent/child relationships
-            project.subProjects.append(subProject)
-            subProject.parentProject = project
-            subProject.subdir = subdir
-            subProject.subdirKey = subdir.replace('/', '__')
-
-        else:
-            print ("Error: subproject", subProjectRelDir, "of project", project.relDir, "not found.")
+def setParentChildRelationships():
+    for relDir in projects:
+        # Get project
+        project = projects[relDir]
+
+        # For all subdir in subdirs
+        for subdir in project.subdirs:
+            # Get relDir of subproject
+            if project.relDir == "":
+                subProjectRelDir = subdir                         # e.g., "app"
+            else:
+                subProjectRelDir = project.relDir + '/' + subdir  # e.g., "libs" + '/' + "Core"
+
+            # Check if subProject exists
+            if subProjectRelDir in projects:
+                # Get subproject
+                subProject = projects[subProjectRelDir]
+
+                # Set parent/child relationships
+                project.subProjects.append(subProject)
+                subProject.parentProject = project
+                subProject.subdir = subdir
+                subProject.subdirKey = subdir.replace('/', '__')
+
+            else:
+                printError("subproject " + subProjectRelDir + " of project " + project.relDir + " not found.")
 
 
 # Returns a list of all ancestors of a project. The first element of the
 # returned list is the root project of the distribution, and the last element
 # is the given project.
 #
+# The list is computed once per project, by appending the project to the
+# ancestors of its parent, so computing the ancestors of all projects is
+# linear in the total size of the returned lists. The returned list must not
+# be modified.
+#
 def getAncestors(project):
-    ancestors = [project]
-    while ancestors[0].parentProject != None:
-        ancestors.insert(0, ancestors[0].parentProject)
-    return ancestors
+    if not project.ancestors:
+        if project.parentProject is None:
+            project.ancestors = [project]
+        else:
+            project.ancestors = getAncestors(project.parentProject) + [project]
+    return project.ancestors
+
+
+# Returns the index, in both given lists of ancestors, of the lowest common
+# ancestor of two projects, or -1 if they have no common ancestor.
+#
+# Lists of ancestors share the same elements up to the common ancestor, and
+# differ after it. The common ancestor is therefore found by binary search, in
+# O(log(depth)) instead of walking both lists.
+#
+def getCommonAncestorIndex(ancestors1, ancestors2):
+    low = -1                                         # ancestors1[low] == ancestors2[low]
+    high = min(len(ancestors1), len(ancestors2)) - 1 # ancestors1[high+1] != ancestors2[high+1]
+    while low < high:
+        mid = (low + high + 1) // 2
+        if ancestors1[mid] is ancestors2[mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
 
 
-# Resolve subdirs dependencies based on lib/app dependencies
-for relDir in projects:
-    # Get project
-    project = projects[relDir]
+# Returns the subdir dependencies implied by the lib/app dependencies of the
+# given project, given as the relDirs of the projects it transitively depends
+# on, as a set of (dependentRelDir, dependeeSubdirKey) pairs, e.g.:
+#
+#     { ("app", "libs"), ("app", "third") }   for src/app/app.pro
+#
+def getSubdirsDepends(project, dependeeRelDirs):
+    subdirsDepends = set()
 
     # Get all non-subdirs projects this project depends on
-    dependeeProjects = []
-    for libname in project.third_sdepends:
-        dependeeProjects.append(getThirdProject(libname))
-    for libname in project.lib_sdepends:
-        dependeeProjects.append(getLibProject(libname))
+    dependeeProjects = [projects[dependeeRelDir] for dependeeRelDir in dependeeRelDirs]
 
     # Get all ancestors of this project
     projectAncestors = getAncestors(project)
@@ -578,93 +1010,1580 @@ for relDir in projects:
         # Get all ancestors of libProject
         libProjectAncestors = getAncestors(libProject)
 
-        # Find common ancestor between this project and libProject
-        indexCommonAncestor = 0
-        while projectAncestors[indexCommonAncestor+1] == libProjectAncestors[indexCommonAncestor+1]:
-            indexCommonAncestor += 1
+        # Find common ancestor between this project and libProject.
+        # Projects not reachable from the same root project (i.e., missing
+        # from SUBDIRS), or ancestors of one another, have no subdir
+        # dependency.
+        indexCommonAncestor = getCommonAncestorIndex(projectAncestors, libProjectAncestors)
+        if (indexCommonAncestor < 0 or
+            indexCommonAncestor + 1 >= len(projectAncestors) or
+            indexCommonAncestor + 1 >= len(libProjectAncestors)):
+            continue
 
         # Add subdir dependency
         dependentProject = projectAncestors[indexCommonAncestor+1]
         dependeeProject  = libProjectAncestors[indexCommonAncestor+1]
-        dependentProject.subdirDependsKeys.add(dependeeProject.subdirKey)
-
-
-# Generate all .config.pri files
-for relDir in projects:
-    # Get project
-    project = projects[relDir]
-
-    # Content to write to .config.pri
-    content = ""
-
-    # Write header
-    content += headerText
-
-    # Write computed dependencies
-    if project.template == "lib" or project.template == "app":
-        content += "\n# Computed dependencies (transitive + sorted). This is for info only.\n"
-        content += "QT_SDEPENDS    = " + " ".join(project.qt_sdepends)    + "\n"
-        content += "THIRD_SDEPENDS = " + " ".join(project.third_sdepends) + "\n"
-        content += "LIB_SDEPENDS   = " + " ".join(project.lib_sdepends)   + "\n"
-
-    # Write python calls that generates unit tests
-    #if project.relDir.startswith('libs'):
-    #    if project.template == "lib":
-    #        content += makelibtestsText
-    #    elif project.template == "subdirs":
-    #        content += makesubdirstestsText
-
-    # Enable C++11
-    if project.template == "lib" or project.template == "app":
-        content += enableCpp11Text
-
-    # Adds all headers of the distribution in include path
-    if project.template == "lib" or project.template == "app":
-        content += includeText
-
-    # Compile as a static library
-    if project.template == "lib":
-        content += staticLibText
-
-    # If project is a subdir
-    if project.template == "subdirs":
-        # Override value of SUBDIRS by using keys instead of folder path
-        subdirsText = ("\n" +
-                       "# Override value of SUBDIRS by using keys instead of folder path\n" +
-                       "SUBDIRS =")
-        for subProject in project.subProjects:
-            subdirsText += " \\\n    " + subProject.subdirKey
-        subdirsText += "\n"
-        content += subdirsText
-
-        # Set subdirs and dependencies
-        for subProject in project.subProjects:
-            subdirText = ("\n" +
-                          "# Set " + subProject.subdirKey + " location and dependencies\n")
-            subdirText += subProject.subdirKey + ".subdir  = " + subProject.subdir + "\n"
-            subdirText += subProject.subdirKey + ".depends ="
-            for key in subProject.subdirDependsKeys:
-                subdirText += " " + key
-            subdirText += "\n"
-            content += subdirText
-
-    # Add each dependent library in order from most dependent to least dependent.
-
-    # Internal libraries
-    for libname in reversed(project.lib_sdepends):
-        libProject = getLibProject(libname)
-        addThisLib = (addLibText.replace('%libRelDir', libProject.relDir)
-                                .replace('%libOutDir', libProject.outDir)
-                                .replace('%libname',   libProject.name))
-        content += addThisLib
-
-    # Third-party libraries
-    for libname in reversed(project.third_sdepends):
-        libProject = getThirdProject(libname)
-        addThisLib = (addLibText.replace('%libRelDir', libProject.relDir)
-                                .replace('%libOutDir', libProject.outDir)
-                                .replace('%libname',   libProject.name))
-        content += addThisLib
-
-    # Writes content to .config.pri
-    buildutils.writeToFileIfDifferent(project.priFilePath, content)
+        subdirsDepends.add((dependentProject.relDir, dependeeProject.subdirKey))
+
+    return subdirsDepends
+
+
+# Subdir dependencies implied by each project, by relDir, and number of
+# projects implying each subdir dependency, kept between calls of
+# resolveSubdirsDepends() so that they can be updated for a few projects only
+subdirsDependsByRelDir = {}
+subdirsDependsCounts = {}
+
+# Resolve subdirs dependencies based on lib/app dependencies.
+#
+# If relDirs is given, only the dependencies of these projects changed since
+# the last call, or since the last run if the dependency index was loaded: the
+# subdir dependencies they implied in the last run are inferred from the
+# sorted dependencies the last run computed (see computeDepends()).
+# Returns the set of projects whose subdirDependsKeys changed.
+#
+def resolveSubdirsDepends(relDirs=None):
+    isResolvingAll = relDirs is None
+    if isResolvingAll:
+        relDirs = projects
+        subdirsDependsByRelDir.clear()
+        subdirsDependsCounts.clear()
+
+    changedProjects = set()
+    for relDir in relDirs:
+        if relDir in subdirsDependsByRelDir:
+            oldSubdirsDepends = subdirsDependsByRelDir[relDir]
+        elif relDir in indexSDependsByRelDir and not isResolvingAll:
+            oldSubdirsDepends = getSubdirsDepends(projects[relDir], indexSDependsByRelDir[relDir][1])
+        else:
+            oldSubdirsDepends = set()
+        newSubdirsDepends = getSubdirsDepends(projects[relDir], sdependsByRelDir[relDir][1])
+        subdirsDependsByRelDir[relDir] = newSubdirsDepends
+
+        for subdirsDepend in newSubdirsDepends - oldSubdirsDepends:
+            count = subdirsDependsCounts.get(subdirsDepend, 0)
+            subdirsDependsCounts[subdirsDepend] = count + 1
+            if count == 0:
+                dependentRelDir, dependeeKey = subdirsDepend
+                projects[dependentRelDir].subdirDependsKeys.add(dependeeKey)
+                changedProjects.add(projects[dependentRelDir])
+
+        for subdirsDepend in oldSubdirsDepends - newSubdirsDepends:
+            count = subdirsDependsCounts[subdirsDepend]
+            subdirsDependsCounts[subdirsDepend] = count - 1
+            if count == 1:
+                dependentRelDir, dependeeKey = subdirsDepend
+                projects[dependentRelDir].subdirDependsKeys.discard(dependeeKey)
+                changedProjects.add(projects[dependentRelDir])
+
+    return changedProjects
+
+
+# Returns the transitive reduction of the subdir dependencies between the
+# subprojects of the given 'subdirs' project, as a dictionary mapping the
+# subdirKey of each subproject to the keys it directly depends on, e.g.:
+#
+#     { "third": [], "libs": ["third"], "app": ["libs"] }   for src/src.pro
+#
+# Here, "app" depends on "third" through "libs": writing this dependency in
+# app.depends would only add redundant edges to the Makefile generated by
+# qmake, checked by make for each subdir.
+#
+# The subdir dependencies of all subprojects are kept in subdirDependsKeys,
+# since they are updated incrementally, and the reduction is only computed
+# when generating the .config.pri file of their parent.
+#
+def getReducedSubdirDependsKeys(project):
+    keys = [subProject.subdirKey for subProject in project.subProjects]
+    dependsKeys = dict((subProject.subdirKey, sorted(subProject.subdirDependsKeys))
+                       for subProject in project.subProjects)
+    return depgraph.findTransitiveReduction(keys, dependsKeys)
+
+
+# Returns the weight of the given lib and app projects for the critical-path
+# analysis, and the unit of weights, as a tuple (weights, unit).
+#
+# If a build with the Ninja backend was run, weights are the recorded build
+# times of the outputs in the output directory of each project. Projects
+# without recorded build time get an estimate based on their number of
+# source files. Otherwise, weights are numbers of source files.
+#
+def getProjectWeights(relDirs):
+    numSources = dict((relDir, max(1, len(projects[relDir].sources))) for relDir in relDirs)
+
+    recordedTimes = {}
+    relDirsByOutDir = dict((projects[relDir].outDir, relDir) for relDir in relDirs)
+    for outputPath, buildTime in schedule.readNinjaLog(ninjaLogFilePath).items():
+        dirpath = os.path.dirname(outputPath)
+        while dirpath not in relDirsByOutDir and len(dirpath) > len(rootOutDir):
+            dirpath = os.path.dirname(dirpath)
+        if dirpath in relDirsByOutDir:
+            relDir = relDirsByOutDir[dirpath]
+            recordedTimes[relDir] = recordedTimes.get(relDir, 0.0) + buildTime
+    if not recordedTimes:
+        return (numSources, "source files")
+
+    secondsPerSource = (sum(recordedTimes.values()) /
+                        sum(numSources[relDir] for relDir in recordedTimes))
+    weights = {}
+    for relDir in relDirs:
+        weights[relDir] = recordedTimes.get(relDir, numSources[relDir] * secondsPerSource)
+    return (weights, "seconds")
+
+
+# Computes the priority of all projects from the critical-path analysis of the
+# dependency graph of libs and apps (see schedule.py), and writes the analysis
+# to schedule.txt. Priorities are left to 0 if the graph has cycles.
+#
+def computeSchedule():
+    for project in projects.values():
+        project.priority = 0
+    if hasCycles:
+        return
+
+    relDirs = sorted(relDir for relDir in projects
+                     if projects[relDir].template == "lib" or projects[relDir].template == "app")
+    weights, unit = getProjectWeights(relDirs)
+
+    # Dependencies on other projects (e.g., a LIB_DEPENDS listing a subdirs
+    # project) are not edges of the analysis
+    nodeSet = set(relDirs)
+    successors = {}
+    predecessors = {}
+    for relDir in relDirs:
+        successors[relDir] = [r for r in dependsGraph.get(relDir, []) if r in nodeSet]
+        predecessors[relDir] = [r for r in dependentsGraph.get(relDir, []) if r in nodeSet]
+    result = schedule.computeSchedule(relDirs, successors, predecessors, weights)
+
+    # The priority of a subdirs project is the highest priority of the
+    # projects it contains
+    for relDir in relDirs:
+        for ancestor in getAncestors(projects[relDir]):
+            ancestor.priority = max(ancestor.priority, result.priorities[relDir])
+
+    content = schedule.getReport(result, unit)
+    if buildutils.readFromFileIfExists(scheduleFilePath) != content:
+        buildutils.writeToFileAtomically(scheduleFilePath, content)
+    if result.criticalPath:
+        print ("[configure.py] Critical path: %d projects, %g out of %g %s (see %s)" %
+               (len(result.criticalPath), result.finishTimes[result.criticalPath[-1]],
+                result.totalWeight, unit, scheduleFilePath))
+
+
+# Returns whether the given project is a header-only library, i.e., a 'lib'
+# project without SOURCES or RESOURCES, and without HEADERS to process with
+# moc. The project files of the headers don't need to be parsed again when
+# a header changes, but they are inputs of the stamp file (see
+# getContentInputPaths()).
+def isHeaderOnlyLib(project):
+    if project.template != "lib" or project.sources or project.resources:
+        return False
+    if project.qt:
+        for value in project.headers:
+            headerPath = getProjectFilePath(project, value)
+            if headerPath and fileNeedsMoc(headerPath):
+                return False
+    return True
+
+# Returns how the given project is built: "static" (the default) or "shared"
+# for libraries with something to compile, "headers" for header-only
+# libraries, and "" for other projects.
+#
+# Shared libraries are enabled on Unix for 'lib' projects with 'shared_libs'
+# in CONFIG, e.g., qmake CONFIG+=shared_libs for all libraries, or CONFIG +=
+# shared_libs in the project file of a library. Projects depending on a shared
+# library find it at run time through rpath, and don't list it in
+# PRE_TARGETDEPS: SUBDIRS dependencies already build it first, and modifying
+# it doesn't relink them, which makes incremental debug builds much faster.
+# Static libraries linked by several shared libraries are duplicated in each
+# of them, therefore mixing both kinds in the same chain of dependencies should
+# be avoided.
+#
+# Header-only libraries have nothing to compile: their .config.pri only sets
+# their include path, and TEMPLATE = aux so that no empty archive is built.
+# Projects depending on them don't link them, but still link the libraries
+# they depend on, which are in their sorted dependencies.
+#
+def getLinkMode(project):
+    if project.template != "lib":
+        return ""
+    elif isHeaderOnlyLib(project):
+        return "headers"
+    elif unix and 'shared_libs' in project.config:
+        return "shared"
+    else:
+        return "static"
+
+# Returns the text adding the given library to the projects depending on it.
+# Header-only libraries are not linked.
+def getAddLibText(libProject):
+    if libProject.linkMode == "headers":
+        return ""
+    elif libProject.linkMode == "shared":
+        text = addSharedLibText
+    elif unix:
+        text = addLibTextUnix
+    else:
+        text = addLibTextWin32
+    return (text.replace('%libRelDir', libProject.relDir)
+                .replace('%libOutDir', libProject.outDir)
+                .replace('%libname',   libProject.name)
+                .replace('%releaseOrDebug', releaseOrDebug))
+
+# Returns the relDirs of the projects transitively depending on the given one
+def getTransitiveDependents(relDir):
+    dependentRelDirs = depgraph.findReachable([relDir], dependentsGraph)
+    dependentRelDirs.discard(relDir)
+    return sorted(dependentRelDirs)
+
+# Compute the link mode of all projects. In incremental runs, libraries whose
+# link mode changed since the last run, and the projects depending on them,
+# are generated again.
+def updateLinkModes():
+    for relDir in projects:
+        project = projects[relDir]
+        project.linkMode = getLinkMode(project)
+        if (relDirsToGenerate is not None and project.linkMode and
+            project.linkMode != loadedDependsIndex.linkModes.get(relDir, "static")):
+            relDirsToGenerate.add(relDir)
+            relDirsToGenerate.update(getTransitiveDependents(relDir))
+
+# Returns the libraries linked by the given project, from most dependent to
+# least dependent: internal libraries first, then third-party ones. Header-only
+# libraries are not linked.
+def getLinkedLibProjects(project):
+    libProjects = ([getLibProject(libname) for libname in reversed(project.lib_sdepends)] +
+                   [getThirdProject(libname) for libname in reversed(project.third_sdepends)])
+    return [libProject for libProject in libProjects
+            if libProject and libProject.linkMode != "headers"]
+
+# relDirs of the libraries staged in stagedLibsDir (see stageLibs)
+stagedLibRelDirs = set()
+
+# Stage all libraries built as static or shared libraries in stagedLibsDir, as
+# symbolic links to the files they are built to, e.g.:
+#
+#     <root-out-dir>/lib/libWidgets.a -> <root-out-dir>/src/libs/Gui/Widgets/libWidgets.a
+#
+# Projects then add their libraries with a single -L and a list of -l (see
+# getStagedLibsText), instead of one -L per library: with hundreds of
+# dependencies, the linker would otherwise search hundreds of directories for
+# each -l. Links are created before libraries are built, and point to the
+# files rebuilt in place, so the build never copies anything. Links of
+# libraries which don't exist anymore are removed.
+#
+# Libraries sharing the same name (e.g., libs/Foo and third/Foo) can't be
+# staged: they are linked by path instead.
+#
+def stageLibs():
+    relDirsByName = {}
+    for relDir in sorted(projects):
+        project = projects[relDir]
+        if project.linkMode == "static" or project.linkMode == "shared":
+            relDirsByName.setdefault(project.name, []).append(relDir)
+    stagedLibRelDirs.clear()
+    linkTargets = {}
+    for name in sorted(relDirsByName):
+        relDirs = relDirsByName[name]
+        if len(relDirs) > 1:
+            printError("libraries " + ", ".join(relDirs) + " have the same name and can't be staged, they are linked by path.")
+            continue
+        targetFilePath = getTargetFilePath(projects[relDirs[0]])
+        stagedLibRelDirs.add(relDirs[0])
+        linkTargets[os.path.basename(targetFilePath)] = targetFilePath
+    buildutils.mkdir(stagedLibsDir)
+    for fileName in os.listdir(stagedLibsDir):
+        linkPath = stagedLibsDir + '/' + fileName
+        if fileName not in linkTargets and os.path.islink(linkPath):
+            os.remove(linkPath)
+    for fileName in sorted(linkTargets):
+        linkPath = stagedLibsDir + '/' + fileName
+        if os.path.islink(linkPath) and os.readlink(linkPath) == linkTargets[fileName]:
+            continue
+        if os.path.lexists(linkPath):
+            os.remove(linkPath)
+        os.symlink(linkTargets[fileName], linkPath)
+
+# Returns the text adding the given libraries, from most dependent to least
+# dependent, to a project whose libraries are staged (see stageLibs): a single
+# -L, and the deduplicated list of -l. PRE_TARGETDEPS still lists the actual
+# files of static libraries, so that they are relinked when those change.
+def getStagedLibsText(libProjects):
+    if not libProjects:
+        return ""
+    text = ("\n" +
+            "# Add dependencies to libraries, staged in " + stagedLibsDir + "\n" +
+            "LIBS += -L" + stagedLibsDir + "/")
+    libFlags = []
+    rpathDirs = []
+    targetFilePaths = []
+    for libProject in libProjects:
+        if libProject.relDir in stagedLibRelDirs:
+            libFlag = "-l" + libProject.name
+            rpathDir = stagedLibsDir
+        else:
+            libFlag = getTargetFilePath(libProject)
+            rpathDir = libProject.outDir
+        if libFlag not in libFlags:
+            libFlags.append(libFlag)
+        if libProject.linkMode == "shared":
+            if rpathDir not in rpathDirs:
+                rpathDirs.append(rpathDir)
+        else:
+            targetFilePaths.append(getTargetFilePath(libProject))
+    for libFlag in libFlags:
+        text += " \\\n    " + libFlag
+    text += "\n"
+    if rpathDirs:
+        text += "QMAKE_RPATHDIR += " + " ".join(rpathDirs) + "\n"
+    if targetFilePaths:
+        text += "PRE_TARGETDEPS +="
+        for targetFilePath in targetFilePaths:
+            text += " \\\n    " + targetFilePath
+        text += "\n"
+    return text
+
+
+# Default number of sources compiled together in unity builds, and extensions
+# of the sources which can be compiled together
+defaultUnityBatchSize = 8
+unitySourceExtensions = ['.cpp', '.cc', '.cxx', '.c++']
+
+# Returns the SOURCES of the given project compiled together in unity builds,
+# as a list of batches, i.e., lists of values of SOURCES.
+#
+# Unity builds are enabled for 'lib' projects with 'unity' in CONFIG, e.g.,
+# for all libs by running qmake CONFIG+=unity, or for one lib with
+# CONFIG += unity in its project file. Each batch is compiled as a single
+# generated file, unity_<k>.cpp, including all sources of the batch, so that
+# the headers they have in common are parsed once.
+#
+# The maximum number of sources per batch is given by UNITY_BATCH_SIZE
+# (default: 8), and sources are spread evenly between batches. Sources which
+# don't combine cleanly (e.g., conflicting static functions or macros) can be
+# listed in UNITY_EXCLUDE. Sources processed by moc, which include their
+# .moc file, and non-C++ sources are always compiled separately.
+#
+def getUnityBatches(project):
+    if project.template != "lib" or 'unity' not in project.config:
+        return []
+    batchSize = defaultUnityBatchSize
+    if project.unity_batch_size:
+        try:
+            batchSize = int(project.unity_batch_size[-1])
+        except ValueError:
+            printError("invalid UNITY_BATCH_SIZE in project " + project.relDir)
+
+    excluded = set(project.unity_exclude)
+    sources = []
+    for value in project.sources:
+        if (value in excluded or os.path.basename(value) in excluded or
+            os.path.splitext(value)[1] not in unitySourceExtensions):
+            continue
+        sourcePath = getProjectFilePath(project, value)
+        if sourcePath and not fileNeedsMoc(sourcePath):
+            sources.append(value)
+    if batchSize < 2 or len(sources) < 2:
+        return []
+
+    numBatches = (len(sources) + batchSize - 1) // batchSize
+    return [sources[k * len(sources) // numBatches:(k + 1) * len(sources) // numBatches]
+            for k in range(numBatches)]
+
+# Returns the path of the k-th unity file of the given project
+def getUnityFilePath(project, k):
+    return project.outDir + '/unity_' + str(k) + '.cpp'
+
+# Returns the content of the unity file compiling the given batch of sources
+def getUnityFileContent(project, batch):
+    content = "// This file was automatically generated by configure.py. Any edit will be lost.\n"
+    for value in batch:
+        content += '#include "' + getProjectFilePath(project, value) + '"\n'
+    return content
+
+# Compute the unity batches of all projects. In incremental runs, projects
+# whose batches changed since the last run are generated again.
+def updateUnityBatches():
+    for relDir in projects:
+        project = projects[relDir]
+        project.unityBatches = getUnityBatches(project)
+        if (relDirsToGenerate is not None and
+            project.unityBatches != loadedDependsIndex.unityBatches.get(relDir, [])):
+            relDirsToGenerate.add(relDir)
+
+
+# Minimum number of sources including a header for it to be precompiled, as
+# a number and as a fraction of the sources, and maximum number of
+# precompiled headers per library
+pchMinIncludeCount = 2
+pchMinIncludeRatio = 0.25
+pchMaxHeaders = 30
+
+# Qt headers, e.g., QWidget or QtWidgets/QWidget
+qtHeaderRegExp = re.compile(r"^(Qt\w*/)?Q\w+(\.h)?$")
+
+# Returns the headers precompiled for the given project, from the most often
+# included to the least often included, e.g., [ "QWidget", "Core/Foo.h" ].
+#
+# Precompiled headers are enabled for 'lib' projects with 'auto_pch' in
+# CONFIG (e.g., qmake CONFIG+=auto_pch). The headers included by the sources
+# of the library are ranked by the number of sources including them (see
+# includescan.py). Only Qt headers and headers of other libraries are
+# candidates: headers of the library itself change too often. Candidates
+# included by enough sources are listed in a generated pch.h, compiled once,
+# and implicitly included by all sources.
+#
+# Since pch.h is only written when its content changes (see manifest.py), it
+# is only rebuilt, and the library with it, when the ranking changes.
+#
+def getPrecompiledHeaders(project):
+    if project.template != "lib" or 'auto_pch' not in project.config:
+        return []
+    counts = {}
+    numSources = 0
+    for value in project.sources:
+        sourcePath = getProjectFilePath(project, value)
+        if not sourcePath:
+            continue
+        numSources += 1
+        for includePath in set(getIncludeCache().getIncludes(sourcePath)):
+            includedRelDir = includescan.getIncludedProjectRelDir(includePath, projects)
+            if (qtHeaderRegExp.match(includePath) or
+                (includedRelDir and includedRelDir != project.relDir and
+                 projects[includedRelDir].template == "lib")):
+                counts[includePath] = counts.get(includePath, 0) + 1
+    minCount = max(pchMinIncludeCount, pchMinIncludeRatio * numSources)
+    ranking = sorted(counts, key=lambda includePath: (-counts[includePath], includePath))
+    return [includePath for includePath in ranking if counts[includePath] >= minCount][:pchMaxHeaders]
+
+# Returns the path of the precompiled header of the given project
+def getPchFilePath(project):
+    return project.outDir + '/pch.h'
+
+# Returns the content of the precompiled header of the given project
+def getPchFileContent(project):
+    content = ("// This file was automatically generated by configure.py. Any edit will be lost.\n" +
+               "// Headers included most often by the sources of " + project.relDir + "\n")
+    for includePath in project.pchHeaders:
+        content += "#include <" + includePath + ">\n"
+    return content
+
+# Compute the precompiled headers of all projects. In incremental runs,
+# projects whose precompiled headers changed since the last run are
+# generated again.
+def updatePrecompiledHeaders():
+    for relDir in projects:
+        project = projects[relDir]
+        project.pchHeaders = getPrecompiledHeaders(project)
+        if (relDirsToGenerate is not None and
+            project.pchHeaders != loadedDependsIndex.pchHeaders.get(relDir, [])):
+            relDirsToGenerate.add(relDir)
+    if includeCache is not None:
+        includeCache.save()
+
+# Returns the files whose content the generated files of the given project
+# depend on, in addition to its project file: the sources of libraries using
+# unity builds or precompiled headers, and the headers of Qt libraries
+# without sources, which are header-only unless they need moc
+def getContentInputPaths(project):
+    values = []
+    if project.template == "lib" and ('unity' in project.config or 'auto_pch' in project.config):
+        values = project.sources
+    elif project.template == "lib" and project.qt and not project.sources:
+        values = project.headers
+    res = []
+    for value in values:
+        filePath = getProjectFilePath(project, value)
+        if filePath:
+            res.append(filePath)
+    return res
+
+
+# Returns the subprojects of the given 'subdirs' project, by decreasing
+# priority. Subprojects with the same priority keep the order of SUBDIRS.
+def getScheduledSubProjects(project):
+    return sorted(project.subProjects, key=lambda subProject: -subProject.priority)
+
+
+# Generate all .config.pri files. Files whose content didn't change are not
+# touched, and files generated for projects which no longer exist are removed
+# (see manifest.py).
+#
+# If relDirs is given, only the .config.pri files of these projects are
+# generated, and no file is removed.
+#
+def generateConfigFiles(relDirs=None):
+    outputManifest = manifest.OutputManifest(configureOutDir + '/manifest.json')
+    outputManifest.load()
+    isGeneratingAll = relDirs is None
+    if isGeneratingAll:
+        relDirs = projects
+    else:
+        outputManifest.keepEntries()
+
+    # Projects restored from the dependency index, generated again for
+    # another reason than their dependencies (e.g., a missing .config.pri),
+    # need their sorted dependencies
+    setMissingSortedDepends(relDirs)
+
+    numSubdirDepends = 0         # Number of inferred subdir dependencies in generated files
+    numRemovedSubdirDepends = 0  # Number of them implied by other ones, and therefore not written
+    for relDir in relDirs:
+        # Get project
+        project = projects[relDir]
+
+        # Content to write to .config.pri
+        content = ""
+
+        # Write header
+        content += headerText
+
+        # Write computed dependencies
+        if project.template == "lib" or project.template == "app":
+            content += "\n# Computed dependencies (transitive + sorted). This is for info only.\n"
+            content += "QT_SDEPENDS    = " + " ".join(project.qt_sdepends)    + "\n"
+            content += "THIRD_SDEPENDS = " + " ".join(project.third_sdepends) + "\n"
+            content += "LIB_SDEPENDS   = " + " ".join(project.lib_sdepends)   + "\n"
+
+        # Write python calls that generates unit tests
+        #if project.relDir.startswith('libs'):
+        #    if project.template == "lib":
+        #        content += expandText(makelibtestsText)
+        #    elif project.template == "subdirs":
+        #        content += expandText(makesubdirstestsText)
+
+        # Enable C++11
+        if project.template == "lib" or project.template == "app":
+            content += enableCpp11Text
+
+        # Adds all headers of the distribution in include path
+        if project.template == "lib" or project.template == "app":
+            content += expandText(includeText)
+            if unix:
+                content += expandText(includeTextUnixOnly)
+
+        # Compile as a static or shared library, or nothing (see getLinkMode)
+        if project.linkMode == "headers":
+            content += headerOnlyLibText
+        elif project.linkMode == "shared":
+            content += sharedLibText
+        elif project.linkMode == "static":
+            content += staticLibText
+
+        # Replace sources compiled together by unity files (see getUnityBatches)
+        if project.unityBatches:
+            unityText = ("\n" +
+                         "# Unity build: compile sources in batches\n" +
+                         "SOURCES -=")
+            for batch in project.unityBatches:
+                for value in batch:
+                    unityText += " \\\n    " + value
+            unityText += "\nSOURCES +="
+            for k, batch in enumerate(project.unityBatches):
+                unityFilePath = getUnityFilePath(project, k)
+                outputManifest.writeFile(unityFilePath, getUnityFileContent(project, batch))
+                unityText += " \\\n    " + unityFilePath
+            unityText += "\n"
+            content += unityText
+
+        # Precompiled header (see getPrecompiledHeaders)
+        if project.pchHeaders:
+            pchFilePath = getPchFilePath(project)
+            outputManifest.writeFile(pchFilePath, getPchFileContent(project))
+            content += precompiledHeaderText.replace('%pchFilePath', pchFilePath)
+
+        # Store the library in the artifact cache (see updateArtifacts)
+        if (project.linkMode == "static" or project.linkMode == "shared") and artifactCacheDir:
+            content += expandText(storeArtifactText)
+
+        # If project is a subdir
+        if project.template == "subdirs":
+            # Override value of SUBDIRS by using keys instead of folder path
+            # Subprojects with the highest priority come first, so that
+            # make -j starts them first (see computeSchedule)
+            scheduledSubProjects = getScheduledSubProjects(project)
+            subdirsText = ("\n" +
+                           "# Override value of SUBDIRS by using keys instead of folder path\n" +
+                           "SUBDIRS =")
+            for subProject in scheduledSubProjects:
+                subdirsText += " \\\n    " + subProject.subdirKey
+            subdirsText += "\n"
+            content += subdirsText
+
+            # Set subdirs and dependencies. Dependencies implied by other
+            # dependencies are not written (see getReducedSubdirDependsKeys).
+            reducedSubdirDependsKeys = getReducedSubdirDependsKeys(project)
+            for subProject in scheduledSubProjects:
+                subdirText = ("\n" +
+                              "# Set " + subProject.subdirKey + " location and dependencies\n")
+                subdirText += subProject.subdirKey + ".subdir  = " + subProject.subdir + "\n"
+                subdirText += subProject.subdirKey + ".depends ="
+                for key in sorted(reducedSubdirDependsKeys[subProject.subdirKey]):
+                    subdirText += " " + key
+                numSubdirDepends += len(subProject.subdirDependsKeys)
+                numRemovedSubdirDepends += (len(subProject.subdirDependsKeys) -
+                                            len(reducedSubdirDependsKeys[subProject.subdirKey]))
+                subdirText += "\n"
+                content += subdirText
+
+        # Add each dependent library in order from most dependent to least dependent.
+        # Header-only libraries link nothing.
+        if project.linkMode == "headers":
+            pass
+
+        # Libraries staged in a single directory (see stageLibs)
+        elif useStagedLibs:
+            content += getStagedLibsText(getLinkedLibProjects(project))
+
+        else:
+            # Internal libraries
+            for libname in reversed(project.lib_sdepends):
+                content += getAddLibText(getLibProject(libname))
+
+            # Third-party libraries
+            for libname in reversed(project.third_sdepends):
+                content += getAddLibText(getThirdProject(libname))
+
+        # Writes content to .config.pri
+        outputManifest.writeFile(project.priFilePath, content)
+
+    # Report redundant subdir dependencies
+    if numRemovedSubdirDepends > 0:
+        print ("[configure.py] Removed %d redundant subdir dependencies out of %d" %
+               (numRemovedSubdirDepends, numSubdirDepends))
+
+    # Remove .config.pri of deleted projects
+    if isGeneratingAll:
+        for filePath in outputManifest.removeStaleFiles():
+            print "[configure.py] Removed stale file " + filePath
+    outputManifest.save()
+
+
+# Returns the path of a file listed in SOURCES, HEADERS, FORMS, RESOURCES or
+# INCLUDEPATH of the given project, or None if it uses unsupported qmake
+# variables
+def getProjectFilePath(project, value):
+    value = (value.replace('$$PWD', project.dir)
+                  .replace('$$_PRO_FILE_PWD_', project.dir)
+                  .replace('$$OUT_PWD', project.outDir))
+    if '$' in value:
+        printError("unsupported value " + value + " in project " + project.relDir)
+        return None
+    if not os.path.isabs(value):
+        value = project.dir + '/' + value
+    return os.path.normpath(value)
+
+# Returns the path of the object file compiled from the given source file of
+# the given project. Generated sources are already in the output directory.
+def getObjectFilePath(project, sourcePath):
+    if sourcePath.startswith(project.outDir + '/'):
+        return os.path.splitext(sourcePath)[0] + '.o'
+    relPath = os.path.relpath(sourcePath, project.dir).replace('..', '__')
+    return project.outDir + '/' + os.path.splitext(relPath)[0] + '.o'
+
+# Returns the path of the file built for the given lib or app project
+def getTargetFilePath(project):
+    if project.linkMode == "shared":
+        return project.outDir + '/lib' + project.name + '.so'
+    elif project.template == "lib":
+        return project.outDir + '/lib' + project.name + '.a'
+    else:
+        return project.outDir + '/' + project.name
+
+# Returns whether the given file must be processed by moc. Missing files are
+# ignored, Ninja reports them when building.
+def fileNeedsMoc(filePath):
+    if not os.path.isfile(filePath):
+        return False
+    return ninjagen.needsMoc(buildutils.readFromFile(filePath))
+
+# Generate <root-out-dir>/build.ninja, building all libs and apps of the
+# distribution in a single Ninja build graph (see ninjagen.py)
+def generateNinjaFile():
+    # Projects restored from the dependency index need their sorted dependencies
+    setMissingSortedDepends()
+
+    qtPaths = ninjagen.queryQt(os.environ.get('QMAKE', 'qmake'))
+    if not qtPaths and any(project.qt_tdepends for project in projects.values()):
+        printError("cannot run qmake -query, Qt include and library paths are unknown.")
+    moc, uic, rcc = ninjagen.getQtTools(qtPaths)
+
+    cxxflags = ['-std=c++11', '-fPIC']
+    if release:
+        cxxflags += ['-O2', '-DNDEBUG', '-DQT_NO_DEBUG']
+    else:
+        cxxflags += ['-g']
+    cxxflags += ['-isystem', srcDir + '/third', '-I' + srcDir + '/libs']
+
+    n = ninjagen.NinjaWriter()
+    n.comment("This file was automatically generated by configure.py. Any edit will be lost.")
+    n.newline()
+    n.variable('ninja_required_version', '1.3')
+    n.variable('builddir', ninjagen.escapePath(configureOutDir))
+    n.variable('cxx', ninjagen.quoteArg(os.environ.get('CXX', 'c++')))
+    n.variable('ar', ninjagen.quoteArg(os.environ.get('AR', 'ar')))
+    n.variable('cxxflags', (ninjagen.quoteArgs(cxxflags) + ' ' + os.environ.get('CXXFLAGS', '').replace('$', '$$')).strip())
+    n.variable('ldflags', os.environ.get('LDFLAGS', '').replace('$', '$$'))
+    n.variable('moc', ninjagen.quoteArg(moc))
+    n.variable('uic', ninjagen.quoteArg(uic))
+    n.variable('rcc', ninjagen.quoteArg(rcc))
+    n.newline()
+
+    n.rule('cxx', '$cxx -MMD -MF $out.d $cxxflags $flags -c $in -o $out',
+           description='CXX $out', depfile='$out.d', deps='gcc')
+    n.rule('pch', '$cxx -MMD -MF $out.d $cxxflags $flags -x c++-header -c $in -o $out',
+           description='PCH $out', depfile='$out.d', deps='gcc')
+    n.rule('ar', 'rm -f $out && $ar crs $out $in $postlink', description='AR $out')
+    if useStagedLibs:
+        # Objects and libraries are passed in a response file, keeping
+        # command lines short (see stageLibs)
+        n.rule('solink', '$cxx -shared -Wl,-soname,$soname $ldflags -o $out @$out.rsp $postlink',
+               description='SOLINK $out', rspfile='$out.rsp', rspfileContent='$in $libs')
+        n.rule('link', '$cxx $ldflags -o $out @$out.rsp', description='LINK $out',
+               rspfile='$out.rsp', rspfileContent='$in $libs')
+    else:
+        n.rule('solink', '$cxx -shared -Wl,-soname,$soname $ldflags -o $out $in $libs $postlink',
+               description='SOLINK $out')
+        n.rule('link', '$cxx $ldflags -o $out $in $libs', description='LINK $out')
+    n.rule('moc', '$moc $flags $in -o $out', description='MOC $out')
+    n.rule('uic', '$uic $in -o $out', description='UIC $out')
+    n.rule('rcc', '$rcc -name $name $in -o $out', description='RCC $out')
+
+    # Run configure.py again when project files or the files they include, or
+    # the set of project files, change. Ninja runs from <root-out-dir>, and
+    # only regenerates the build file it loaded, i.e., build.ninja relative to
+    # <root-out-dir>. The build file is only written if its content changed,
+    # so Ninja must check its modification time again (restat) not to run
+    # configure.py forever.
+    environment = " ".join(
+        name + '=' + ninjagen.quoteArg(os.environ[name])
+        for name in ['CONFIGURE_NINJA', 'CONFIGURE_ARTIFACT_CACHE', 'CONFIGURE_ARTIFACT_CACHE_SIZE',
+                     'CONFIGURE_ARTIFACT_CACHE_AGE', 'CXX', 'AR', 'CXXFLAGS', 'LDFLAGS', 'QMAKE', 'QMAKESPEC']
+        if name in os.environ)
+    n.rule('configure',
+           environment + ' ' + ninjagen.quoteArgs([sys.executable, scriptDir + '/configure.py', rootDir, rootOutDir] + config),
+           description='Running configure.py', generator=True, restat=True)
+    configureInputs = list(searchedDirs)
+    configureInputs += [projects[relDir].proFilePath for relDir in sorted(projects)]
+    configureInputs += getIncludedFilePaths()
+    if os.path.isfile(ignoreFilePath):
+        configureInputs.append(ignoreFilePath)
+
+    # With the artifact cache, configure.py also runs when the inputs of a
+    # library change, to restore it from the cache if possible. Libraries
+    # already built from their current inputs have no build statement (see
+    # artifactcache.py).
+    for relDir in sorted(projects):
+        configureInputs += projects[relDir].artifactInputPaths
+    n.build(['build.ninja'], 'configure', implicit=configureInputs)
+    n.newline()
+
+    # Projects with the highest priority come first, so that Ninja starts
+    # them first among the ready ones (see computeSchedule)
+    targetFilePaths = []
+    for relDir in sorted(projects, key=lambda relDir: (-projects[relDir].priority, relDir)):
+        project = projects[relDir]
+        if project.template != "lib" and project.template != "app":
+            continue
+        key = re.sub(r"[^A-Za-z0-9_]", "_", relDir.replace('/', '__'))
+        n.comment(relDir)
+        if project.linkMode == "headers":
+            n.build([relDir], 'phony')
+            n.newline()
+            continue
+        targetFilePath = getTargetFilePath(project)
+        if project.isArtifactUpToDate:
+            n.build([relDir], 'phony', [targetFilePath])
+            targetFilePaths.append(targetFilePath)
+            n.newline()
+            continue
+
+        # Compiler flags of this project
+        qtModules = sorted(project.qt_tdepends)
+        qtIncludeFlags, qtDefineFlags = ninjagen.getQtCompileFlags(qtModules, qtPaths)
+        includeFlags = ['-I' + project.dir, '-I' + project.outDir]
+        for value in project.includepath:
+            includePath = getProjectFilePath(project, value)
+            if includePath:
+                includeFlags.append('-I' + includePath)
+        defineFlags = ['-D' + define for define in project.defines] + qtDefineFlags
+        n.variable('mocflags_' + key, ninjagen.quoteArgs(defineFlags + includeFlags))
+        n.variable('flags_' + key, ninjagen.quoteArgs(defineFlags + includeFlags + qtIncludeFlags))
+
+        # Files generated by uic and rcc
+        sourcePaths = []
+        generatedHeaderPaths = []
+        for value in project.forms:
+            formPath = getProjectFilePath(project, value)
+            if formPath:
+                headerPath = project.outDir + '/ui_' + os.path.splitext(os.path.basename(formPath))[0] + '.h'
+                n.build([headerPath], 'uic', [formPath])
+                generatedHeaderPaths.append(headerPath)
+        for value in project.resources:
+            qrcPath = getProjectFilePath(project, value)
+            if qrcPath:
+                name = os.path.splitext(os.path.basename(qrcPath))[0]
+                sourcePath = project.outDir + '/qrc_' + name + '.cpp'
+                resourcePaths = []
+                if os.path.isfile(qrcPath):
+                    qrcDir = os.path.dirname(qrcPath)
+                    for path in ninjagen.getQrcFiles(buildutils.readFromFile(qrcPath)):
+                        if os.path.isfile(qrcDir + '/' + path):
+                            resourcePaths.append(os.path.normpath(qrcDir + '/' + path))
+                n.build([sourcePath], 'rcc', [qrcPath], implicit=resourcePaths,
+                        variables=[('name', ninjagen.quoteArg(name))])
+                sourcePaths.append(sourcePath)
+
+        # Files generated by moc. Headers are compiled separately, sources
+        # include the generated file.
+        for value in project.headers:
+            headerPath = getProjectFilePath(project, value)
+            if headerPath and project.qt and fileNeedsMoc(headerPath):
+                sourcePath = project.outDir + '/moc_' + os.path.splitext(os.path.basename(headerPath))[0] + '.cpp'
+                n.build([sourcePath], 'moc', [headerPath], variables=[('flags', '$mocflags_' + key)])
+                sourcePaths.append(sourcePath)
+        unitySources = set(value for batch in project.unityBatches for value in batch)
+        for value in project.sources:
+            sourcePath = getProjectFilePath(project, value)
+            if sourcePath and value not in unitySources:
+                if project.qt and fileNeedsMoc(sourcePath):
+                    mocPath = project.outDir + '/' + os.path.splitext(os.path.basename(sourcePath))[0] + '.moc'
+                    n.build([mocPath], 'moc', [sourcePath], variables=[('flags', '$mocflags_' + key)])
+                    generatedHeaderPaths.append(mocPath)
+                sourcePaths.append(sourcePath)
+        for k in range(len(project.unityBatches)):
+            sourcePaths.append(getUnityFilePath(project, k))
+
+        # Precompiled header, implicitly included by all sources. GCC uses
+        # pch.h.gch instead of pch.h since it is next to it.
+        compileFlags = '$flags_' + key
+        pchPaths = []
+        if project.pchHeaders:
+            pchFilePath = getPchFilePath(project)
+            n.build([pchFilePath + '.gch'], 'pch', [pchFilePath], orderOnly=generatedHeaderPaths,
+                    variables=[('flags', compileFlags)])
+            compileFlags += ' -include ' + ninjagen.quoteArg(pchFilePath)
+            pchPaths.append(pchFilePath + '.gch')
+
+        # Compile
+        objectPaths = []
+        for sourcePath in sourcePaths:
+            objectPath = getObjectFilePath(project, sourcePath)
+            n.build([objectPath], 'cxx', [sourcePath], implicit=pchPaths, orderOnly=generatedHeaderPaths,
+                    variables=[('flags', compileFlags)])
+            objectPaths.append(objectPath)
+
+        # Archive or link. Libraries are linked from most dependent to least
+        # dependent. Modifying a shared library doesn't relink the projects
+        # depending on it, and header-only libraries are not linked (see
+        # getLinkMode).
+        variables = []
+        if project.linkMode and artifactCacheDir:
+            storeArgs = [sys.executable, scriptDir + '/artifactcache.py', 'store', project.outDir]
+            variables.append(('postlink', '&& ' + ninjagen.quoteArgs(storeArgs)))
+        if project.linkMode == "static":
+            n.build([targetFilePath], 'ar', objectPaths, variables=variables)
+        else:
+            libPaths = []
+            staticLibPaths = []
+            sharedLibPaths = []
+            rpathFlags = []
+            if useStagedLibs:
+                libPaths.append('-L' + stagedLibsDir)
+            for libProject in getLinkedLibProjects(project):
+                if useStagedLibs and libProject.relDir in stagedLibRelDirs:
+                    libPaths.append('-l' + libProject.name)
+                    rpathFlag = '-Wl,-rpath,' + stagedLibsDir
+                else:
+                    libPaths.append(getTargetFilePath(libProject))
+                    rpathFlag = '-Wl,-rpath,' + libProject.outDir
+                if libProject.linkMode == "shared":
+                    sharedLibPaths.append(getTargetFilePath(libProject))
+                    if rpathFlag not in rpathFlags:
+                        rpathFlags.append(rpathFlag)
+                else:
+                    staticLibPaths.append(getTargetFilePath(libProject))
+            libs = ninjagen.quoteArgs(libPaths + rpathFlags + ninjagen.getQtLinkFlags(qtModules, qtPaths))
+            variables.append(('libs', libs))
+            if project.template == "lib":
+                rule = 'solink'
+                variables.append(('soname', ninjagen.quoteArg(os.path.basename(targetFilePath))))
+            else:
+                rule = 'link'
+            n.build([targetFilePath], rule, objectPaths, implicit=staticLibPaths,
+                    orderOnly=sharedLibPaths, variables=variables)
+        n.build([relDir], 'phony', [targetFilePath])
+        targetFilePaths.append(targetFilePath)
+        n.newline()
+
+    n.build(['all'], 'phony', targetFilePaths)
+    n.default(['all'])
+
+    content = n.getContent()
+    if buildutils.readFromFileIfExists(ninjaFilePath) != content:
+        buildutils.writeToFileAtomically(ninjaFilePath, content)
+
+
+# Cache of the #include directives of sources (see includescan.py), shared by
+# all steps scanning sources. It is loaded on first use.
+includeCache = None
+
+def getIncludeCache():
+    global includeCache
+    if includeCache is None:
+        includeCache = includescan.IncludeCache(configureOutDir + '/includecache.json')
+        includeCache.load()
+    return includeCache
+
+
+# Scans the #include directives of the sources and headers of all libs and
+# apps, and writes the dependencies they actually use, compared with the
+# declared ones, to includes.txt (see includescan.py)
+def scanIncludes():
+    includeCache = getIncludeCache()
+
+    # Libraries whose headers are included by each project
+    relDirs = sorted(relDir for relDir in projects
+                     if projects[relDir].template == "lib" or projects[relDir].template == "app")
+    usedGraph = {}
+    for relDir in relDirs:
+        project = projects[relDir]
+        usedRelDirs = set()
+        for value in project.sources + project.headers:
+            filePath = getProjectFilePath(project, value)
+            if not filePath:
+                continue
+            for includePath in includeCache.getIncludes(filePath):
+                includedRelDir = includescan.getIncludedProjectRelDir(includePath, projects)
+                if (includedRelDir and includedRelDir != relDir and
+                    projects[includedRelDir].template == "lib"):
+                    usedRelDirs.add(includedRelDir)
+        usedGraph[relDir] = sorted(usedRelDirs)
+    includeCache.save()
+
+    # Compare with declared dependencies. Included libraries already implied
+    # by other included libraries are not needed in LIB_DEPENDS.
+    setMissingSortedDepends(relDirs)
+    minimalGraph = depgraph.findTransitiveReduction(relDirs, usedGraph)
+    results = []
+    numUnused = 0
+    numMissing = 0
+    for relDir in relDirs:
+        declared = set(dependsGraph.get(relDir, []))
+        unused = sorted(declared - set(usedGraph[relDir]))
+        tdepends = set(sdependsByRelDir[relDir][1])
+        missing = [usedRelDir for usedRelDir in usedGraph[relDir] if usedRelDir not in tdepends]
+        minimal = sorted(minimalGraph[relDir])
+        if unused or missing or set(minimal) != declared:
+            results.append((relDir, unused, missing, minimal))
+            numUnused += len(unused)
+            numMissing += len(missing)
+
+    content = includescan.getReport(results)
+    if buildutils.readFromFileIfExists(includesFilePath) != content:
+        buildutils.writeToFileAtomically(includesFilePath, content)
+    print ("[configure.py] Scanned includes: %d unused and %d missing dependencies in %d projects (see %s)" %
+           (numUnused, numMissing, len(results), includesFilePath))
+
+
+# Returns the given content or path with the root directories replaced by
+# placeholders, so that keys don't depend on where the distribution is
+def getRelocatedText(text):
+    return text.replace(rootOutDir, '<root-out-dir>').replace(rootDir, '<root-dir>')
+
+# Returns the key of the files built for the given lib project in the artifact
+# cache, and the paths of the files it is computed from, as a tuple (see
+# artifactcache.py). 'keys' maps the relDirs of the libraries it depends on to
+# their key. 'isFileCache' maps the paths already tested with os.path.isfile()
+# to the result.
+#
+# The inputs are the sources, headers, forms and resources of the project,
+# the files listed by its resources, and the headers they transitively
+# include, searched like the compiler does in the directory of the including
+# file, the project directory, src/libs, src/third, and INCLUDEPATH. Headers
+# which are not found (e.g., Qt headers) are ignored.
+#
+def getArtifactKey(project, keys, isFileCache):
+    includeCache = getIncludeCache()
+    searchDirs = [project.dir, libsDir, thirdDir]
+    for value in project.includepath:
+        includePath = getProjectFilePath(project, value)
+        if includePath:
+            searchDirs.append(includePath)
+
+    inputPaths = set()
+    filePaths = []
+    for value in project.sources + project.headers + project.forms + project.resources:
+        filePath = getProjectFilePath(project, value)
+        if filePath:
+            filePaths.append(filePath)
+    for value in project.resources:
+        qrcPath = getProjectFilePath(project, value)
+        if qrcPath and os.path.isfile(qrcPath):
+            qrcDir = os.path.dirname(qrcPath)
+            for path in ninjagen.getQrcFiles(buildutils.readFromFile(qrcPath)):
+                filePaths.append(os.path.normpath(qrcDir + '/' + path))
+    while filePaths:
+        filePath = filePaths.pop()
+        if filePath in inputPaths:
+            continue
+        inputPaths.add(filePath)
+        for includePath in includeCache.getIncludes(filePath):
+            for searchDir in [os.path.dirname(filePath)] + searchDirs:
+                includedPath = os.path.normpath(searchDir + '/' + includePath)
+                if includedPath not in isFileCache:
+                    isFileCache[includedPath] = os.path.isfile(includedPath)
+                if isFileCache[includedPath]:
+                    filePaths.append(includedPath)
+                    break
+
+    lines = ["version %d" % artifactcache.cacheVersion]
+    if useNinja:
+        lines.append("backend ninja")
+    else:
+        lines.append("backend qmake")
+    lines.append("config " + " ".join(config))
+    for name in ['CXX', 'AR', 'CXXFLAGS', 'QMAKE', 'QMAKESPEC']:
+        lines.append(name + "=" + os.environ.get(name, ''))
+    configFileContent = getRelocatedText(buildutils.readFromFileIfExists(project.priFilePath))
+    lines.append(buildutils.getContentHash(configFileContent) + " .config.pri")
+    for filePath in sorted(inputPaths):
+        lines.append(str(includeCache.getHash(filePath)) + " " + getRelocatedText(filePath))
+    for relDir in (["libs/" + libname for libname in project.lib_sdepends] +
+                   ["third/" + libname for libname in project.third_sdepends]):
+        lines.append(keys.get(relDir, "") + " " + relDir)
+    return (buildutils.getContentHash("\n".join(lines)), sorted(inputPaths))
+
+# Computes the key of each lib in the artifact cache, and restores from the
+# cache the libs whose output directory doesn't contain files built from
+# their current inputs (see artifactcache.py). Libraries are processed from
+# least to most dependent, since the key of a library depends on the keys of
+# the libraries it depends on.
+def updateArtifacts():
+    for project in projects.values():
+        project.isArtifactUpToDate = False
+    if hasCycles:
+        printError("the artifact cache is disabled since dependencies have cycles.")
+        return
+    setMissingSortedDepends()
+
+    cache = artifactcache.ArtifactCache(artifactCacheDir)
+    keys = {}
+    isFileCache = {}
+    numUpToDate = 0
+    numRestored = 0
+    numMissed = 0
+    for relDir in depgraph.findTopologicalOrder(sorted(projects), dependsGraph):
+        project = projects[relDir]
+        if project.linkMode != "static" and project.linkMode != "shared":
+            continue
+        project.artifactKey, project.artifactInputPaths = getArtifactKey(project, keys, isFileCache)
+        keys[relDir] = project.artifactKey
+
+        # Record the key and the inputs, checked before storing the built files
+        inputs = []
+        for filePath in project.artifactInputPaths:
+            try:
+                stat = os.stat(filePath)
+                inputs.append([filePath, stat.st_mtime, stat.st_size])
+            except OSError:
+                pass
+        data = {
+            'version':  artifactcache.cacheVersion,
+            'cacheDir': artifactCacheDir,
+            'maxSize':  artifactCacheMaxSize * 1024 * 1024,
+            'maxAge':   artifactCacheMaxAge * 24 * 3600,
+            'key':      project.artifactKey,
+            'inputs':   inputs }
+        inputsFilePath = project.outDir + '/' + artifactcache.inputsFileName
+        if buildutils.readJsonFile(inputsFilePath) != data:
+            buildutils.writeJsonFile(inputsFilePath, data)
+
+        # Restore the built files, unless they are already up to date
+        builtKeyFilePath = project.outDir + '/' + artifactcache.builtKeyFileName
+        if (buildutils.readFromFileIfExists(builtKeyFilePath) == project.artifactKey and
+            os.path.isfile(getTargetFilePath(project))):
+            project.isArtifactUpToDate = True
+            numUpToDate += 1
+        elif cache.restore(project.artifactKey, project.outDir):
+            buildutils.writeToFileAtomically(builtKeyFilePath, project.artifactKey)
+            project.isArtifactUpToDate = True
+            numRestored += 1
+        else:
+            numMissed += 1
+    getIncludeCache().save()
+    cache.evict(artifactCacheMaxSize * 1024 * 1024, artifactCacheMaxAge * 24 * 3600)
+    print ("[configure.py] Artifact cache: %d libraries restored, %d missed, %d up to date (see %s)" %
+           (numRestored, numMissed, numUpToDate, artifactCacheDir + '/stats.log'))
+
+
+# Index of the direct dependencies of the last run (see depindex.py). It is
+# only valid for the same arguments and the same scripts. Settings are set by
+# setArguments() (rootDir, scriptsHash) and by setVariant() (config,
+# rootOutDir, artifactCacheDir), as well as the path of the index, in
+# <root-out-dir>/.configure.
+dependsIndexFilePath = ''
+dependsIndexSettings = {}
+
+# Index loaded by loadDependsIndex(), from which the sorted dependencies of
+# the last run are computed when they are needed (see computeDepends())
+loadedDependsIndex = None
+
+# Restores the direct dependencies and the subdir dependencies from the index
+# saved by the last run, and sets the direct
+# dependencies of projects whose project file changed since then. Returns the
+# relDirs of these projects, or None if the index can't be used, e.g., if
+# projects were added or removed, or if their TEMPLATE or SUBDIRS changed.
+def loadDependsIndex():
+    global loadedDependsIndex
+    index = depindex.DependsIndex(dependsIndexFilePath, dependsIndexSettings)
+    index.load()
+    if not index.isLoaded or index.hasCycles or len(index.structure) != len(projects):
+        return None
+    for relDir in projects:
+        project = projects[relDir]
+        if index.structure.get(relDir) != [project.template, project.subdirs]:
+            return None
+
+    # Restore dependencies. Closures are not restored: they are only computed
+    # for the projects needing them (see setMissingSortedDepends()).
+    dependsGraph.update(index.dependsGraph)
+    for relDir in index.dependentsGraph:
+        dependentsGraph[relDir] = set(index.dependentsGraph[relDir])
+
+    # Restore subdir dependencies
+    loadedDependsIndex = index
+    subdirsDependsCounts.update(index.subdirsDependsCounts)
+    for dependentRelDir, dependeeKey in subdirsDependsCounts:
+        projects[dependentRelDir].subdirDependsKeys.add(dependeeKey)
+
+    # Set direct dependencies which changed
+    changedRelDirs = []
+    for relDir in sorted(projects):
+        project = projects[relDir]
+        dependees = getDirectDependees(project)
+        if dependees != dependsGraph[relDir] or project.qt != index.qt[relDir]:
+            setDirectDependees(relDir, dependees)
+            changedRelDirs.append(relDir)
+    return changedRelDirs
+
+# Saves the direct dependencies and the subdir dependencies, so that the next
+# run can use them. The index is not written again if it didn't change.
+def saveDependsIndex():
+    index = depindex.DependsIndex(dependsIndexFilePath, dependsIndexSettings)
+    for relDir in projects:
+        project = projects[relDir]
+        index.structure[relDir] = [project.template, project.subdirs]
+        index.qt[relDir] = project.qt
+        index.dependentsGraph[relDir] = sorted(dependentsGraph.get(relDir, []))
+        if project.unityBatches:
+            index.unityBatches[relDir] = project.unityBatches
+        if project.pchHeaders:
+            index.pchHeaders[relDir] = project.pchHeaders
+        if project.linkMode and project.linkMode != "static":
+            index.linkModes[relDir] = project.linkMode
+    index.hasCycles = hasCycles
+    index.dependsGraph = dependsGraph
+    for subdirsDepend in subdirsDependsCounts:
+        if subdirsDependsCounts[subdirsDepend] > 0:
+            index.subdirsDependsCounts[subdirsDepend] = subdirsDependsCounts[subdirsDepend]
+    index.save(loadedDependsIndex)
+
+
+# relDirs of the projects whose sorted dependencies changed since the last run,
+# and of the projects whose .config.pri must be generated. None means all
+# projects. Set by updateDepends() and updateSubdirsDepends().
+relDirsToUpdate = None
+relDirsToGenerate = None
+
+# Compute dependencies. Only the projects downstream of projects whose direct
+# dependencies changed since the last run are computed again, if possible
+# (see loadDependsIndex()).
+def updateDepends():
+    global relDirsToUpdate
+    changedRelDirs = loadDependsIndex()
+    if changedRelDirs is None:
+        relDirsToUpdate = None
+        computeDepends()
+    else:
+        relDirsToUpdate = computeDepends(changedRelDirs)
+
+# Resolve subdir dependencies of projects whose sorted dependencies changed
+def updateSubdirsDepends():
+    global relDirsToGenerate
+    if relDirsToUpdate is None:
+        relDirsToGenerate = None
+        resolveSubdirsDepends()
+    else:
+        changedProjects = resolveSubdirsDepends(relDirsToUpdate)
+        relDirsToGenerate = set(relDirsToUpdate)
+        for project in changedProjects:
+            if project.parentProject:
+                relDirsToGenerate.add(project.parentProject.relDir)
+
+# Compute the priority of projects. Since it may change the order of SUBDIRS
+# of any subdirs project, all of them are generated again (files whose content
+# didn't change are not written, see manifest.py).
+def updateSchedule():
+    computeSchedule()
+    if relDirsToGenerate is not None:
+        for relDir in projects:
+            if projects[relDir].template == "subdirs":
+                relDirsToGenerate.add(relDir)
+
+# Generate .config.pri files whose content may have changed, as well as
+# missing ones, and save the dependency index for the next run
+def updateConfigFiles():
+    if relDirsToGenerate is None:
+        generateConfigFiles()
+    else:
+        for relDir in projects:
+            if not os.path.isfile(projects[relDir].priFilePath):
+                relDirsToGenerate.add(relDir)
+        generateConfigFiles(sorted(relDirsToGenerate))
+    saveDependsIndex()
+
+
+# Forget everything computed by previous steps, so that all steps can be run
+# again, e.g., after project files were added or removed.
+def reset():
+    global parseCache, loadedDependsIndex, includeCache
+    parseCache = parsecache.ParseCache(configureOutDir + '/parsecache.json', config, srcDir, srcOutDir)
+    loadedDependsIndex = None
+    includeCache = None
+    projects.clear()
+    del searchedDirs[:]
+    dependsGraph.clear()
+    dependentsGraph.clear()
+    sdependsByRelDir.clear()
+    indexSDependsByRelDir.clear()
+    subdirsDependsByRelDir.clear()
+    subdirsDependsCounts.clear()
+
+
+# Updates projects and generated files after the given project files were
+# modified, without running all steps of the script: only the closures of the
+# modified projects and of the projects depending on them are computed again,
+# and only their .config.pri files, and those of their parents, are generated.
+#
+# Returns False if this is not possible, i.e., if one of the files is not a
+# known project file, or if its TEMPLATE, SUBDIRS or included files changed.
+# Then, reset() and all steps must be run instead.
+#
+def updateProjects(proFilePaths):
+    # Parse modified project files
+    changedRelDirs = []
+    linkModeChangedRelDirs = []
+    for proFilePath in proFilePaths:
+        relDir = os.path.dirname(proFilePath)[len(srcDir)+1:]
+        project = projects.get(relDir)
+        if project is None or project.proFilePath != proFilePath:
+            return False
+        parseCache.forget(proFilePath)
+        fields = parseCache.getFields(proFilePath)
+        if (fields['template'] != project.template or fields['subdirs'] != project.subdirs or
+            fields['includes'] != project.includedFilePaths):
+            return False
+        linkMode = project.linkMode
+        setProjectFields(project, fields)
+        project.linkMode = getLinkMode(project)
+        if project.linkMode != linkMode:
+            linkModeChangedRelDirs.append(relDir)
+        project.unityBatches = getUnityBatches(project)
+        project.pchHeaders = getPrecompiledHeaders(project)
+        setDirectDependees(relDir, getDirectDependees(project))
+        changedRelDirs.append(relDir)
+    parseCache.save()
+
+    # Update dependencies
+    updatedRelDirs = computeDepends(changedRelDirs)
+    updatedRelDirs.update(changedRelDirs)
+    changedProjects = resolveSubdirsDepends(updatedRelDirs)
+
+    # Generate .config.pri files whose content may have changed
+    relDirsToGenerate = set(updatedRelDirs)
+    for project in changedProjects:
+        if project.parentProject:
+            relDirsToGenerate.add(project.parentProject.relDir)
+    for relDir in linkModeChangedRelDirs:
+        relDirsToGenerate.update(getTransitiveDependents(relDir))
+    computeSchedule()
+    for relDir in projects:
+        if projects[relDir].template == "subdirs":
+            relDirsToGenerate.add(relDir)
+    if useStagedLibs and linkModeChangedRelDirs:
+        stageLibs()
+    generateConfigFiles(sorted(relDirsToGenerate))
+    saveDependsIndex()
+    if artifactCacheDir:
+        updateArtifacts()
+    if useNinja:
+        generateNinjaFile()
+    return True
+
+
+# Sets the arguments of this script, i.e., <root-dir>, <root-out-dir> and
+# CONFIG, and all the variables derived from them or from environment
+# variables (see the beginning of this file). Must be called before any step.
+def setArguments(args):
+    global rootDir, buildtoolsDir, srcDir, appDir, libsDir, thirdDir, testsDir, ignoreFilePath
+    global numJobs, useDirIndex, profileMode, useIncludeScan, artifactCacheMaxSize, artifactCacheMaxAge
+    global dependsIndexSettings
+
+    # Directories of <root-dir>
+    rootDir = args[0]
+    buildtoolsDir = rootDir + '/buildtools'
+    srcDir   = rootDir + '/src'
+    appDir   = rootDir + '/src/app'
+    libsDir  = rootDir + '/src/libs'
+    thirdDir = rootDir + '/src/third'
+    testsDir = rootDir + '/tests'
+    ignoreFilePath = rootDir + '/.configureignore'
+
+    # Settings of environment variables
+    numJobs = 1
+    if os.environ.get('CONFIGURE_JOBS'):
+        try:
+            numJobs = int(os.environ['CONFIGURE_JOBS'])
+        except ValueError:
+            printError("invalid CONFIGURE_JOBS value: " + os.environ['CONFIGURE_JOBS'])
+        if numJobs <= 0:
+            numJobs = multiprocessing.cpu_count()
+    useDirIndex = os.environ.get('CONFIGURE_DIR_INDEX', '1') != '0'
+    profileMode = os.environ.get('CONFIGURE_PROFILE', '0')
+    if profileMode == '0':
+        profileMode = ''
+    useIncludeScan = os.environ.get('CONFIGURE_SCAN_INCLUDES', '0') == '1'
+    artifactCacheMaxSize = 2048
+    artifactCacheMaxAge = 30
+    try:
+        artifactCacheMaxSize = float(os.environ.get('CONFIGURE_ARTIFACT_CACHE_SIZE', artifactCacheMaxSize))
+    except ValueError:
+        printError("invalid CONFIGURE_ARTIFACT_CACHE_SIZE value: " + os.environ['CONFIGURE_ARTIFACT_CACHE_SIZE'])
+    try:
+        artifactCacheMaxAge = float(os.environ.get('CONFIGURE_ARTIFACT_CACHE_AGE', artifactCacheMaxAge))
+    except ValueError:
+        printError("invalid CONFIGURE_ARTIFACT_CACHE_AGE value: " + os.environ['CONFIGURE_ARTIFACT_CACHE_AGE'])
+
+    dependsIndexSettings = {
+        'rootDir':          rootDir,
+        'scriptsHash':      stamp.getScriptsHash() }
+    setVariant(args[1], args[2:])
+
+# Sets the variant of the build, i.e., <root-out-dir> and CONFIG, and all the
+# variables derived from them: the variables of this file depending on the
+# arguments of this script are all set here. It is called by setArguments(),
+# and by multiconfigure.py to switch to another variant, as if this script had
+# been run with its arguments. Projects found
+# and parsed so far are kept, and their output paths updated, but their
+# fields are only evaluated again with the new CONFIG by
+# updateVariantProjects().
+def setVariant(variantRootOutDir, variantConfig):
+    global stampArgs, rootOutDir, config, unix, win32, release, debug, releaseOrDebug
+    global useNinja, artifactCacheDir, useStagedLibs, pythonCmd
+    global srcOutDir, appOutDir, libsOutDir, thirdOutDir, testsOutDir, configureOutDir
+    global stagedLibsDir, stampFilePath, ninjaFilePath, includesFilePath, scheduleFilePath, ninjaLogFilePath
+    global parseCache, includeCache, dependsIndexFilePath, dependsIndexSettings, phases
+    global numErrors, numVariantErrors
+
+    # Arguments and configuration variables. Errors reported for the previous
+    # variant are forgotten.
+    numErrors -= numVariantErrors
+    numOtherErrors = numErrors
+    rootOutDir = variantRootOutDir
+    config = list(variantConfig)
+    stampArgs = [rootDir, rootOutDir] + config + getStampEnvironment()
+    unix = 'unix' in config
+    win32 = 'win32' in config
+    release = True
+    for s in config:
+        if s == 'release' or s == 'debug':
+            release = (s == 'release')
+    debug = not release
+    releaseOrDebug = 'release' if release else 'debug'
+    useNinja = os.environ.get('CONFIGURE_NINJA', '0') == '1'
+    if useNinja and not unix:
+        printError("CONFIGURE_NINJA is only supported on Unix.")
+        useNinja = False
+    artifactCacheDir = os.environ.get('CONFIGURE_ARTIFACT_CACHE', '')
+    if artifactCacheDir and not unix:
+        printError("CONFIGURE_ARTIFACT_CACHE is only supported on Unix.")
+        artifactCacheDir = ''
+    if artifactCacheDir:
+        artifactCacheDir = os.path.abspath(os.path.expanduser(artifactCacheDir))
+    useStagedLibs = 'stage_libs' in config
+    if useStagedLibs and not unix:
+        printError("CONFIG+=stage_libs is only supported on Unix.")
+        useStagedLibs = False
+    numVariantErrors = numErrors - numOtherErrors
+    pythonCmd = 'python.exe' if win32 else 'python'
+
+    # Directories and files
+    srcOutDir   = rootOutDir + '/src'
+    appOutDir   = rootOutDir + '/src/app'
+    libsOutDir  = rootOutDir + '/src/libs'
+    thirdOutDir = rootOutDir + '/src/third'
+    testsOutDir = rootOutDir + '/tests'
+    configureOutDir  = rootOutDir + '/.configure'
+    stagedLibsDir    = rootOutDir + '/lib'
+    stampFilePath    = configureOutDir + '/stamp.txt'
+    ninjaFilePath    = rootOutDir + '/build.ninja'
+    includesFilePath = configureOutDir + '/includes.txt'
+    scheduleFilePath = configureOutDir + '/schedule.txt'
+    ninjaLogFilePath = configureOutDir + '/.ninja_log'
+    for relDir in projects:
+        project = projects[relDir]
+        project.outDir = srcOutDir + project.dir[len(srcDir):]
+        project.priFilePath = project.outDir + '/' + project.priFileName
+
+    # Caches and indexes of <root-out-dir>
+    parseCache = parsecache.ParseCache(configureOutDir + '/parsecache.json', config, srcDir, srcOutDir)
+    includeCache = None
+    dependsIndexFilePath = configureOutDir + '/depindex.json'
+    dependsIndexSettings = dict(dependsIndexSettings, config=config, rootOutDir=rootOutDir,
+                                artifactCacheDir=artifactCacheDir)
+    phases = getPhases()
+
+# Evaluates the project files again with the CONFIG of the variant set by
+# setVariant(), from the parse cache of this variant or else from the
+# statements already tokenized (see qmakeeval.py), and computes again only
+# the closures of the projects whose direct dependencies or Qt modules differ
+# from those of the previous variant. All .config.pri files of the variant
+# are then generated by the steps not in sharedPhaseNames.
+#
+# Returns False if this is not possible, i.e., if the TEMPLATE, SUBDIRS or
+# included files of a project differ: the distribution doesn't have the same
+# structure in this variant, and reset() and all steps must be run instead.
+#
+def updateVariantProjects():
+    global relDirsToUpdate, relDirsToGenerate
+    structures = {}
+    qts = {}
+    for relDir in projects:
+        project = projects[relDir]
+        structures[relDir] = [project.template, project.subdirs, project.includedFilePaths]
+        qts[relDir] = project.qt
+    parseCache.load()
+    parseProjects()
+    for relDir in projects:
+        project = projects[relDir]
+        if [project.template, project.subdirs, project.includedFilePaths] != structures[relDir]:
+            return False
+
+    # Update dependencies. Closures computed with cycles are not reused, like
+    # a dependency index with cycles (see loadDependsIndex).
+    if hasCycles:
+        computeDepends()
+        for relDir in projects:
+            projects[relDir].subdirDependsKeys.clear()
+        resolveSubdirsDepends()
+    else:
+        changedRelDirs = []
+        for relDir in sorted(projects):
+            project = projects[relDir]
+            dependees = getDirectDependees(project)
+            if dependees != dependsGraph[relDir] or project.qt != qts[relDir]:
+                setDirectDependees(relDir, dependees)
+                changedRelDirs.append(relDir)
+        updatedRelDirs = computeDepends(changedRelDirs)
+        updatedRelDirs.update(changedRelDirs)
+        resolveSubdirsDepends(updatedRelDirs)
+    relDirsToUpdate = None
+    relDirsToGenerate = None
+    return True
+
+
+# Returns all steps of the script, in order, as (name, function) tuples,
+# depending on the settings of the current variant. Names are used to report
+# the time spent in each step (see instrument.py and benchconfigure.py).
+def getPhases():
+    res = [
+        ('discovery', findProjects),
+        ('parse',     parseProjects),
+        ('depends',   updateDepends),
+        ('children',  setParentChildRelationships),
+        ('subdirs',   updateSubdirsDepends),
+        ('linkmodes', updateLinkModes),
+        ('schedule',  updateSchedule),
+        ('unity',     updateUnityBatches),
+        ('pch',       updatePrecompiledHeaders)]
+    if useStagedLibs:
+        res.append(('stage', stageLibs))
+    res.append(('generate', updateConfigFiles))
+    if artifactCacheDir:
+        res.append(('artifacts', updateArtifacts))
+    if useNinja:
+        res.append(('ninja', generateNinjaFile))
+    if useIncludeScan:
+        res.append(('includes', scanIncludes))
+    return res
+
+# Steps of the current variant, set by setVariant()
+phases = []
+
+# Names of the steps shared by all variants configured by multiconfigure.py:
+# the remaining steps are run for each variant (see updateVariantProjects)
+sharedPhaseNames = ['discovery', 'parse', 'depends', 'children', 'subdirs']
+
+# Writes the stamp file allowing the next run to exit immediately if nothing
+# changed (see stamp.py). Removes it if errors were reported during this run,
+# or if some project files are racy, i.e., were modified shortly before
+# startTime, the time at which the run started.
+def writeStamp(startTime):
+    if numErrors:
+        if os.path.isfile(stampFilePath):
+            os.remove(stampFilePath)
+        return
+    inputPaths = searchedDirs + [projects[relDir].proFilePath for relDir in sorted(projects)] + [ignoreFilePath]
+    inputPaths += getIncludedFilePaths()
+    outputPaths = [projects[relDir].priFilePath for relDir in sorted(projects)]
+
+    # Unity batches, precompiled headers and header-only libraries depend on
+    # the content of sources and headers
+    for relDir in sorted(projects):
+        inputPaths += getContentInputPaths(projects[relDir])
+
+    # Libraries are restored from the artifact cache when their inputs change
+    for relDir in sorted(projects):
+        inputPaths += projects[relDir].artifactInputPaths
+    if useNinja:
+        outputPaths.append(ninjaFilePath)
+    content = stamp.getContentIfNotRacy(stampArgs, inputPaths, outputPaths, startTime)
+    if content:
+        buildutils.writeToFileAtomically(stampFilePath, content)
+    elif os.path.isfile(stampFilePath):
+        os.remove(stampFilePath)
+
+# Run all steps of the script, or only those whose name is in phaseNames. The
+# stamp file and the reports are only written if the .config.pri files were
+# generated. startTime is the time at which the run started, if it started
+# before this call (see multiconfigure.py).
+def main(phaseNames=None, startTime=None):
+    if startTime is None:
+        startTime = time.time()
+    runPhases = [(name, function) for name, function in phases
+                 if phaseNames is None or name in phaseNames]
+    isComplete = 'generate' in [name for name, function in runPhases]
+    if not profileMode:
+        for name, function in runPhases:
+            function()
+        if isComplete:
+            writeStamp(startTime)
+        return
+
+    profiler = instrument.PhaseProfiler(profileMode == 'cprofile')
+    for name, function in runPhases:
+        profiler.runPhase(name, function)
+    if not isComplete:
+        return
+    writeStamp(startTime)
+    buildutils.writeJsonFile(configureOutDir + '/profile.json', profiler.getReport())
+    buildutils.writeJsonFile(configureOutDir + '/trace.json', profiler.getTrace())
+    profiler.dumpSlowestPhaseProfile(configureOutDir + '/slowest-phase.prof')
+    for line in profiler.getSummary():
+        print "[configure.py] " + line
+
+
+if __name__ == "__main__":
+    setArguments(sys.argv[1:])
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Graph algorithms used by configure.py on the dependency graph of projects.
+#
+# A graph is given as a list of nodes, and a dictionary 'successors' mapping
+# each node to the list of nodes it depends on. Nodes can be any hashable
+# value, configure.py uses the relDir of projects.
+#
+# All algorithms are iterative (no recursion limit on deep graphs) and visit
+# each node and edge a constant number of times.
+#
+# Sets of nodes are represented as bitsets, i.e., Python integers where bit i
+# is set if the node of index i belongs to the set. Unions of such sets are
+# computed by the C implementation of big integers, which is much faster than
+# unions of Python sets, but still costs O(V / 64) machine words for bitsets
+# of V nodes: algorithms computing such unions per edge are O(E * V / 64),
+# not linear.
+
+import heapq
+
+import instrument
+
+
+# Returns the strongly connected components of the given graph, using Tarjan's
+# algorithm. Each component is a list of nodes. Components are returned in
+# reverse topological order, i.e., a component is always returned after all
+# the components it depends on.
+#
+# A component with more than one node, or whose only node depends on itself,
+# is a dependency cycle.
+#
+def findStronglyConnectedComponents(nodes, successors):
+    index = {}        # Order in which nodes are discovered
+    lowlink = {}      # Smallest index reachable from the node within the DFS tree
+    onStack = set()   # Nodes in 'stack'
+    stack = []        # Nodes whose component is not yet known
+    components = []   # Result
+    nextIndex = 0
+
+    for root in nodes:
+        if root in index:
+            continue
+
+        # Iterative depth-first search. Each work item is a node and an
+        # iterator over its remaining successors.
+        index[root] = lowlink[root] = nextIndex
+        nextIndex += 1
+        stack.append(root)
+        onStack.add(root)
+        work = [(root, iter(successors.get(root, [])))]
+
+        while work:
+            node, remainingSuccessors = work[-1]
+
+            # Visit the next unvisited successor, if any
+            isDescending = False
+            for successor in remainingSuccessors:
+                if successor not in index:
+                    index[successor] = lowlink[successor] = nextIndex
+                    nextIndex += 1
+                    stack.append(successor)
+                    onStack.add(successor)
+                    work.append((successor, iter(successors.get(successor, []))))
+                    isDescending = True
+                    break
+                elif successor in onStack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            if isDescending:
+                continue
+
+            # All successors visited: backtrack
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+            # Pop component if node is its root
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    onStack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+
+    return components
+
+
+# Returns a dependency cycle within the given strongly connected component, as
+# a list of nodes starting and ending with the same node, e.g.:
+#
+#     [ "libs/A", "libs/B", "libs/C", "libs/A" ]
+#
+# Returns None if the component is not a cycle. The returned cycle is a
+# shortest one going through the first node of the component.
+#
+def findCycle(component, successors):
+    start = component[0]
+    if len(component) == 1:
+        if start in successors.get(start, []):
+            return [start, start]
+        else:
+            return None
+
+    # Breadth-first search from start, within the component, until start
+    # is reached again
+    members = set(component)
+    previous = {}
+    queue = [start]
+    i = 0
+    while i < len(queue):
+        node = queue[i]
+        i += 1
+        for successor in successors.get(node, []):
+            if successor == start:
+                cycle = [start, node]
+                while node != start:
+                    node = previous[node]
+                    cycle.append(node)
+                cycle.reverse()
+                return cycle
+            if successor in members and successor not in previous:
+                previous[successor] = node
+                queue.append(successor)
+
+
+# Returns all nodes in topological order, i.e., each node appears after all the
+# nodes it depends on. Uses Kahn's algorithm: among the nodes whose successors
+# are all already ordered, the smallest one is picked first, so the order only
+# depends on the graph, not on the order of 'nodes' or of the successors.
+#
+# If the graph has cycles, the smallest node not yet ordered is picked when no
+# other node is available, i.e., edges closing cycles are ignored. Successors
+# which are not in 'nodes' are ignored too.
+#
+def findTopologicalOrder(nodes, successors):
+    numUnorderedSuccessors = {}
+    predecessors = {}
+    for node in nodes:
+        numUnorderedSuccessors[node] = 0
+        predecessors[node] = []
+    for node in nodes:
+        for successor in successors.get(node, []):
+            if successor not in predecessors:
+                continue
+            numUnorderedSuccessors[node] += 1
+            predecessors[successor].append(node)
+
+    available = [node for node in nodes if numUnorderedSuccessors[node] == 0]
+    heapq.heapify(available)
+    isOrdered = set()
+    order = []
+    while len(order) < len(numUnorderedSuccessors):
+        if available:
+            node = heapq.heappop(available)
+        else:
+            node = min(n for n in numUnorderedSuccessors if n not in isOrdered)
+        if node in isOrdered:
+            continue
+        isOrdered.add(node)
+        order.append(node)
+        for predecessor in predecessors[node]:
+            numUnorderedSuccessors[predecessor] -= 1
+            if (numUnorderedSuccessors[predecessor] == 0 and
+                predecessor not in isOrdered):
+                heapq.heappush(available, predecessor)
+    return order
+
+
+# Returns the set of the given nodes and of all nodes reachable from them in
+# the given graph, e.g., all their dependencies if 'successors' maps each node
+# to the nodes it depends on, or all their dependents if it maps each node to
+# the nodes depending on it. Only the reached nodes and their edges are
+# visited.
+def findReachable(nodes, successors):
+    reached = set(nodes)
+    stack = list(reached)
+    while stack:
+        node = stack.pop()
+        for successor in successors.get(node, []):
+            if successor not in reached:
+                reached.add(successor)
+                stack.append(successor)
+    return reached
+
+
+# Computes, for each node, the union of the bitsets 'valueBits' of all nodes
+# reachable from it. The node itself is only included if it belongs to a
+# cycle. Returns a dictionary mapping each node to the computed bitset.
+#
+# 'components' must be the strongly connected components of the graph, in the
+# order returned by findStronglyConnectedComponents(). Each component is
+# processed once, after the components it depends on, so each edge is only
+# traversed once. Each traversal is a union of bitsets, whose cost grows with
+# their length: the total cost is O(E * V / 64) word operations for
+# E edges and bitsets of V bits, i.e., quadratic for dense graphs. All nodes
+# of a cycle share the same result.
+#
+# Example: with valueBits[node] = 1 << i (i = index of node), the result is the
+# transitive closure of the dependency relationship.
+#
+def computeClosureBits(components, successors, valueBits):
+    closureBits = {}
+    for component in components:
+        instrument.count('closureComponents')
+        members = set(component)
+        bits = 0
+        isCycle = len(component) > 1
+        for node in component:
+            instrument.count('closureEdges', len(successors.get(node, [])))
+            for successor in successors.get(node, []):
+                if successor in members:
+                    isCycle = True
+                else:
+                    bits |= valueBits[successor] | closureBits[successor]
+        if isCycle:
+            for node in component:
+                bits |= valueBits[node]
+        for node in component:
+            closureBits[node] = bits
+    return closureBits
+
+
+# Returns the transitive reduction of the given graph, as a dictionary mapping
+# each node to the list of its successors which are not already reachable
+# through other successors, e.g., { "app": ["libs"], "libs": ["third"] } for
+# { "app": ["libs", "third"], "libs": ["third"] }.
+#
+# The reduction is computed on the graph of strongly connected components,
+# where it is unique: edges within a cycle are all kept, and an edge between
+# two components is removed if its destination is reachable from another
+# successor of its source component. Each edge is traversed a constant number
+# of times, and reachability is computed with bitsets of components.
+#
+def findTransitiveReduction(nodes, successors):
+    components = findStronglyConnectedComponents(nodes, successors)
+    componentBits = {}
+    for i, component in enumerate(components):
+        for node in component:
+            componentBits[node] = 1 << i
+    closureBits = computeClosureBits(components, successors, componentBits)
+
+    reduced = {}
+    for component in components:
+        bits = componentBits[component[0]]
+
+        # Components reachable through a successor component, not counting
+        # the successor component itself
+        impliedBits = 0
+        for node in component:
+            for successor in successors.get(node, []):
+                if componentBits[successor] != bits:
+                    impliedBits |= closureBits[successor] & ~componentBits[successor]
+
+        for node in component:
+            reduced[node] = [successor for successor in successors.get(node, [])
+                             if componentBits[successor] == bits or
+                                not componentBits[successor] & impliedBits]
+    return reduced
+
+
+# Returns, as a list, the items whose index is set in the given bitset.
+# Items are returned in increasing index order.
+def bitsToList(bits, items):
+    digits = bin(bits)[:1:-1]  # Binary digits, least significant first
+    res = []
+    i = digits.find('1')
+    while i != -1:
+        res.append(items[i])
+        i = digits.find('1', i + 1)
+    return res
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Persistent index of the dependencies between projects.
+#
+# Computing the transitive dependencies of all projects, their link order and
+# the subdir dependencies they imply is proportional to the size of the
+# distribution, while a typical change only modifies the LIB_DEPENDS of one
+# project. This module stores, in the build directory, the inputs of these
+# computations at the end of the last run:
+#
+#     - the structure of the distribution (TEMPLATE and SUBDIRS of projects)
+#     - the direct dependencies and Qt modules of each project
+#     - the reverse index: the projects directly depending on each project
+#     - the subdir dependencies implied by all projects, and the number of
+#       projects implying each of them
+#     - the sources compiled together by projects using unity builds, the
+#       headers of precompiled headers, and the link mode of libraries
+#
+# On the next run, configure.py compares the direct dependencies parsed from
+# project files with the index. Only the projects whose direct dependencies
+# changed, and the projects downstream of them (found with the reverse index),
+# get their closure, link order, subdir dependencies and .config.pri computed
+# again. Their closures in the last run, needed to find what changed, are
+# computed again from the direct dependencies of the index, only for these
+# projects.
+#
+# Closures are not stored: their size grows with the square of the number of
+# projects, while the index only grows with the number of dependencies. The
+# closures of the other projects are only computed if they are needed, e.g.,
+# to generate a missing .config.pri. The index is not written again if it
+# didn't change.
+#
+# The generated files also depend on the arguments of configure.py and on the
+# scripts themselves, so the index is discarded when they change. It is also
+# discarded by configure.py if the structure of the distribution changed, or
+# if the dependency graph has cycles (the link order then depends on the whole
+# graph).
+
+import buildutils
+
+# Increment when the format of the index file changes
+indexVersion = 5
+
+
+class DependsIndex:
+
+    def __init__(self, indexFilePath, settings):
+        self.indexFilePath = indexFilePath  # <root-out-dir>/.configure/depindex.json
+        self.settings = settings            # Values the generated files depend on, e.g., CONFIG
+        self.isLoaded = False               # Whether the index file was loaded
+        self.data = None                    # Content of the index file, if it was loaded
+        self.structure = {}                 # relDir -> [template, subdirs]
+        self.hasCycles = False              # Whether the dependency graph has cycles
+        self.qt = {}                        # relDir -> Qt modules it directly uses
+        self.dependsGraph = {}              # relDir -> relDirs it directly depends on
+        self.dependentsGraph = {}           # relDir -> relDirs directly depending on it
+        self.subdirsDependsCounts = {}      # (dependentRelDir, dependeeSubdirKey) -> number of projects implying it
+        self.unityBatches = {}              # relDir -> sources compiled together, for projects using unity builds
+        self.pchHeaders = {}                # relDir -> headers of its precompiled header, if any
+        self.linkModes = {}                 # relDir -> link mode of the library, if not "static"
+
+    # Loads the index file. Does nothing if it doesn't exist, is corrupted,
+    # or was generated with other settings or index version.
+    def load(self):
+        data = buildutils.readJsonFile(self.indexFilePath)
+        if not (data and
+                data.get('version') == indexVersion and
+                data.get('settings') == self.settings):
+            return
+        self.data = data
+        self.structure = data['structure']
+        self.hasCycles = data['hasCycles']
+        self.qt = data['qt']
+        self.dependsGraph = data['dependsGraph']
+        self.dependentsGraph = data['dependentsGraph']
+        for line in data['subdirsDependsCounts'].splitlines():
+            dependentRelDir, dependeeKey, count = line.split('\t')
+            self.subdirsDependsCounts[(dependentRelDir, dependeeKey)] = int(count)
+        self.unityBatches = data['unityBatches']
+        self.pchHeaders = data['pchHeaders']
+        self.linkModes = data['linkModes']
+        self.isLoaded = True
+
+    # Saves the index file, unless it has the same content as the given
+    # index loaded by this run
+    def save(self, loadedIndex=None):
+        data = {
+            'version':         indexVersion,
+            'settings':        self.settings,
+            'structure':       self.structure,
+            'hasCycles':       self.hasCycles,
+            'qt':              self.qt,
+            'dependsGraph':    self.dependsGraph,
+            'dependentsGraph': self.dependentsGraph,
+            'unityBatches':    self.unityBatches,
+            'pchHeaders':      self.pchHeaders,
+            'linkModes':       self.linkModes,
+            'subdirsDependsCounts': "".join(
+                "%s\t%s\t%d\n" % (dependentRelDir, dependeeKey, count)
+                for (dependentRelDir, dependeeKey), count in sorted(self.subdirsDependsCounts.items())) }
+        if loadedIndex and loadedIndex.data == data:
+            return
+        buildutils.writeJsonFile(self.indexFilePath, data)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Finds all project files in src/.
+#
+# Instead of walking the whole src/ tree, directories are walked level by
+# level, and the following directories are pruned (i.e., listed, but their
+# subdirectories are not):
+#
+#     - directories which contain no project file, and which are not listed
+#       (or on the path of a directory listed) in the SUBDIRS of their
+#       nearest ancestor project. For instance, <root-dir>/src/libs/Core/data
+#       is pruned unless Core.pro has 'data' in its SUBDIRS.
+#
+#     - directories matching a pattern of the ignore file. Each line of the
+#       ignore file is a shell pattern matched against the path of the
+#       directory relative to src/ (e.g., 'third/boost/doc') or against its
+#       name (e.g., 'generated'). Empty lines and lines starting with '#' are
+#       ignored. Ignored directories are not listed at all.
+#
+# Directories are listed with os.scandir when available, which doesn't
+# require one stat per file to tell directories from files.
+#
+# Listings are also stored in an index in the build directory. On the next
+# run, the listing of a directory is taken from the index if the modification
+# time of the directory didn't change, which only costs one stat instead of
+# a full listing. The modification time of a directory changes whenever an
+# entry is added, removed, or renamed in this directory.
+
+import os
+import fnmatch
+import time
+
+import buildutils
+import instrument
+
+# Use os.scandir if available (Python >= 3.5), or the scandir backport
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+# Increment when the format of the index file changes
+indexVersion = 1
+
+
+# Returns the names of the subdirectories and project files of the given
+# directory, as a tuple (dirnames, proFileNames). Like os.walk, symbolic links
+# to directories are not considered as subdirectories to walk.
+def listDirectory(dirpath):
+    dirnames = []
+    proFileNames = []
+    try:
+        if scandir:
+            for entry in scandir(dirpath):
+                if entry.is_dir(follow_symlinks=False):
+                    dirnames.append(entry.name)
+                elif entry.name.endswith('.pro'):
+                    proFileNames.append(entry.name)
+        else:
+            for name in os.listdir(dirpath):
+                path = os.path.join(dirpath, name)
+                if os.path.isdir(path):
+                    if not os.path.islink(path):
+                        dirnames.append(name)
+                elif name.endswith('.pro'):
+                    proFileNames.append(name)
+    except OSError:
+        pass
+    dirnames.sort()
+    proFileNames.sort()
+    return (dirnames, proFileNames)
+
+
+# Returns the ignore patterns read from the given file. Returns an empty list
+# if the file doesn't exist.
+def readIgnorePatterns(filePath):
+    patterns = []
+    for line in buildutils.readFromFileIfExists(filePath).splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            patterns.append(line.rstrip('/'))
+    return patterns
+
+
+# Returns whether the given directory, given by its path relative to src/ and
+# its name, matches one of the given ignore patterns.
+def isIgnored(relDir, name, ignorePatterns):
+    for pattern in ignorePatterns:
+        if fnmatch.fnmatchcase(relDir, pattern) or fnmatch.fnmatchcase(name, pattern):
+            return True
+    return False
+
+
+# Index of directory listings, stored in the build directory
+class DirIndex:
+
+    def __init__(self, indexFilePath):
+        self.indexFilePath = indexFilePath  # <root-out-dir>/.configure/dirindex.json
+        self.savedAt = 0.0                  # Time at which the index was last saved
+        self.entries = {}                   # Entries read from the index file, by dirpath
+        self.newEntries = {}                # Entries to write back, by dirpath
+        self.numHits = 0                    # Number of listings taken from the index
+        self.numMisses = 0                  # Number of directories actually listed
+
+    # Loads the index file. Does nothing if it doesn't exist or is invalid.
+    def load(self):
+        data = buildutils.readJsonFile(self.indexFilePath)
+        if data and data.get('version') == indexVersion:
+            self.savedAt = data['savedAt']
+            self.entries = data['entries']
+
+    # Saves the index file. Only directories visited during this run are saved.
+    def save(self):
+        data = {
+            'version': indexVersion,
+            'savedAt': time.time(),
+            'entries': self.newEntries }
+        buildutils.writeJsonFile(self.indexFilePath, data)
+
+    # Returns the listing of the given directory, as a tuple (dirnames,
+    # proFileNames), if its modification time didn't change since it was
+    # indexed. Returns None otherwise. Racy directories, modified within the
+    # same second the index was saved, are never taken from the index (see
+    # buildutils.isRacy()).
+    def getUnchangedListing(self, dirpath):
+        entry = self.entries.get(dirpath)
+        if entry:
+            try:
+                mtime = os.stat(dirpath).st_mtime
+            except OSError:
+                return None
+            if entry['mtime'] == mtime and not buildutils.isRacy(mtime, self.savedAt):
+                self.numHits += 1
+                self.newEntries[dirpath] = entry
+                return (entry['dirs'], entry['files'])
+
+    # Stores the given result of readDirectory() in the index
+    def setListing(self, dirpath, result):
+        mtime, dirnames, proFileNames = result
+        self.numMisses += 1
+        self.newEntries[dirpath] = {
+            'mtime': mtime,
+            'dirs':  dirnames,
+            'files': proFileNames }
+
+
+# Returns the modification time of the given directory and its listing, as a
+# tuple (mtime, dirnames, proFileNames). The modification time is read first,
+# so that a modification during the listing is detected on the next run.
+def readDirectory(dirpath):
+    try:
+        mtime = os.stat(dirpath).st_mtime
+    except OSError:
+        mtime = 0
+    dirnames, proFileNames = listDirectory(dirpath)
+    return (mtime, dirnames, proFileNames)
+
+
+# Returns the sorted list of the paths of all project files in srcDir.
+#
+# getSubdirs(proFilePath) must return the SUBDIRS of the given project file.
+# It is only called for projects whose directory contains subdirectories
+# without project files.
+#
+# If dirIndex is not None, directory listings are taken from it when possible
+# (see DirIndex). Directories of the same level are listed in parallel using
+# numJobs threads.
+#
+# If searchedDirs is a list, the paths of all directories whose listing was
+# used are appended to it.
+#
+def findProjectFiles(srcDir, getSubdirs, ignorePatterns=[], dirIndex=None, numJobs=1, searchedDirs=None):
+    proFilePaths = []
+
+    # SUBDIRS of projects, memoized
+    subdirsByProFilePath = {}
+    def getSubdirsOf(proFilePaths):
+        res = []
+        for proFilePath in proFilePaths:
+            if proFilePath not in subdirsByProFilePath:
+                subdirsByProFilePath[proFilePath] = [s.rstrip('/') for s in getSubdirs(proFilePath)]
+            res.extend(subdirsByProFilePath[proFilePath])
+        return res
+
+    # Each directory to visit is given as a tuple (dirpath, relDir, parent),
+    # where parent is a tuple (proFilePaths, relDir) describing the nearest
+    # ancestor directory containing project files, or None for srcDir.
+    level = [(srcDir, "", None)]
+    while level:
+        # List directories of this level, taking listings from index if possible
+        listings = [None] * len(level)
+        toList = []
+        for i, (dirpath, relDir, parent) in enumerate(level):
+            if dirIndex:
+                listings[i] = dirIndex.getUnchangedListing(dirpath)
+            if listings[i] is None:
+                toList.append(i)
+        instrument.count('directoriesFromIndex', len(level) - len(toList))
+        instrument.count('directoriesListed', len(toList))
+        results = buildutils.parallelMap(readDirectory, [level[i][0] for i in toList], numJobs, useThreads=True)
+        for i, result in zip(toList, results):
+            if dirIndex:
+                dirIndex.setListing(level[i][0], result)
+            listings[i] = result[1:]
+
+        # Find project files and next level of directories to visit
+        nextLevel = []
+        for (dirpath, relDir, parent), (dirnames, proFileNames) in zip(level, listings):
+            if searchedDirs is not None:
+                searchedDirs.append(dirpath)
+            if proFileNames:
+                dirProFilePaths = [dirpath + '/' + name for name in proFileNames]
+                proFilePaths.extend(dirProFilePaths)
+                dirParent = (dirProFilePaths, relDir)
+            elif parent is None:
+                dirParent = None
+            else:
+                # Prune directory unless it is on the path of a SUBDIRS
+                # entry of its nearest ancestor project
+                parentProFilePaths, parentRelDir = parent
+                pathFromParent = relDir[len(parentRelDir):].lstrip('/')
+                isInSubdirs = False
+                for subdir in getSubdirsOf(parentProFilePaths):
+                    if subdir == pathFromParent or subdir.startswith(pathFromParent + '/'):
+                        isInSubdirs = True
+                        break
+                if not isInSubdirs:
+                    continue
+                dirParent = parent
+
+            for dirname in dirnames:
+                if relDir:
+                    subRelDir = relDir + '/' + dirname
+                else:
+                    subRelDir = dirname
+                if not isIgnored(subRelDir, dirname, ignorePatterns):
+                    nextLevel.append((dirpath + '/' + dirname, subRelDir, dirParent))
+
+        level = nextLevel
+
+    return sorted(proFilePaths)
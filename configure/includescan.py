@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Scanner of the #include directives of source files.
+#
+# LIB_DEPENDS and THIRD_DEPENDS are written by hand, and tend to list more
+# libraries than actually used: each of them makes links bigger, orders
+# builds, and serializes subdir builds for nothing. When the
+# CONFIGURE_SCAN_INCLUDES environment variable is set to 1, configure.py scans
+# the SOURCES and HEADERS of each lib and app, and maps each included header
+# to the library providing it, like DependsUtils::getHeaderSDepends() does for
+# unit tests in tests/runtests:
+#
+#     #include <Gui/Widgets/Subdir/Widget.h>  ->  libs/Gui/Widgets
+#
+# i.e., the longest sequence of directories of the include path, relative to
+# src/libs/ (or else src/third/), which are all projects. Headers of Qt or of
+# the standard library, and local headers, are not mapped to any library.
+#
+# The report, written to <root-out-dir>/.configure/includes.txt, lists for
+# each project:
+#
+#     - unused dependencies: declared, but none of their headers are included.
+#       They can be removed, unless they are needed for another reason (e.g.,
+#       symbols used without including their header).
+#     - missing dependencies: headers included, but the library is not among
+#       the transitive dependencies of the project.
+#     - the minimal dependencies: the libraries whose headers are included,
+#       without those already implied by other included libraries.
+#
+# Files are read with mmap and scanned with a single precompiled regular
+# expression. The include paths of each file are cached in
+# <root-out-dir>/.configure/includecache.json, keyed by modification time and
+# size, so only modified files are scanned again. Like for the parse cache,
+# files modified within the same second the cache was saved are scanned again
+# (see buildutils.isRacy()).
+# The cache is also used to rank the headers of precompiled headers (see
+# configure.getPrecompiledHeaders()), and stores the content hash of files,
+# used by the artifact cache (see artifactcache.py).
+#
+# Source files are not inputs of the stamp file (see stamp.py): the report is
+# only updated when configure.py actually runs, e.g., with CONFIGURE_STAMP=0.
+
+import os
+import re
+import mmap
+import time
+import hashlib
+
+import buildutils
+import instrument
+
+# Increment when the format of the cache file changes
+cacheVersion = 2
+
+# #include directives. It is not perfect but works in any sane case, e.g., it
+# does not handle comments between 'include' and the path.
+includeRegExp = re.compile(br'^[ \t]*#[ \t]*include[ \t]+["<]([^\n"<>]*)[">]', re.MULTILINE)
+
+
+# Returns the include paths of the given file, e.g., [ "Gui/Widgets/Widget.h",
+# "QWidget" ], and the hexadecimal md5 digest of its content, as a tuple.
+def scanFile(filePath):
+    f = open(filePath, 'rb')
+    try:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, mmap.error):
+            return ([], hashlib.md5(b"").hexdigest()) # Empty file
+        try:
+            includePaths = []
+            for match in includeRegExp.finditer(data):
+                includePath = match.group(1)
+                if not isinstance(includePath, str):
+                    includePath = includePath.decode('utf-8', 'replace')
+                includePaths.append(includePath)
+            return (includePaths, hashlib.md5(data).hexdigest())
+        finally:
+            data.close()
+    finally:
+        f.close()
+
+
+class IncludeCache:
+
+    def __init__(self, cacheFilePath):
+        self.cacheFilePath = cacheFilePath  # <root-out-dir>/.configure/includecache.json
+        self.savedAt = 0.0                  # Time at which the cache was last saved
+        self.entries = {}                   # Entries read from the cache file, by filePath
+        self.newEntries = {}                # Entries to write back, by filePath
+        self.numHits = 0                    # Number of files loaded from cache
+        self.numMisses = 0                  # Number of files actually scanned
+
+    # Loads the cache file. Does nothing if it doesn't exist, is corrupted, or
+    # was generated with another cache version.
+    def load(self):
+        data = buildutils.readJsonFile(self.cacheFilePath)
+        if data and data.get('version') == cacheVersion:
+            self.savedAt = data['savedAt']
+            self.entries = data['entries']
+
+    # Saves the cache file. Only entries that were accessed during this run
+    # are saved, which prunes deleted files from the cache.
+    def save(self):
+        data = {
+            'version': cacheVersion,
+            'savedAt': time.time(),
+            'entries': self.newEntries }
+        buildutils.writeJsonFile(self.cacheFilePath, data)
+
+    # Returns the entry of the given file, from the cache if its modification
+    # time and size didn't change, or None if the file can't be read.
+    def _getEntry(self, filePath):
+        entry = self.newEntries.get(filePath)
+        if entry:
+            return entry
+        try:
+            stat = os.stat(filePath)
+        except OSError:
+            return None
+        entry = self.entries.get(filePath)
+        if (entry and
+            entry['mtime'] == stat.st_mtime and
+            entry['size'] == stat.st_size and
+            not buildutils.isRacy(entry['mtime'], self.savedAt)):
+            self.numHits += 1
+            instrument.count('includeCacheHits')
+        else:
+            try:
+                includePaths, contentHash = scanFile(filePath)
+            except IOError:
+                return None
+            self.numMisses += 1
+            instrument.count('filesScanned')
+            entry = {
+                'mtime':    stat.st_mtime,
+                'size':     stat.st_size,
+                'includes': includePaths,
+                'hash':     contentHash }
+        self.newEntries[filePath] = entry
+        return entry
+
+    # Returns the include paths of the given file. Returns an empty list if
+    # the file doesn't exist.
+    def getIncludes(self, filePath):
+        entry = self._getEntry(filePath)
+        if entry:
+            return entry['includes']
+        return []
+
+    # Returns the hexadecimal md5 digest of the content of the given file, or
+    # None if it doesn't exist
+    def getHash(self, filePath):
+        entry = self._getEntry(filePath)
+        if entry:
+            return entry['hash']
+
+
+# Returns the relDir of the project providing the given included header, e.g.,
+# "libs/Gui/Widgets" for "Gui/Widgets/Subdir/Widget.h", or None. 'projects'
+# is the set or dictionary of relDirs of all projects.
+def getIncludedProjectRelDir(includePath, projects):
+    names = includePath.split('/')
+    for baseRelDir in ["libs", "third"]:
+        relDir = baseRelDir
+        for name in names[:-1]:
+            if relDir + '/' + name in projects:
+                relDir += '/' + name
+            else:
+                break
+        if relDir != baseRelDir:
+            return relDir
+
+
+# Returns the content of includes.txt. 'results' is a list of tuples
+# (relDir, unused, missing, minimal), where each element but relDir is a
+# sorted list of relDirs.
+def getReport(results):
+    lines = ["# Dependencies found by scanning #include directives, computed by configure.py",
+             "# Only projects whose declared dependencies differ from the included ones are listed."]
+    for relDir, unused, missing, minimal in results:
+        lines.append("")
+        lines.append(relDir)
+        if unused:
+            lines.append("    unused:  " + " ".join(unused))
+        if missing:
+            lines.append("    missing: " + " ".join(missing))
+        lines.append("    minimal: " + " ".join(minimal))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Instrumentation of configure.py.
+#
+# Other modules count the work they do by calling count(), e.g.:
+#
+#     instrument.count('filesRead')
+#     instrument.count('bytesRead', len(content))
+#
+# Counting is always enabled, since it only costs a dictionary update. Work
+# done in worker processes is counted as well (see buildutils.parallelMap).
+#
+# When the CONFIGURE_PROFILE environment variable is set, configure.py runs its
+# phases through a PhaseProfiler, which records for each phase:
+#
+#     - wall time
+#     - CPU time, including worker processes
+#     - peak resident set size of the process at the end of the phase (not
+#       available on Windows)
+#     - counters incremented during the phase
+#
+# Then, configure.py writes the following reports to <root-out-dir>/.configure/:
+#
+#     - profile.json: the data above, as JSON
+#     - trace.json:   the same data, in the Chrome trace event format, which
+#                     can be opened in chrome://tracing or ui.perfetto.dev
+#
+# If CONFIGURE_PROFILE is 'cprofile', each phase is also run under cProfile,
+# and the statistics of the slowest phase are written to slowest-phase.prof,
+# which can be read with the pstats module. Note that cProfile slows down the
+# phases, so the recorded times are then larger than usual.
+
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows
+
+try:
+    import cProfile
+except ImportError:
+    cProfile = None
+
+# Counters incremented by count(), by name
+counters = {}
+
+
+# Increments the given counter by n
+def count(name, n=1):
+    counters[name] = counters.get(name, 0) + n
+
+# Adds the given counters, e.g., counted by a worker process, to counters
+def addCounters(otherCounters):
+    for name in otherCounters:
+        count(name, otherCounters[name])
+
+# Returns the counters incremented since the given copy of counters was made
+def getCountersSince(previousCounters):
+    res = {}
+    for name in counters:
+        n = counters[name] - previousCounters.get(name, 0)
+        if n:
+            res[name] = n
+    return res
+
+# Returns the CPU time (user + system) used so far by this process and its
+# terminated child processes, in seconds
+def getCpuTime():
+    t = os.times()
+    return t[0] + t[1] + t[2] + t[3]
+
+# Returns the peak resident set size of this process so far, in kilobytes, or
+# None if not available
+def getPeakRss():
+    if resource is None:
+        return None
+    peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peakRss //= 1024  # bytes on MacOS, kilobytes on Linux
+    return peakRss
+
+
+# Runs phases of configure.py and records their cost
+class PhaseProfiler:
+
+    def __init__(self, useCProfile=False):
+        self.useCProfile = useCProfile and cProfile is not None  # Whether to run phases under cProfile
+        self.startTime = time.time()                             # Time at which profiling started
+        self.phases = []                                         # Recorded phases, as dictionaries
+        self.slowestProfile = None                               # cProfile.Profile of the slowest phase
+
+    # Calls function(), and records its cost under the given phase name
+    def runPhase(self, name, function):
+        previousCounters = dict(counters)
+        startCpuTime = getCpuTime()
+        startTime = time.time()
+        if self.useCProfile:
+            profile = cProfile.Profile()
+            profile.runcall(function)
+        else:
+            function()
+        wallTime = time.time() - startTime
+        phase = {
+            'name':     name,
+            'start':    startTime - self.startTime,
+            'wallTime': wallTime,
+            'cpuTime':  getCpuTime() - startCpuTime,
+            'peakRss':  getPeakRss(),
+            'counters': getCountersSince(previousCounters) }
+        if self.useCProfile and (not self.phases or wallTime > max(p['wallTime'] for p in self.phases)):
+            self.slowestProfile = profile
+        self.phases.append(phase)
+
+    # Returns the recorded phases in the Chrome trace event format
+    def getTrace(self):
+        pid = os.getpid()
+        events = []
+        for phase in self.phases:
+            events.append({
+                'name': phase['name'],
+                'cat':  'configure',
+                'ph':   'X',
+                'ts':   int(1e6 * phase['start']),
+                'dur':  int(1e6 * phase['wallTime']),
+                'pid':  pid,
+                'tid':  0,
+                'args': dict(phase['counters'], cpuTime=phase['cpuTime']) })
+            if phase['peakRss'] is not None:
+                events.append({
+                    'name': 'peakRss',
+                    'ph':   'C',
+                    'ts':   int(1e6 * (phase['start'] + phase['wallTime'])),
+                    'pid':  pid,
+                    'args': {'kilobytes': phase['peakRss']} })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    # Returns the recorded phases and the total counters, as a dictionary
+    def getReport(self):
+        return {
+            'version':  1,
+            'argv':     sys.argv,
+            'wallTime': sum(p['wallTime'] for p in self.phases),
+            'cpuTime':  sum(p['cpuTime'] for p in self.phases),
+            'peakRss':  getPeakRss(),
+            'counters': dict(counters),
+            'phases':   self.phases }
+
+    # Writes the cProfile statistics of the slowest phase to the given file.
+    # Does nothing if phases were not run under cProfile.
+    def dumpSlowestPhaseProfile(self, filePath):
+        if self.slowestProfile:
+            self.slowestProfile.dump_stats(filePath)
+
+    # Returns a human-readable summary of the recorded phases, as a list of
+    # lines
+    def getSummary(self):
+        lines = []
+        for phase in self.phases:
+            line = "%-10s %8.3fs wall %8.3fs cpu" % (phase['name'], phase['wallTime'], phase['cpuTime'])
+            if phase['peakRss'] is not None:
+                line += " %8d KB peak" % phase['peakRss']
+            if phase['counters']:
+                line += "  " + " ".join("%s=%d" % (name, phase['counters'][name]) for name in sorted(phase['counters']))
+            lines.append(line)
+        return lines
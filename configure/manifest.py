@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Manifest of the files generated by configure.py.
+#
+# Regenerating a .config.pri file with the same content must not modify it,
+# otherwise qmake would consider it changed and regenerate the Makefiles. This
+# used to be ensured by reading back every existing .config.pri and comparing
+# it with the new content, which costs one open and read per project on each
+# run.
+#
+# Instead, the manifest stores, in the build directory, the content hash,
+# modification time and size of each generated file. If the modification time
+# and size of a file didn't change since it was generated, its content is
+# known from the manifest without opening it, and comparing hashes is enough.
+# Otherwise (e.g., no manifest yet, or the file was edited), the file is read
+# back and compared as before.
+#
+# Files are written atomically (see buildutils.writeToFileAtomically).
+#
+# Files listed in the manifest but not generated during this run, e.g., the
+# .config.pri of a deleted project, are removed. Files which are not listed in
+# the manifest are never removed.
+#
+# Like for the parse cache, files modified within the same second the manifest
+# was saved are "racy" (see buildutils.isRacy()), and are therefore always read
+# back.
+
+import os
+import time
+
+import buildutils
+import instrument
+
+# Increment when the format of the manifest file changes
+manifestVersion = 1
+
+
+class OutputManifest:
+
+    def __init__(self, manifestFilePath):
+        self.manifestFilePath = manifestFilePath  # <root-out-dir>/.configure/manifest.json
+        self.savedAt = 0.0                        # Time at which the manifest was last saved
+        self.entries = {}                         # Entries read from the manifest file, by filePath
+        self.newEntries = {}                      # Entries to write back, by filePath
+        self.numUnchanged = 0                     # Number of files left untouched
+        self.numWritten = 0                       # Number of files actually written
+        self.numRemoved = 0                       # Number of stale files removed
+
+    # Loads the manifest file. Does nothing if it doesn't exist or is invalid.
+    def load(self):
+        data = buildutils.readJsonFile(self.manifestFilePath)
+        if data and data.get('version') == manifestVersion:
+            self.savedAt = data['savedAt']
+            self.entries = data['entries']
+
+    # Saves the manifest file, listing all files generated during this run.
+    def save(self):
+        data = {
+            'version': manifestVersion,
+            'savedAt': time.time(),
+            'entries': self.newEntries }
+        buildutils.writeJsonFile(self.manifestFilePath, data)
+
+    # Keeps all loaded entries in the saved manifest, for runs generating only
+    # some of the files. Must be called after load().
+    def keepEntries(self):
+        self.newEntries = dict(self.entries)
+
+    # Returns a tuple (contentHash, stat) for the given file, or (None, None)
+    # if it doesn't exist. The file is only read if its modification time or
+    # size changed since it was generated.
+    def _getCurrentHash(self, filePath):
+        try:
+            stat = os.stat(filePath)
+        except OSError:
+            return (None, None)
+        entry = self.entries.get(filePath)
+        if (entry and
+            entry['mtime'] == stat.st_mtime and
+            entry['size'] == stat.st_size and
+            not buildutils.isRacy(entry['mtime'], self.savedAt)):
+            return (entry['hash'], stat)
+        return (buildutils.getContentHash(buildutils.readFromFile(filePath)), stat)
+
+    # Writes content to the given file, unless the file already has this
+    # content. Returns whether the file was written.
+    def writeFile(self, filePath, content):
+        contentHash = buildutils.getContentHash(content)
+        currentHash, stat = self._getCurrentHash(filePath)
+        isWritten = currentHash != contentHash
+        if isWritten:
+            buildutils.writeToFileAtomically(filePath, content)
+            stat = os.stat(filePath)
+            self.numWritten += 1
+            instrument.count('filesWritten')
+        else:
+            self.numUnchanged += 1
+            instrument.count('filesSkipped')
+        self.newEntries[filePath] = {
+            'mtime': stat.st_mtime,
+            'size':  stat.st_size,
+            'hash':  contentHash }
+        return isWritten
+
+    # Removes the files generated by a previous run but not by this one.
+    # Returns the list of removed files.
+    def removeStaleFiles(self):
+        removedFilePaths = []
+        for filePath in sorted(self.entries):
+            if filePath not in self.newEntries and os.path.isfile(filePath):
+                os.remove(filePath)
+                removedFilePaths.append(filePath)
+        self.numRemoved += len(removedFilePaths)
+        instrument.count('filesRemoved', len(removedFilePaths))
+        return removedFilePaths
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Multi-variant mode of configure.py.
+#
+# Usage:
+#
+#     python multiconfigure.py <root-dir> <root-out-dir> "<config>" [<root-out-dir> "<config>"]...
+#
+# e.g., for a debug and a release build on Linux:
+#
+#     python multiconfigure.py . build/debug "linux unix debug qt" build/release "linux unix release qt"
+#
+# Each pair of <root-out-dir> and <config> is a variant of the build, i.e., the
+# arguments configure.py is run with by qmake in this build directory. Running
+# configure.py once per variant finds and evaluates all project files, and
+# computes the closures of their dependencies, once per variant, although
+# variants usually only differ by a few scopes, e.g.,
+# CONFIG(debug, debug|release). Instead, this script:
+#
+#     1. finds project files, evaluates them and computes the closures of
+#        their dependencies once, with the arguments of the first variant
+#        which is not up to date (see configure.sharedPhaseNames)
+#     2. forks one process per variant, which evaluates project files again
+#        with the CONFIG of the variant, from the statements already
+#        tokenized (see qmakeeval.py), computes again only the closures of
+#        the projects whose dependencies differ in this variant, and runs the
+#        remaining steps of configure.py into the <root-out-dir> of the
+#        variant: .config.pri files (e.g., linking the release/ or debug/
+#        libraries on Windows), caches, build.ninja and stamp file (see
+#        configure.setVariant() and configure.updateVariantProjects())
+#
+# Variants are generated concurrently. A variant in which the distribution
+# has another structure, i.e., a project has another TEMPLATE, SUBDIRS or
+# included files, runs all steps of configure.py instead. On systems without
+# fork() (Windows), variants are generated one after the other by this
+# process. Project files are only tokenized once if CONFIGURE_JOBS is 1 (the
+# default), since worker processes don't share their statements.
+#
+# Variants whose stamp file is up to date are skipped (see stamp.py). Since
+# the stamp file of each variant is written, qmake can then be run in each
+# build directory: configure.py exits immediately.
+
+import sys
+import os
+import time
+import traceback
+
+import stamp
+
+
+# Returns the variants given as arguments, as (rootOutDir, config) tuples
+def getVariants(args):
+    res = []
+    for i in range(0, len(args), 2):
+        rootOutDir = os.path.abspath(args[i]).replace(os.sep, '/')
+        res.append((rootOutDir, args[i+1].split()))
+    return res
+
+# Imports configure.py, with the arguments of the given variant
+def importConfigure(rootDir, variant):
+    rootOutDir, config = variant
+    import configure
+    configure.setArguments([rootDir, rootOutDir] + config)
+    return configure
+
+# Generates the given variant, after the steps in configure.sharedPhaseNames
+# were run for another variant, or for this one, at startTime
+def generateVariant(configure, variant, startTime):
+    rootOutDir, config = variant
+    print("[multiconfigure.py] Generating " + rootOutDir + " (" + " ".join(config) + ")")
+    configure.setVariant(rootOutDir, config)
+    if configure.updateVariantProjects():
+        configure.main([name for name, function in configure.phases
+                        if name not in configure.sharedPhaseNames], startTime)
+    else:
+        print("[multiconfigure.py] Structure differs in " + rootOutDir + ": running all steps")
+        configure.reset()
+        configure.main()
+
+# Generates the given variants, each in a child process. Returns whether all
+# of them succeeded.
+def generateVariantsConcurrently(configure, variants, startTime):
+    sys.stdout.flush()
+    pids = []
+    for variant in variants:
+        pid = os.fork()
+        if pid == 0:
+            # Write whole lines, not to interleave them with other variants
+            sys.stdout = os.fdopen(os.dup(sys.stdout.fileno()), 'w', 1)
+            status = 1
+            try:
+                generateVariant(configure, variant, startTime)
+                status = 0
+            except:
+                traceback.print_exc()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+        pids.append(pid)
+    res = True
+    for pid, variant in zip(pids, variants):
+        if os.waitpid(pid, 0)[1] != 0:
+            print("Error: failed to generate " + variant[0])
+            res = False
+    return res
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 3 or len(args) % 2 != 1:
+        print("Usage: python multiconfigure.py <root-dir> <root-out-dir> \"<config>\" [<root-out-dir> \"<config>\"]...")
+        sys.exit(1)
+    rootDir = os.path.abspath(args[0]).replace(os.sep, '/')
+    variants = getVariants(args[1:])
+    rootOutDirs = [rootOutDir for rootOutDir, config in variants]
+    if len(set(rootOutDirs)) != len(rootOutDirs):
+        print("Error: variants must have different <root-out-dir>.")
+        sys.exit(1)
+
+    # Skip variants which are up to date
+    configure = importConfigure(rootDir, variants[0])
+    if os.environ.get('CONFIGURE_STAMP', '1') != '0':
+        pendingVariants = []
+        for variant in variants:
+            configure.setVariant(variant[0], variant[1])
+            if not stamp.isUpToDate(configure.stampFilePath, configure.stampArgs):
+                pendingVariants.append(variant)
+        variants = pendingVariants
+    if not variants:
+        return
+
+    # Steps shared by all variants
+    startTime = time.time()
+    configure.setVariant(variants[0][0], variants[0][1])
+    configure.main(configure.sharedPhaseNames)
+
+    # Steps of each variant
+    if hasattr(os, 'fork'):
+        if not generateVariantsConcurrently(configure, variants, startTime):
+            sys.exit(1)
+    else:
+        for variant in variants:
+            generateVariant(configure, variant, startTime)
+
+
+if __name__ == "__main__":
+    main()
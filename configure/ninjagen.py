@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Helpers to write a Ninja build file (see https://ninja-build.org).
+#
+# When the CONFIGURE_NINJA environment variable is set to 1, configure.py
+# writes <root-out-dir>/build.ninja in addition to the .config.pri files. It
+# builds all libraries and apps of the distribution without qmake: one flat
+# build file instead of one recursive Makefile per project, so that Ninja can
+# schedule all compilations of the distribution in parallel, e.g.:
+#
+#     CONFIGURE_NINJA=1 python configure/configure.py <root-dir> <root-out-dir> unix release qt
+#     ninja -C <root-out-dir>
+#
+# moc is only run on files declaring Q_OBJECT, Q_GADGET or Q_NAMESPACE, uic
+# on FORMS, and rcc on RESOURCES. The build file runs configure.py again when
+# a project file changes.
+#
+# The toolchain is given by the following environment variables:
+#
+#     CXX:      C++ compiler (default: c++). Only GCC-compatible compilers
+#               are supported.
+#     AR:       archiver (default: ar)
+#     CXXFLAGS: additional compiler flags
+#     LDFLAGS:  additional linker flags
+#     QMAKE:    qmake of the Qt installation to use (default: qmake), only
+#               used to query the paths of Qt. Qt frameworks on MacOS are not
+#               supported.
+#
+# This module only contains generic helpers, the build file is generated by
+# generateNinjaFile() in configure.py.
+
+import os
+import re
+import subprocess
+
+# Qt module names which are not simply capitalized to get the name of their
+# library, e.g., QT += widgets -> QtWidgets
+qtModuleLibNames = {
+    'concurrent':        'Concurrent',
+    'core5compat':       'Core5Compat',
+    'dbus':              'DBus',
+    'multimediawidgets': 'MultimediaWidgets',
+    'opengl':            'OpenGL',
+    'openglwidgets':     'OpenGLWidgets',
+    'printsupport':      'PrintSupport',
+    'quickcontrols2':    'QuickControls2',
+    'quickwidgets':      'QuickWidgets',
+    'serialport':        'SerialPort',
+    'svgwidgets':        'SvgWidgets',
+    'testlib':           'Test',
+    'uitools':           'UiTools',
+    'webchannel':        'WebChannel',
+    'webengine':         'WebEngine',
+    'webenginewidgets':  'WebEngineWidgets',
+    'websockets':        'WebSockets',
+    'x11extras':         'X11Extras',
+    'xmlpatterns':       'XmlPatterns' }
+
+# Macros which require a file to be processed by moc
+mocRegExp = re.compile(r"\bQ_(?:OBJECT|GADGET|NAMESPACE)\b")
+
+# Files listed in a .qrc resource file
+qrcFileRegExp = re.compile(r"<file(?:\s[^>]*)?>([^<]*)</file>")
+
+# Characters which don't need quoting in shell commands
+shellSafeRegExp = re.compile(r"^[\w@%+=:,./-]+$")
+
+
+# Returns the given path escaped for Ninja build statements
+def escapePath(path):
+    return path.replace('$', '$$').replace(' ', '$ ').replace(':', '$:')
+
+# Returns the given argument quoted for shell commands, and escaped for Ninja
+# variable values
+def quoteArg(arg):
+    if not shellSafeRegExp.match(arg):
+        arg = "'" + arg.replace("'", "'\\''") + "'"
+    return arg.replace('$', '$$')
+
+# Returns the given arguments quoted, as a single string
+def quoteArgs(args):
+    return " ".join(quoteArg(arg) for arg in args)
+
+# Returns whether the given C++ file content must be processed by moc
+def needsMoc(content):
+    return mocRegExp.search(content) is not None
+
+# Returns the files listed in the given .qrc file content, relative to it
+def getQrcFiles(content):
+    return [path.strip() for path in qrcFileRegExp.findall(content)]
+
+
+# Queries the paths of the Qt installation of the given qmake. Returns a
+# dictionary, e.g., { 'QT_INSTALL_HEADERS': '/usr/include/qt5', ... }, which
+# is empty if qmake can't be run.
+def queryQt(qmakeCmd):
+    try:
+        process = subprocess.Popen([qmakeCmd, '-query'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output = process.communicate()[0]
+    except OSError:
+        return {}
+    if process.returncode != 0:
+        return {}
+    if not isinstance(output, str):
+        output = output.decode('utf-8')
+    res = {}
+    for line in output.splitlines():
+        if ':' in line:
+            key, value = line.split(':', 1)
+            res[key] = value
+    return res
+
+# Returns the paths of the Qt tools moc, uic and rcc, as a tuple
+def getQtTools(qtPaths):
+    tools = []
+    for name in ['moc', 'uic', 'rcc']:
+        path = name
+        for key in ['QT_HOST_LIBEXECS', 'QT_HOST_BINS', 'QT_INSTALL_BINS']:
+            if key in qtPaths and os.path.isfile(qtPaths[key] + '/' + name):
+                path = qtPaths[key] + '/' + name
+                break
+        tools.append(path)
+    return tuple(tools)
+
+# Returns the library name of the given Qt module, e.g., 'Qt5Widgets' for
+# 'widgets' with Qt 5
+def getQtLibName(qtModule, qtPaths):
+    qtMajorVersion = qtPaths.get('QT_VERSION', '5').split('.')[0]
+    name = qtModuleLibNames.get(qtModule, qtModule.capitalize())
+    return 'Qt' + qtMajorVersion + name
+
+# Returns the compiler flags required by the given Qt modules, as a tuple
+# (includeFlags, defineFlags)
+def getQtCompileFlags(qtModules, qtPaths):
+    includeFlags = []
+    defineFlags = []
+    headersDir = qtPaths.get('QT_INSTALL_HEADERS')
+    if headersDir and qtModules:
+        includeFlags += ['-isystem', headersDir]
+    for qtModule in qtModules:
+        name = qtModuleLibNames.get(qtModule, qtModule.capitalize())
+        if headersDir:
+            includeFlags += ['-isystem', headersDir + '/Qt' + name]
+        defineFlags.append('-DQT_' + qtModule.upper() + '_LIB')
+    return (includeFlags, defineFlags)
+
+# Returns the linker flags required by the given Qt modules
+def getQtLinkFlags(qtModules, qtPaths):
+    flags = []
+    libsDir = qtPaths.get('QT_INSTALL_LIBS')
+    if libsDir and qtModules:
+        flags += ['-L' + libsDir, '-Wl,-rpath,' + libsDir]
+    for qtModule in qtModules:
+        flags.append('-l' + getQtLibName(qtModule, qtPaths))
+    return flags
+
+
+# Accumulates the content of a Ninja build file
+class NinjaWriter:
+
+    def __init__(self):
+        self.lines = []  # Lines of the build file
+
+    def comment(self, text):
+        self.lines.append("# " + text)
+
+    def newline(self):
+        self.lines.append("")
+
+    def variable(self, name, value, indent=0):
+        self.lines.append("  " * indent + name + " = " + value)
+
+    def rule(self, name, command, description=None, depfile=None, deps=None, generator=False, restat=False,
+             rspfile=None, rspfileContent=None):
+        self.lines.append("rule " + name)
+        self.variable('command', command, 1)
+        if description:
+            self.variable('description', description, 1)
+        if depfile:
+            self.variable('depfile', depfile, 1)
+        if deps:
+            self.variable('deps', deps, 1)
+        if rspfile:
+            self.variable('rspfile', rspfile, 1)
+            self.variable('rspfile_content', rspfileContent, 1)
+        if generator:
+            self.variable('generator', '1', 1)
+        if restat:
+            self.variable('restat', '1', 1)
+        self.newline()
+
+    # Adds a build statement. Paths are escaped, variables are not.
+    def build(self, outputs, rule, inputs=[], implicit=[], orderOnly=[], variables=[]):
+        line = "build " + " ".join(escapePath(path) for path in outputs) + ": " + rule
+        if inputs:
+            line += " " + " ".join(escapePath(path) for path in inputs)
+        if implicit:
+            line += " | " + " ".join(escapePath(path) for path in implicit)
+        if orderOnly:
+            line += " || " + " ".join(escapePath(path) for path in orderOnly)
+        self.lines.append(line)
+        for name, value in variables:
+            self.variable(name, value, 1)
+
+    def default(self, targets):
+        self.lines.append("default " + " ".join(escapePath(path) for path in targets))
+
+    def getContent(self):
+        return "\n".join(self.lines) + "\n"
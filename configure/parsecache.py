@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Persistent cache of the data parsed from project files.
+#
+# Parsing every project file of the distribution on each qmake run is slow on
+# large trees, while most project files didn't change since the last run. This
+# module stores, in the build directory, the fields parsed from each project
+# file, keyed by:
+#
+#     - the path of the project file
+#     - its modification time and size, and those of the files it includes
+#       (see qmakeeval.py)
+#     - the md5 of its content and of the content of the files it includes
+#
+# If the modification times and sizes of a project file and of its included
+# files didn't change, the cached fields are used without even opening them.
+# If they did change, the files are read and hashed, and the cached fields are
+# still used if their content is identical (e.g., a file was touched, or a
+# branch switched back and forth). Otherwise, the project file is evaluated
+# again.
+#
+# Files modified within the same second the cache was saved are "racy" (see
+# buildutils.isRacy()), and their content is therefore always hashed.
+#
+# Parsed fields depend on the CONFIG passed to configure.py (it is the initial
+# value of CONFIG), so the whole cache is discarded when CONFIG changes.
+#
+# Project files are evaluated by functions of this module, not of
+# configure.py, so that worker processes evaluating them in parallel (see
+# buildutils.parallelMap) only import this module and its dependencies.
+
+import os
+import time
+
+import buildutils
+import instrument
+import qmakeeval
+
+# Increment when the format of the cache file or of the parsed fields changes
+cacheVersion = 5
+
+
+class ParseCache:
+
+    def __init__(self, cacheFilePath, config, srcDir, srcOutDir):
+        self.cacheFilePath = cacheFilePath  # <root-out-dir>/.configure/parsecache.json
+        self.config = list(config)          # CONFIG passed to configure.py
+        self.srcDir = srcDir                # <root-dir>/src
+        self.srcOutDir = srcOutDir          # <root-out-dir>/src
+        self.savedAt = 0.0                  # Time at which the cache was last saved
+        self.entries = {}                   # Entries read from the cache file, by proFilePath
+        self.newEntries = {}                # Entries to write back, by proFilePath
+        self.numHits = 0                    # Number of projects loaded from cache
+        self.numMisses = 0                  # Number of projects actually parsed
+        self.includeStats = {}              # Stats of included files checked during this run, by filePath
+
+    # Loads the cache file. Does nothing if it doesn't exist, is corrupted,
+    # or was generated with another CONFIG or cache version.
+    def load(self):
+        data = buildutils.readJsonFile(self.cacheFilePath)
+        if (data and
+            data.get('version') == cacheVersion and
+            data.get('config') == self.config):
+            self.savedAt = data['savedAt']
+            self.entries = data['entries']
+
+    # Saves the cache file. Only entries that were accessed during this run
+    # are saved, which prunes deleted projects from the cache.
+    def save(self):
+        data = {
+            'version': cacheVersion,
+            'config':  self.config,
+            'savedAt': time.time(),
+            'entries': self.newEntries }
+        buildutils.writeJsonFile(self.cacheFilePath, data)
+
+    # Returns the cached fields of the given project file if the modification
+    # times and sizes of the project file and of its included files didn't
+    # change, without opening them. Returns None otherwise. Project files
+    # already read during this run are not checked again.
+    def getUnchangedFields(self, proFilePath):
+        entry = self.newEntries.get(proFilePath)
+        if entry:
+            return entry['fields']
+        entry = self.entries.get(proFilePath)
+        if not entry:
+            return None
+        stat = os.stat(proFilePath)
+        if (entry['mtime'] == stat.st_mtime and
+            entry['size'] == stat.st_size and
+            not buildutils.isRacy(entry['mtime'], self.savedAt) and
+            self.isUnchanged(entry['includes'])):
+            self.numHits += 1
+            instrument.count('parseCacheHits')
+            self.newEntries[proFilePath] = entry
+            return entry['fields']
+
+    # Returns whether the given included files, as (filePath, mtime, size)
+    # lists, still have the same modification time and size, and were not
+    # modified within the same second the cache was saved. Files included by
+    # several projects are only checked once.
+    def isUnchanged(self, includeStats):
+        for includeStat in includeStats:
+            filePath, mtime, size = includeStat
+            if filePath not in self.includeStats:
+                self.includeStats[filePath] = getFileStats([filePath])[0]
+            if self.includeStats[filePath] != includeStat:
+                return False
+            if mtime is not None and buildutils.isRacy(mtime, self.savedAt):
+                return False
+        return True
+
+    # Forgets the fields of the given project file read during this run, so
+    # that the next call of getFields() checks it again, as well as the files
+    # it includes.
+    def forget(self, proFilePath):
+        self.newEntries.pop(proFilePath, None)
+        self.includeStats.clear()
+
+    # Returns the arguments of readProjectFile() for the given project file:
+    # its content hash and included files when it was cached, if it is in the
+    # cache, and the arguments of parseProjectFile().
+    def getReadArgs(self, proFilePath):
+        entry = self.entries.get(proFilePath)
+        if entry:
+            return (proFilePath, entry['hash'], entry['fields']['includes'],
+                    self.config, self.srcDir, self.srcOutDir)
+        return (proFilePath, None, [], self.config, self.srcDir, self.srcOutDir)
+
+    # Stores the result of readProjectFile(), and returns the fields of the
+    # project file.
+    def setReadResult(self, proFilePath, result):
+        mtime, size, contentHash, includeStats, fields = result
+        if fields is None:
+            self.numHits += 1
+            instrument.count('parseCacheHits')
+            fields = self.entries[proFilePath]['fields']
+        else:
+            self.numMisses += 1
+            instrument.count('projectFilesParsed')
+        self.newEntries[proFilePath] = {
+            'mtime':    mtime,
+            'size':     size,
+            'hash':     contentHash,
+            'includes': includeStats,
+            'fields':   fields }
+        return fields
+
+    # Returns the fields of the given project file. They are either loaded
+    # from the cache, or computed by parseProjectFile().
+    def getFields(self, proFilePath):
+        fields = self.getUnchangedFields(proFilePath)
+        if fields is None:
+            args = self.getReadArgs(proFilePath)
+            fields = self.setReadResult(proFilePath, readProjectFile(args))
+        return fields
+
+
+# Returns [filePath, mtime, size] for each of the given files, with None as
+# modification time and size of missing files
+def getFileStats(filePaths):
+    res = []
+    for filePath in filePaths:
+        try:
+            stat = os.stat(filePath)
+            res.append([filePath, stat.st_mtime, stat.st_size])
+        except OSError:
+            res.append([filePath, None, None])
+    return res
+
+# Returns the md5 of the given project file content and of the content of the
+# given included files
+def getContentHash(data, includedFilePaths):
+    for filePath in includedFilePaths:
+        data += "\n" + filePath + "\n" + buildutils.readFromFileIfExists(filePath)
+    return buildutils.getContentHash(data)
+
+# Reads and hashes the given project file and the files it included when it
+# was cached, and evaluates it with parseProjectFile() unless their content
+# hash is equal to cachedHash. Returns a tuple (mtime, size, contentHash,
+# includeStats, fields), where includeStats are the stats of included files
+# (see getFileStats), and fields is None if the file was not evaluated.
+#
+# The arguments are passed as a single tuple so that this function can be
+# called by a pool of worker processes (see buildutils.parallelMap).
+#
+def readProjectFile(args):
+    proFilePath, cachedHash, cachedIncludedFilePaths, config, srcDir, srcOutDir = args
+    stat = os.stat(proFilePath)
+    includeStats = getFileStats(cachedIncludedFilePaths)
+    data = buildutils.readFromFile(proFilePath)
+    contentHash = getContentHash(data, cachedIncludedFilePaths)
+    if contentHash == cachedHash:
+        fields = None
+    else:
+        fields = parseProjectFile(proFilePath, data, config, srcDir, srcOutDir)
+        if fields['includes'] != cachedIncludedFilePaths:
+            includeStats = getFileStats(fields['includes'])
+            contentHash = getContentHash(data, fields['includes'])
+    return (stat.st_mtime, stat.st_size, contentHash, includeStats, fields)
+
+# Evaluates the given project file, whose content is given, with the given
+# CONFIG passed to configure.py, and returns as a dictionary the relevant qmake
+# variables, and the files it includes. These are the fields stored in the
+# cache. Assignments are evaluated in order, with scopes, include() and $$VAR
+# expansions (see qmakeeval.py). The .config.pri generated by configure.py is
+# not included.
+def parseProjectFile(proFilePath, data, config, srcDir, srcOutDir):
+    outDir = srcOutDir + os.path.dirname(proFilePath)[len(srcDir):]
+    variables, includedFilePaths = qmakeeval.evaluateProjectFile(
+        proFilePath, data, {'CONFIG': config, 'QT': ["core", "gui"]}, outDir, [".config.pri"])
+
+    # An empty TEMPLATE is the default one, like a missing TEMPLATE
+    fields = {}
+    fields['template'] = (variables.get('TEMPLATE') or ["app"])[0]
+    fields['config']   = variables['CONFIG']
+
+    if 'qt' in fields['config']:
+        fields['qt'] = variables['QT']
+    else:
+        fields['qt'] = []
+
+    fields['subdirs']       = variables.get('SUBDIRS', [])
+    fields['third_depends'] = variables.get('THIRD_DEPENDS', [])
+    fields['lib_depends']   = variables.get('LIB_DEPENDS', [])
+
+    fields['sources']     = variables.get('SOURCES', [])
+    fields['headers']     = variables.get('HEADERS', [])
+    fields['forms']       = variables.get('FORMS', [])
+    fields['resources']   = variables.get('RESOURCES', [])
+    fields['defines']     = variables.get('DEFINES', [])
+    fields['includepath'] = variables.get('INCLUDEPATH', [])
+
+    fields['unity_batch_size'] = variables.get('UNITY_BATCH_SIZE', [])
+    fields['unity_exclude']    = variables.get('UNITY_EXCLUDE', [])
+
+    fields['includes'] = includedFilePaths
+    return fields
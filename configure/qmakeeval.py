@@ -0,0 +1,444 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Evaluator of qmake project files.
+#
+# configure.py needs the values of a few variables of each project file
+# (TEMPLATE, CONFIG, SUBDIRS, LIB_DEPENDS, SOURCES...). Project files are
+# evaluated like qmake does, for the subset of the language they use in
+# practice:
+#
+#     - assignments (=, +=, *=, -=), processed in order. ~= is ignored.
+#     - scopes, with conditions joined by ':' (and) or '|' (or), evaluated
+#       from left to right, negated by '!', and else branches, e.g.:
+#
+#           unix:!macx: LIBS += -lrt
+#           CONFIG(debug, debug|release) {
+#               DEFINES += DEBUG
+#           } else:win32 {
+#               DEFINES += NDEBUG_WIN
+#           } else {
+#               DEFINES += NDEBUG
+#           }
+#
+#       A condition is either a name, true if it matches a value of CONFIG
+#       (e.g., unix, win32, release, or a wildcard pattern), or one of the
+#       test functions CONFIG(), contains(), equals(), isEqual(), isEmpty(),
+#       exists() and defined(). Other test functions are false.
+#     - include() of other project files, usually .pri fragments shared by
+#       several projects. Relative paths are relative to the including file,
+#       and $$PWD is the directory of the file being evaluated. Missing files,
+#       and files generated by configure.py itself (.config.pri, which is its
+#       output), are not included.
+#     - expansion of $$VAR, $${VAR} and $$(ENVIRONMENT_VARIABLE), including
+#       the built-in PWD, _PRO_FILE_, _PRO_FILE_PWD_, OUT_PWD and TARGET.
+#       Replace functions (e.g., $$files()) and properties (e.g.,
+#       $$[QT_INSTALL_HEADERS]) are left unexpanded. Environment variables
+#       are not inputs of the parse cache (see parsecache.py): evaluated
+#       values are not updated when they change.
+#
+# Other statements, e.g., calls to message() or system(), are ignored.
+#
+# Each file is tokenized once into a tree of statements, which is evaluated
+# for each project including it. Trees of included files are kept by a
+# StatementCache shared by all projects evaluated by the same process, so a
+# large .pri included by every project is read and tokenized once instead of
+# once per project. Trees of project files are kept too, so that evaluating
+# them again with another CONFIG (see multiconfigure.py) doesn't tokenize them
+# again.
+
+import os
+import re
+import time
+import fnmatch
+
+import buildutils
+import instrument
+
+# Kinds of statements of the tree returned by parseStatements(), as tuples:
+#
+#     (ASSIGN, name, operator, valuesString)  e.g. (ASSIGN, 'SOURCES', '+=', 'a.cpp b.cpp')
+#     (CALL,   name, argsString)              e.g. (CALL, 'include', '../common.pri')
+#     (SCOPE,  terms, statements)             statements evaluated if the condition holds
+#
+# where terms is a list of tuples (separator, negated, name, argsString),
+# separator being ':' or '|', and argsString None for names which are not test
+# function calls. The first term of else branches is named 'else'.
+ASSIGN = 0
+CALL   = 1
+SCOPE  = 2
+
+# Statements: an assignment, or a call of a function, e.g., include(a.pri)
+assignmentRegExp = re.compile(r"\s*([A-Za-z_][\w.]*)\s*([-+*~]?=)(.*)$", re.DOTALL)
+callRegExp       = re.compile(r"\s*(!?)\s*([A-Za-z_]\w*)\s*(?:\((.*)\))?\s*$", re.DOTALL)
+
+# Expansions of variables: $$VAR, $${VAR} or $$(VAR). Names followed by '('
+# are replace functions, which are not expanded.
+expansionRegExp = re.compile(r"\$\$(?:\{([\w.]+)\}|\(([\w.]+)\)|([A-Za-z_][\w.]*)(?![\w.(]))")
+
+
+# Splits the given string at the given separator characters, except between
+# parentheses or quotes. Returns the list of parts, and the list of
+# separators found between them.
+def _splitTopLevel(string, separators):
+    if not any(separator in string for separator in separators):
+        return [string], []
+    parts = []
+    foundSeparators = []
+    start = 0
+    depth = 0
+    quoted = False
+    for i, c in enumerate(string):
+        if c == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth = max(0, depth - 1)
+        elif depth == 0 and c in separators:
+            parts.append(string[start:i])
+            foundSeparators.append(c)
+            start = i + 1
+    parts.append(string[start:])
+    return parts, foundSeparators
+
+# Splits a logical line into statements and scope braces, e.g.:
+#
+#     "} else:unix { QT += x11extras }"  ->  [ "}", "else:unix", "{", "QT += x11extras", "}" ]
+#
+# Braces of variable expansions such as $${TARGET}, and braces between
+# parentheses or quotes, are not considered.
+def _splitBraces(line):
+    if '{' not in line and '}' not in line:
+        return [line.strip()]
+    pieces = []
+    start = 0
+    parenthesesDepth = 0
+    expansionDepth = 0
+    quoted = False
+    for i, c in enumerate(line):
+        if c == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif c == '(':
+            parenthesesDepth += 1
+        elif c == ')':
+            parenthesesDepth = max(0, parenthesesDepth - 1)
+        elif c == '{':
+            if line[i-2:i] == '$$':
+                expansionDepth += 1
+            elif parenthesesDepth == 0:
+                pieces += [line[start:i], '{']
+                start = i + 1
+        elif c == '}':
+            if expansionDepth > 0:
+                expansionDepth -= 1
+            elif parenthesesDepth == 0:
+                pieces += [line[start:i], '}']
+                start = i + 1
+    pieces.append(line[start:])
+    return [piece.strip() for piece in pieces if piece.strip()]
+
+# Returns the terms of the given condition, e.g., "unix:!CONFIG(debug, debug|release)"
+# -> [ (':', False, 'unix', None), (':', True, 'CONFIG', 'debug, debug|release') ].
+# Returns None if it is not a valid condition.
+def _parseCondition(condition):
+    parts, separators = _splitTopLevel(condition, ':|')
+    terms = []
+    for part, separator in zip(parts, [':'] + separators):
+        match = callRegExp.match(part)
+        if not match:
+            return None
+        negated, name, args = match.groups()
+        terms.append((separator, negated == '!', name, args))
+    return terms
+
+# Appends to the given block the statement of the given string, e.g.,
+# "unix:LIBS += -lrt", wrapped in a scope if it has a condition. Invalid
+# statements are ignored.
+def _addStatement(block, string):
+    # Most statements are assignments without condition
+    match = assignmentRegExp.match(string)
+    if match:
+        block.append((ASSIGN,) + match.groups())
+        return
+
+    parts, separators = _splitTopLevel(string, ':')
+    statement = None
+    for k, part in enumerate(parts):
+        match = assignmentRegExp.match(part)
+        if match:
+            name, operator, values = match.groups()
+            values = ':'.join([values] + parts[k+1:])
+            statement = (ASSIGN, name, operator, values)
+            conditionParts = parts[:k]
+            break
+    else:
+        match = callRegExp.match(parts[-1])
+        if match and not match.group(1) and match.group(3) is not None:
+            statement = (CALL, match.group(2), match.group(3))
+            conditionParts = parts[:-1]
+    if statement is None:
+        return
+    if conditionParts:
+        terms = _parseCondition(':'.join(conditionParts))
+        if terms is not None:
+            block.append((SCOPE, terms, [statement]))
+    else:
+        block.append(statement)
+
+# Returns the tree of statements of the given project file content (see
+# ASSIGN, CALL and SCOPE). Comments and continued lines are handled like by
+# buildutils.parseQmakeAssignments().
+def parseStatements(content):
+    content = "\n" + content
+    if '#' in content:
+        content = buildutils.commentLineRegExp.sub("", content)
+        content = buildutils.commentRegExp.sub("", content)
+        instrument.count('regexEvaluations', 2)
+    if '\\' in content:
+        content = content.replace('\\\n', ' ')
+        if '\\' in content:
+            content = buildutils.continuationRegExp.sub(" ", content)
+            instrument.count('regexEvaluations')
+
+    root = []
+    blocks = [root]
+    for line in content.split('\n'):
+        condition = None
+        for piece in _splitBraces(line):
+            if piece == '{':
+                terms = _parseCondition((condition or "true").rstrip(':'))
+                scope = (SCOPE, terms or [(':', False, 'false', None)], [])
+                blocks[-1].append(scope)
+                blocks.append(scope[2])
+                condition = None
+            elif piece == '}':
+                if condition is not None:
+                    _addStatement(blocks[-1], condition)
+                    condition = None
+                if len(blocks) > 1:
+                    blocks.pop()
+            else:
+                if condition is not None:
+                    _addStatement(blocks[-1], condition)
+                condition = piece
+        if condition:
+            _addStatement(blocks[-1], condition)
+    return root
+
+
+# Tokenized files, shared by all projects evaluated by this process
+class StatementCache:
+
+    def __init__(self):
+        self.entries = {}  # filePath -> (mtime, size, readAt, contentHash, statements)
+
+    # Returns the statements of the given file. It is read again only if its
+    # modification time or size changed, or if it was modified within the
+    # same second it was last read (see buildutils.isRacy()), and tokenized
+    # again only if its content changed.
+    def getStatements(self, filePath):
+        stat = os.stat(filePath)
+        entry = self.entries.get(filePath)
+        if (entry and
+            entry[0] == stat.st_mtime and
+            entry[1] == stat.st_size and
+            not buildutils.isRacy(entry[0], entry[2])):
+            instrument.count('priCacheHits')
+            return entry[4]
+        readAt = time.time()
+        content = buildutils.readFromFile(filePath)
+        contentHash = buildutils.getContentHash(content)
+        if entry and entry[3] == contentHash:
+            instrument.count('priCacheHits')
+            statements = entry[4]
+        else:
+            instrument.count('priFilesParsed')
+            statements = parseStatements(content)
+        self.entries[filePath] = (stat.st_mtime, stat.st_size, readAt, contentHash, statements)
+        return statements
+
+    # Returns the statements of the given file, whose content was already read
+    # (e.g., a project file, see parsecache.readProjectFile()). It is
+    # tokenized again only if its content changed.
+    def getContentStatements(self, filePath, content):
+        contentHash = buildutils.getContentHash(content)
+        entry = self.entries.get(filePath)
+        if entry and entry[3] == contentHash:
+            return entry[4]
+        statements = parseStatements(content)
+        self.entries[filePath] = (None, None, 0.0, contentHash, statements)
+        return statements
+
+# Statement cache of this process
+statementCache = StatementCache()
+
+
+# Evaluates project files in order, updating the values of variables
+class Evaluator:
+
+    def __init__(self, variables, ignoredFileNames):
+        self.variables = variables                # name -> list of values
+        self.ignoredFileNames = ignoredFileNames  # Names of files never included, e.g., [ ".config.pri" ]
+        self.includedFilePaths = []               # Files included so far, in order of inclusion
+        self.includeStack = []                    # Files being evaluated, the current one last
+
+    # Evaluates the given statements of the given file
+    def evaluateFile(self, filePath, statements):
+        previousPwd = self.variables.get('PWD')
+        self.variables['PWD'] = [os.path.dirname(filePath)]
+        self.includeStack.append(filePath)
+        self._evaluateBlock(statements)
+        self.includeStack.pop()
+        if previousPwd is None:
+            del self.variables['PWD']
+        else:
+            self.variables['PWD'] = previousPwd
+
+    def _evaluateBlock(self, statements):
+        lastResult = True  # Result of the last condition, for else branches
+        for statement in statements:
+            kind = statement[0]
+            if kind == ASSIGN:
+                self._assign(statement[1], statement[2], statement[3])
+            elif kind == CALL:
+                if statement[1] == 'include':
+                    self._include(statement[2])
+            else:
+                terms = statement[1]
+                if terms[0][2] == 'else':
+                    if lastResult:
+                        continue
+                    terms = terms[1:]
+                lastResult = self._test(terms)
+                if lastResult:
+                    self._evaluateBlock(statement[2])
+
+    # Returns the values of the given string, split and expanded
+    def _getValues(self, string):
+        if '"' in string:
+            words = buildutils.valueRegExp.findall(string)
+        else:
+            words = string.split()
+        if '$$' not in string:
+            return words
+        values = []
+        for word in words:
+            values += self._expand(word)
+        return values
+
+    # Returns the values of the given word once variables are expanded. A word
+    # only made of one variable expands to all its values.
+    def _expand(self, word):
+        match = expansionRegExp.match(word)
+        if match and match.end() == len(word):
+            return list(self._getVariable(match))
+        return [expansionRegExp.sub(lambda match: " ".join(self._getVariable(match)), word)]
+
+    # Returns the values of the variable of the given match of expansionRegExp
+    def _getVariable(self, match):
+        name, environmentName, shortName = match.groups()
+        if environmentName:
+            return os.environ.get(environmentName, "").split()
+        return self.variables.get(name or shortName, [])
+
+    def _assign(self, name, operator, string):
+        values = self._getValues(string)
+        if operator == '=':
+            self.variables[name] = values
+        elif operator == '+=':
+            self.variables[name] = self.variables.get(name, []) + values
+        elif operator == '*=':
+            currentValues = list(self.variables.get(name, []))
+            for value in values:
+                if value not in currentValues:
+                    currentValues.append(value)
+            self.variables[name] = currentValues
+        elif operator == '-=':
+            self.variables[name] = [value for value in self.variables.get(name, []) if value not in values]
+
+    # Returns the path of the given value, relative to the current file
+    def _getPath(self, value):
+        path = os.path.join(os.path.dirname(self.includeStack[-1]), value)
+        return os.path.normpath(path).replace(os.sep, '/')
+
+    def _include(self, args):
+        values = self._getValues(_splitTopLevel(args, ',')[0][0])
+        if len(values) != 1 or '$$' in values[0]:
+            return
+        filePath = self._getPath(values[0].strip('"'))
+        if (os.path.basename(filePath) in self.ignoredFileNames or
+            filePath in self.includeStack or
+            not os.path.isfile(filePath)):
+            return
+        if filePath not in self.includedFilePaths:
+            self.includedFilePaths.append(filePath)
+        self.evaluateFile(filePath, statementCache.getStatements(filePath))
+
+    # Returns whether the given condition terms hold
+    def _test(self, terms):
+        res = True
+        for separator, negated, name, args in terms:
+            if separator == '|' and res:
+                continue
+            if separator == ':' and not res:
+                continue
+            res = self._testTerm(name, args) != negated
+        return res
+
+    def _testTerm(self, name, args):
+        config = self.variables.get('CONFIG', [])
+        if args is None:
+            if name == 'true':
+                return True
+            elif name == 'false':
+                return False
+            elif '*' in name or '?' in name:
+                return any(fnmatch.fnmatchcase(value, name) for value in config)
+            else:
+                return name in config
+        args = [" ".join(self._getValues(arg)).strip('"') for arg in _splitTopLevel(args, ',')[0]]
+        if name == 'CONFIG' and len(args) == 1:
+            return args[0] in config
+        elif name == 'CONFIG' and len(args) == 2:
+            options = args[1].split('|')
+            values = [value for value in config if value in options]
+            return bool(values) and values[-1] == args[0]
+        elif name == 'contains' and len(args) == 2:
+            try:
+                regExp = re.compile("(?:" + args[1] + r")\Z")
+            except re.error:
+                return args[1] in self.variables.get(args[0], [])
+            return any(regExp.match(value) for value in self.variables.get(args[0], []))
+        elif (name == 'equals' or name == 'isEqual') and len(args) == 2:
+            return " ".join(self.variables.get(args[0], [])) == args[1]
+        elif name == 'isEmpty' and len(args) == 1:
+            return not self.variables.get(args[0])
+        elif name == 'exists' and len(args) == 1:
+            return os.path.exists(self._getPath(args[0]))
+        elif name == 'defined' and len(args) >= 1:
+            return args[0] in self.variables
+        else:
+            return False
+
+
+# Evaluates the given project file, whose content was already read, and
+# returns a tuple (variables, includedFilePaths): the values of all variables
+# as a dictionary of lists, and the paths of the files it includes, in order
+# of inclusion. 'initialVariables' gives the values of variables before
+# evaluation (e.g., CONFIG), and is not modified. outDir is the value of
+# OUT_PWD. Files whose name is in ignoredFileNames are never included.
+def evaluateProjectFile(proFilePath, content, initialVariables, outDir, ignoredFileNames=[]):
+    variables = dict((name, list(values)) for name, values in initialVariables.items())
+    proDir = os.path.dirname(proFilePath)
+    variables['_PRO_FILE_']     = [proFilePath]
+    variables['_PRO_FILE_PWD_'] = [proDir]
+    variables['OUT_PWD']        = [outDir]
+    variables['TARGET']         = [os.path.splitext(os.path.basename(proFilePath))[0]]
+    evaluator = Evaluator(variables, ignoredFileNames)
+    evaluator.evaluateFile(proFilePath, statementCache.getContentStatements(proFilePath, content))
+    return variables, evaluator.includedFilePaths
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Critical-path analysis of the dependency graph of projects.
+#
+# A lib or app can only be built once all the libs it depends on are built.
+# With enough parallel jobs, the build time is therefore bounded by the
+# heaviest chain of dependencies: the critical path. Builds stall at the end
+# when the projects of this chain are started late, e.g., because make starts
+# subdirs in the order of SUBDIRS.
+#
+# Each project is given a weight: its recorded build time if the Ninja log of
+# a previous build exists (see ninjagen.py), otherwise its number of source
+# files. Projects without recorded build time (e.g., new ones) get an
+# estimated time proportional to their number of source files.
+#
+# The priority of a project is the weight of the heaviest chain starting at
+# this project and ending at a project nothing depends on, i.e., the time
+# needed to finish the build once this project starts. Starting projects with
+# the highest priority first is the classic list-scheduling heuristic, which
+# configure.py applies by sorting SUBDIRS and the build statements of
+# build.ninja by decreasing priority.
+#
+# The analysis is written to <root-out-dir>/.configure/schedule.txt.
+
+import depgraph
+
+
+# Result of the analysis
+class Schedule:
+
+    def __init__(self):
+        self.weights = {}        # node -> weight
+        self.levels = {}         # node -> 0 if it has no dependency, otherwise 1 + max level of its dependencies
+        self.levelWidths = []    # Number of nodes at each level
+        self.finishTimes = {}    # node -> weight of the heaviest chain of dependencies ending at this node
+        self.priorities = {}     # node -> weight of the heaviest chain of dependents starting at this node
+        self.criticalPath = []   # Heaviest chain, from the first node to build to the last one
+        self.totalWeight = 0     # Sum of all weights
+
+
+# Returns the Schedule of the given acyclic graph. 'successors' maps each node
+# to the nodes it depends on, 'predecessors' maps each node to the nodes
+# depending on it, and 'weights' maps each node to its weight.
+def computeSchedule(nodes, successors, predecessors, weights):
+    res = Schedule()
+    res.weights = weights
+    order = depgraph.findTopologicalOrder(nodes, successors)
+
+    # Levels and finish times, from dependencies to dependents. The
+    # dependency with the latest finish time of each node is kept to find
+    # the critical path.
+    criticalSuccessors = {}
+    for node in order:
+        level = 0
+        finishTime = 0
+        for successor in successors.get(node, []):
+            level = max(level, res.levels[successor] + 1)
+            if res.finishTimes[successor] > finishTime:
+                finishTime = res.finishTimes[successor]
+                criticalSuccessors[node] = successor
+        res.levels[node] = level
+        res.finishTimes[node] = finishTime + weights[node]
+        res.totalWeight += weights[node]
+        while len(res.levelWidths) <= level:
+            res.levelWidths.append(0)
+        res.levelWidths[level] += 1
+
+    # Priorities, from dependents to dependencies
+    for node in reversed(order):
+        priority = 0
+        for predecessor in predecessors.get(node, []):
+            priority = max(priority, res.priorities[predecessor])
+        res.priorities[node] = priority + weights[node]
+
+    # Critical path, found backwards from the node finishing last
+    if order:
+        node = max(order, key=lambda node: (res.finishTimes[node], node))
+        while node is not None:
+            res.criticalPath.append(node)
+            node = criticalSuccessors.get(node)
+        res.criticalPath.reverse()
+
+    return res
+
+
+# Returns the build time of each output recorded in the given Ninja log, in
+# seconds, as a dictionary. Returns an empty dictionary if there is no log.
+#
+# Each line of the log is: start end mtime output hash, where start and end
+# are in milliseconds. Outputs built several times appear several times, the
+# last line is the most recent.
+#
+def readNinjaLog(logFilePath):
+    buildTimes = {}
+    try:
+        f = open(logFilePath, 'r')
+    except IOError:
+        return buildTimes
+    for line in f:
+        fields = line.rstrip('\n').split('\t')
+        if len(fields) == 5 and not line.startswith('#'):
+            try:
+                buildTimes[fields[3]] = (int(fields[1]) - int(fields[0])) / 1000.0
+            except ValueError:
+                pass
+    f.close()
+    return buildTimes
+
+
+# Returns the content of schedule.txt. 'unit' describes weights, e.g.,
+# "source files" or "seconds".
+def getReport(schedule, unit):
+    lines = ["# Critical-path analysis of the dependency graph, computed by configure.py",
+             "# Weights are in " + unit + "."]
+
+    criticalWeight = 0
+    if schedule.criticalPath:
+        criticalWeight = schedule.finishTimes[schedule.criticalPath[-1]]
+    lines.append("")
+    lines.append("Total weight:  %g" % schedule.totalWeight)
+    lines.append("Critical path: %g (%d projects)" % (criticalWeight, len(schedule.criticalPath)))
+    if criticalWeight > 0:
+        lines.append("Maximum useful parallelism: %.1f" % (schedule.totalWeight / float(criticalWeight)))
+    lines.append("Longest chain: %d projects" % len(schedule.levelWidths))
+
+    lines.append("")
+    lines.append("Critical path (weight, finish time):")
+    for node in schedule.criticalPath:
+        lines.append("    %-40s %10g %10g" % (node, schedule.weights[node], schedule.finishTimes[node]))
+
+    lines.append("")
+    lines.append("Width at each level (level 0 has no dependency):")
+    for level, width in enumerate(schedule.levelWidths):
+        lines.append("    level %-3d %5d" % (level, width))
+
+    lines.append("")
+    lines.append("Priorities, highest first (priority, weight, level):")
+    for node in sorted(schedule.priorities, key=lambda node: (-schedule.priorities[node], node)):
+        lines.append("    %-40s %10g %10g %5d" % (node, schedule.priorities[node],
+                                                  schedule.weights[node], schedule.levels[node]))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Stamp file of configure.py.
+#
+# qmake runs configure.py on every invocation, even when no project file
+# changed. At the end of each run, configure.py writes a stamp file in the
+# build directory, containing:
+#
+#     - the arguments of configure.py (directories and CONFIG)
+#     - a hash of the scripts in this directory
+#     - the modification time and size of all inputs and outputs of the run:
+#       the directories searched for project files, the project files, the
+#       .configureignore file, the sources and headers the generated files
+#       depend on (see configure.getContentInputPaths()), the inputs of
+#       libraries in the artifact cache (see artifactcache.py), and the
+#       generated .config.pri files
+#
+# At startup, configure.py computes the same content for the paths listed in
+# the stamp file, and exits immediately if it is identical: adding or removing
+# a project file changes the modification time of its directory, and editing
+# a project file or a generated file changes its own modification time.
+#
+# Inputs modified less than one second before the run started are "racy" (see
+# buildutils.isRacy()): they may have been modified again after being read,
+# so the stamp is not written in this case.
+#
+# This module is imported before all other modules of configure.py, and must
+# therefore stay fast to import.
+
+import os
+import hashlib
+
+# Increment when the format of the stamp file changes
+stampVersion = "1"
+
+
+# Returns the hexadecimal md5 digest of all python scripts of this directory
+def getScriptsHash():
+    scriptDir = os.path.dirname(os.path.abspath(__file__))
+    md5 = hashlib.md5()
+    for filename in sorted(os.listdir(scriptDir)):
+        if filename.endswith('.py'):
+            f = open(scriptDir + '/' + filename, 'rb')
+            md5.update(f.read())
+            f.close()
+    return md5.hexdigest()
+
+# Returns the content of the stamp file for the given arguments of
+# configure.py and paths of inputs and outputs, and the most recent
+# modification time of the inputs
+def getContent(args, inputPaths, outputPaths=[]):
+    lines = [stampVersion, getScriptsHash(), "\t".join(args)]
+    lastModified = 0.0
+    for i, path in enumerate(list(inputPaths) + list(outputPaths)):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            lines.append("- - " + path)
+            continue
+        lines.append("%r %d %s" % (stat.st_mtime, stat.st_size, path))
+        if i < len(inputPaths):
+            lastModified = max(lastModified, stat.st_mtime)
+    return ("\n".join(lines) + "\n", lastModified)
+
+# Returns whether the given stamp file is up to date, i.e., whether nothing
+# changed since it was written with the same arguments of configure.py
+def isUpToDate(stampFilePath, args):
+    try:
+        f = open(stampFilePath, 'r')
+        stamp = f.read()
+        f.close()
+    except IOError:
+        return False
+    paths = []
+    for line in stamp.splitlines()[3:]:
+        fields = line.split(" ", 2)
+        if len(fields) < 3:
+            return False
+        paths.append(fields[2])
+    return getContent(args, paths)[0] == stamp
+
+# Returns the content to write to the stamp file, or None if some inputs are
+# racy, i.e., were modified too recently before the run started at startTime.
+# Outputs are written by configure.py itself, so they are never racy.
+def getContentIfNotRacy(args, inputPaths, outputPaths, startTime):
+    import buildutils  # Only needed at the end of a run, not by the fast path
+    content, lastModified = getContent(args, inputPaths, outputPaths)
+    if not buildutils.isRacy(lastModified, startTime):
+        return content
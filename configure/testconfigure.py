@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Regression tests of configure.py and of the scripts using it.
+#
+# Usage (with the Python version running configure.py):
+#
+#     python testconfigure.py [-v] [TestCase[.test_name]]...
+#
+# Each test writes a small src/ tree to a temporary directory, runs the
+# scripts on it in a separate process, like qmake does, and checks the files
+# they generate.
+
+import sys
+import os
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+scriptDir = os.path.dirname(os.path.abspath(__file__))
+
+
+# Writes content to file, creating directories as necessary
+def writeFile(filePath, content):
+    dirpath = os.path.dirname(filePath)
+    if not os.path.isdir(dirpath):
+        os.makedirs(dirpath)
+    f = open(filePath, 'w')
+    f.write(content)
+    f.close()
+
+# Returns the content of the given file
+def readFile(filePath):
+    f = open(filePath)
+    content = f.read()
+    f.close()
+    return content
+
+
+class ConfigureTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.workDir = tempfile.mkdtemp(prefix='testconfigure-').replace(os.sep, '/')
+        self.rootDir = self.workDir + '/root'
+        self.env = dict(os.environ)
+        self.env['CONFIGURE_STAMP'] = '0'
+        for name in ['CONFIGURE_NINJA', 'CONFIGURE_ARTIFACT_CACHE', 'CONFIGURE_JOBS']:
+            self.env.pop(name, None)
+
+    def tearDown(self):
+        shutil.rmtree(self.workDir, True)
+
+    # Writes the project files of a distribution with an app depending on
+    # the given libs, given as { relDir: LIB_DEPENDS } relative to src/libs,
+    # each lib having one source file
+    def writeDistribution(self, libs, appLibDepends):
+        writeFile(self.rootDir + '/src/src.pro', "TEMPLATE = subdirs\nSUBDIRS = app libs\n")
+        writeFile(self.rootDir + '/src/libs/libs.pro',
+                  "TEMPLATE = subdirs\nSUBDIRS = " +
+                  " ".join(sorted(set(relDir.split('/')[0] for relDir in libs))) + "\n")
+        for relDir in sorted(libs):
+            name = relDir.split('/')[-1]
+            writeFile(self.rootDir + '/src/libs/' + relDir + '/' + name + '.pro',
+                      "TEMPLATE = lib\nLIB_DEPENDS = " + libs[relDir] + "\n" +
+                      "SOURCES += " + name + ".cpp\n")
+            writeFile(self.rootDir + '/src/libs/' + relDir + '/' + name + '.cpp', "\n")
+        writeFile(self.rootDir + '/src/app/app.pro',
+                  "TEMPLATE = app\nLIB_DEPENDS = " + appLibDepends + "\nSOURCES += main.cpp\n")
+        writeFile(self.rootDir + '/src/app/main.cpp', "int main() { return 0; }\n")
+
+    # Runs the given script of this directory with the given arguments, and
+    # returns its output. Fails if it doesn't exit successfully.
+    def runScript(self, scriptName, args):
+        process = subprocess.Popen([sys.executable, scriptDir + '/' + scriptName] + args,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=self.env)
+        output = process.communicate()[0].decode('utf-8', 'replace')
+        self.assertEqual(process.returncode, 0, scriptName + " failed:\n" + output)
+        return output
+
+
+class MultiConfigureTest(ConfigureTestCase):
+
+    # Each variant must be generated with its own settings, not with those of
+    # the variant configured first
+    def test_variantSettings(self):
+        self.writeDistribution({'Core': ""}, "Core")
+        self.env['CONFIGURE_ARTIFACT_CACHE'] = self.workDir + '/cache'
+        win32OutDir = self.workDir + '/win32'
+        unixOutDir = self.workDir + '/unix'
+        self.runScript('multiconfigure.py', [self.rootDir, win32OutDir, "win32 debug qt",
+                                             unixOutDir, "unix release qt"])
+
+        content = readFile(unixOutDir + '/src/app/.config.pri')
+        self.assertIn("LIBS += -L" + unixOutDir + "/src/libs/Core/ -lCore", content)
+        self.assertIn("PRE_TARGETDEPS += " + unixOutDir + "/src/libs/Core/libCore.a", content)
+        self.assertIn("$$QMAKE_CFLAGS_ISYSTEM " + self.rootDir + "/src/third/", content)
+        content = readFile(unixOutDir + '/src/libs/Core/.config.pri')
+        self.assertIn("QMAKE_POST_LINK = python " + scriptDir + "/artifactcache.py store", content)
+        self.assertNotIn(win32OutDir, content)
+
+        content = readFile(win32OutDir + '/src/app/.config.pri')
+        self.assertIn("LIBS += -L" + win32OutDir + "/src/libs/Core/debug/ -lCore", content)
+        self.assertNotIn("QMAKE_CFLAGS_ISYSTEM", content)
+        self.assertNotIn("QMAKE_POST_LINK", readFile(win32OutDir + '/src/libs/Core/.config.pri'))
+
+    # Files generated for a variant must be those generated by configure.py
+    # for this variant alone
+    def test_sameAsConfigure(self):
+        self.writeDistribution({'Core': "", 'Gui': "Core"}, "Gui")
+        writeFile(self.rootDir + '/src/libs/Core/Core.pro',
+                  "TEMPLATE = lib\nSOURCES += Core.cpp\n" +
+                  "CONFIG(debug, debug|release): LIB_DEPENDS += Log\n")
+        writeFile(self.rootDir + '/src/libs/libs.pro', "TEMPLATE = subdirs\nSUBDIRS = Core Gui Log\n")
+        writeFile(self.rootDir + '/src/libs/Log/Log.pro', "TEMPLATE = lib\nSOURCES += Log.cpp\n")
+        writeFile(self.rootDir + '/src/libs/Log/Log.cpp', "\n")
+        variants = [(self.workDir + '/release', "unix release qt"),
+                    (self.workDir + '/debug', "unix debug qt")]
+        args = [self.rootDir]
+        for outDir, config in variants:
+            args += [outDir, config]
+        self.runScript('multiconfigure.py', args)
+        for outDir, config in variants:
+            self.runScript('configure.py', [self.rootDir, outDir + '-alone'] + config.split())
+            for relDir in ['src', 'src/app', 'src/libs', 'src/libs/Core', 'src/libs/Gui', 'src/libs/Log']:
+                self.assertEqual(readFile(outDir + '/' + relDir + '/.config.pri').replace(outDir + '/', '/'),
+                                 readFile(outDir + '-alone/' + relDir + '/.config.pri').replace(outDir + '-alone/', '/'))
+        self.assertIn("-lLog", readFile(self.workDir + '/debug/src/app/.config.pri'))
+        self.assertNotIn("-lLog", readFile(self.workDir + '/release/src/app/.config.pri'))
+
+
+class StampTest(ConfigureTestCase):
+
+    def setUp(self):
+        ConfigureTestCase.setUp(self)
+        self.env['CONFIGURE_STAMP'] = '1'
+        self.outDir = self.workDir + '/out'
+        self.stampFilePath = self.outDir + '/.configure/stamp.txt'
+
+    # Runs configure.py, after setting the modification time of the files of
+    # the distribution in the past, so that they are not racy (see stamp.py)
+    def runConfigure(self):
+        past = os.path.getmtime(self.rootDir) - 10
+        for dirpath, dirnames, filenames in os.walk(self.rootDir):
+            for name in dirnames + filenames:
+                os.utime(os.path.join(dirpath, name), (past, past))
+        os.utime(self.rootDir, (past, past))
+        return self.runScript('configure.py', [self.rootDir, self.outDir, "unix", "release", "qt"])
+
+    def test_writtenWithoutErrors(self):
+        self.writeDistribution({'Core': ""}, "Core")
+        self.runConfigure()
+        self.assertTrue(os.path.isfile(self.stampFilePath))
+
+    # Errors must be reported again by the next run
+    def test_notWrittenWithErrors(self):
+        self.writeDistribution({'Core': ""}, "Core")
+        self.runConfigure()
+        self.writeDistribution({'Core': "Missing"}, "Core")
+        self.assertIn("Error: library libs/Missing not found.", self.runConfigure())
+        self.assertFalse(os.path.isfile(self.stampFilePath))
+        self.assertIn("Error: library libs/Missing not found.", self.runConfigure())
+
+        self.writeDistribution({'Core': "Gui", 'Gui': "Core"}, "Gui")
+        self.assertIn("Error: cyclic dependency:", self.runConfigure())
+        self.assertFalse(os.path.isfile(self.stampFilePath))
+
+
+class DependsIndexTest(ConfigureTestCase):
+
+    def runConfigure(self, outDir):
+        self.runScript('configure.py', [self.rootDir, outDir, "unix", "release", "qt"])
+
+    # The index only stores direct dependencies, and is not written again if
+    # they didn't change
+    def test_notRewrittenIfUnchanged(self):
+        self.writeDistribution({'Core': "", 'Gui': "Core"}, "Gui")
+        outDir = self.workDir + '/out'
+        indexFilePath = outDir + '/.configure/depindex.json'
+        self.runConfigure(outDir)
+        content = readFile(indexFilePath)
+        self.assertNotIn("tdepends", content)
+        past = int(os.path.getmtime(indexFilePath)) - 10
+        os.utime(indexFilePath, (past, past))
+        self.runConfigure(outDir)
+        self.assertEqual(os.path.getmtime(indexFilePath), past)
+
+    # Projects whose closure is computed again from the index must generate
+    # the same files as a run without index
+    def test_sameAsFullRun(self):
+        self.writeDistribution({'Core': "", 'Gui/Widgets': "Core", 'Gui/Views': "Gui/Widgets", 'Log': ""},
+                               "Gui/Views")
+        writeFile(self.rootDir + '/src/libs/Gui/Gui.pro', "TEMPLATE = subdirs\nSUBDIRS = Views Widgets\n")
+        outDir = self.workDir + '/out'
+        self.runConfigure(outDir)
+        for libDepends in ["Log", "Core Log", ""]:
+            writeFile(self.rootDir + '/src/libs/Core/Core.pro',
+                      "TEMPLATE = lib\nLIB_DEPENDS = " + libDepends + "\nSOURCES += Core.cpp\n")
+            self.runConfigure(outDir)
+            shutil.rmtree(outDir + '-full', True)
+            self.runConfigure(outDir + '-full')
+            for relDir in ['src', 'src/app', 'src/libs', 'src/libs/Core', 'src/libs/Gui',
+                           'src/libs/Gui/Views', 'src/libs/Gui/Widgets', 'src/libs/Log']:
+                self.assertEqual(readFile(outDir + '/' + relDir + '/.config.pri').replace(outDir + '/', '/'),
+                                 readFile(outDir + '-full/' + relDir + '/.config.pri').replace(outDir + '-full/', '/'))
+
+
+class ScheduleTest(ConfigureTestCase):
+
+    # A dependency on a subdirs project is not a node of the critical-path
+    # analysis, which only contains libs and apps
+    def test_subdirsDependency(self):
+        self.writeDistribution({'Gui/Widgets': "", 'Gui/Views': "Gui/Widgets"}, "Gui")
+        writeFile(self.rootDir + '/src/libs/Gui/Gui.pro', "TEMPLATE = subdirs\nSUBDIRS = Views Widgets\n")
+        outDir = self.workDir + '/out'
+        self.runScript('configure.py', [self.rootDir, outDir, "unix", "release", "qt"])
+        content = readFile(outDir + '/.configure/schedule.txt')
+        self.assertIn("app", content)
+        self.assertIn("libs/Gui/Views", content)
+
+
+class ParseTest(ConfigureTestCase):
+
+    # qmake builds an app if TEMPLATE is empty
+    def test_emptyTemplate(self):
+        self.writeDistribution({'Core': ""}, "Core")
+        writeFile(self.rootDir + '/src/app/app.pro', "TEMPLATE =\nLIB_DEPENDS = Core\nSOURCES += main.cpp\n")
+        outDir = self.workDir + '/out'
+        self.runScript('configure.py', [self.rootDir, outDir, "unix", "release", "qt"])
+        self.assertIn("LIB_SDEPENDS   = Core", readFile(outDir + '/src/app/.config.pri'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Watch mode of configure.py.
+#
+# Usage (same arguments as configure.py):
+#
+#     python watch.py <root-dir> <root-out-dir> <config>...
+#
+# Runs configure.py once, then keeps all projects in memory and watches the
+# directories searched for project files, and the files included by project
+# files (e.g., shared .pri files). When a project file is modified, or a file
+# it includes, only this project is parsed again, only the closures of this project and of
+# the projects depending on it are computed again, and only the .config.pri
+# files whose content changed are written (see configure.updateProjects()).
+#
+# When the structure of the distribution changes (project files or
+# directories added or removed, TEMPLATE, SUBDIRS or included files modified),
+# all steps of configure.py are run again.
+#
+# Directories are watched with inotify on Linux. On other systems, or if
+# inotify can't be used (e.g., too many directories for the inotify watch
+# limit), the modification times of directories and project files are polled
+# every CONFIGURE_WATCH_POLL seconds (default: 0.5). Setting
+# CONFIGURE_WATCH_POLL forces polling.
+#
+# Stop with Ctrl+C.
+
+import sys
+import os
+import time
+import select
+import struct
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None
+
+import configure
+import discovery
+
+# Time to wait for more events after a first one, in seconds. Editors often
+# save a file in several steps (e.g., write a temporary file, then rename it).
+debounceTime = 0.05
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY      = 0x00000002
+IN_ATTRIB      = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF   = 0x00000800
+IN_Q_OVERFLOW  = 0x00004000
+
+# Events changing the entries of a directory
+IN_DIRECTORY_CHANGED = (IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+                        IN_DELETE_SELF | IN_MOVE_SELF)
+
+# Events watched
+IN_WATCHED = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_DIRECTORY_CHANGED
+
+
+# Watches directories using inotify. Raises OSError if inotify is not
+# available, or if a directory can't be watched.
+class InotifyWatcher:
+
+    def __init__(self, dirpaths):
+        libcPath = None
+        if ctypes:
+            libcPath = ctypes.util.find_library('c')
+        if not libcPath:
+            raise OSError("inotify not available")
+        libc = ctypes.CDLL(libcPath, use_errno=True)
+        if not hasattr(libc, 'inotify_init'):
+            raise OSError("inotify not available")
+
+        self.fd = libc.inotify_init()  # inotify file descriptor
+        self.dirpathsByWd = {}         # Watched directories, by watch descriptor
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init failed")
+        for dirpath in dirpaths:
+            wd = libc.inotify_add_watch(self.fd, dirpath.encode(sys.getfilesystemencoding()), IN_WATCHED)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed on " + dirpath)
+            self.dirpathsByWd[wd] = dirpath
+
+    def close(self):
+        os.close(self.fd)
+
+    # Reads pending events, and returns the set of touched paths. A directory
+    # is touched if its entries changed, a file if it was modified.
+    def _readEvents(self):
+        data = os.read(self.fd, 65536)
+        paths = set()
+        i = 0
+        while i + 16 <= len(data):
+            wd, mask, cookie, length = struct.unpack_from('iIII', data, i)
+            name = data[i+16:i+16+length].rstrip(b'\0')
+            i += 16 + length
+            if mask & IN_Q_OVERFLOW:
+                paths.update(self.dirpathsByWd.values())
+            dirpath = self.dirpathsByWd.get(wd)
+            if dirpath is None:
+                continue
+            if mask & IN_DIRECTORY_CHANGED:
+                paths.add(dirpath)
+            if name:
+                if not isinstance(name, str):
+                    name = name.decode(sys.getfilesystemencoding())
+                paths.add(dirpath + '/' + name)
+        return paths
+
+    # Waits until some paths are touched, and returns them as a set
+    def wait(self):
+        select.select([self.fd], [], [])
+        paths = self._readEvents()
+        while select.select([self.fd], [], [], debounceTime)[0]:
+            paths.update(self._readEvents())
+        return paths
+
+
+# Watches directories and project files by polling their modification times
+class PollingWatcher:
+
+    def __init__(self, dirpaths, proFilePaths, interval):
+        self.paths = list(dirpaths) + list(proFilePaths)  # Watched paths
+        self.interval = interval                          # Time between two polls, in seconds
+        self.stats = self._getStats()                     # (mtime, size) of watched paths, by path
+
+    def close(self):
+        pass
+
+    def _getStats(self):
+        stats = {}
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                stats[path] = (stat.st_mtime, stat.st_size)
+            except OSError:
+                stats[path] = None
+        return stats
+
+    # Waits until some paths are touched, and returns them as a set
+    def wait(self):
+        while True:
+            time.sleep(self.interval)
+            stats = self._getStats()
+            paths = set(path for path in self.paths if stats[path] != self.stats[path])
+            self.stats = stats
+            if paths:
+                return paths
+
+
+# Returns a watcher of the given directories and project files
+def createWatcher(dirpaths, proFilePaths):
+    pollInterval = os.environ.get('CONFIGURE_WATCH_POLL')
+    if not pollInterval:
+        try:
+            return InotifyWatcher(dirpaths)
+        except OSError as e:
+            print("[configure.py] Cannot use inotify (%s), polling instead" % e)
+    return PollingWatcher(dirpaths, proFilePaths, float(pollInterval or 0.5))
+
+
+# Watches project files until the structure of the distribution changes, and
+# updates generated files after each modification
+def watchProjects():
+    dirpaths = list(configure.searchedDirs)
+    listings = dict((dirpath, discovery.listDirectory(dirpath)) for dirpath in dirpaths)
+    proFilePaths = set(project.proFilePath for project in configure.projects.values())
+    includedFilePaths = set(configure.getIncludedFilePaths())
+    for dirpath in sorted(set(os.path.dirname(filePath) for filePath in includedFilePaths)):
+        if dirpath not in listings:
+            dirpaths.append(dirpath)
+
+    watcher = createWatcher(dirpaths, proFilePaths | includedFilePaths)
+    print("[configure.py] Watching %d project files and %d included files" % (
+        len(proFilePaths), len(includedFilePaths)))
+    try:
+        while True:
+            touchedPaths = watcher.wait()
+            start = time.time()
+
+            # Find modified project files, and whether project files or
+            # directories were added or removed
+            modifiedProFilePaths = []
+            for path in sorted(touchedPaths):
+                if path in listings:
+                    if discovery.listDirectory(path) != listings[path]:
+                        return
+                elif path in proFilePaths:
+                    if not os.path.isfile(path):
+                        return
+                    if path not in modifiedProFilePaths:
+                        modifiedProFilePaths.append(path)
+                elif path in includedFilePaths:
+                    for proFilePath in configure.getProFilePathsIncluding(path):
+                        if proFilePath not in modifiedProFilePaths:
+                            modifiedProFilePaths.append(proFilePath)
+
+            if modifiedProFilePaths:
+                if not configure.updateProjects(modifiedProFilePaths):
+                    return
+                print("[configure.py] Updated %s in %.1f ms" % (
+                    " ".join(modifiedProFilePaths), 1000 * (time.time() - start)))
+    finally:
+        watcher.close()
+
+
+def main():
+    configure.setArguments(sys.argv[1:])
+    configure.main()
+    while True:
+        watchProjects()
+        print("[configure.py] Project structure changed, running all steps again")
+        configure.reset()
+        configure.main()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass